@@ -0,0 +1,66 @@
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.defaultfilters import linebreaksbr
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateformat import format as date_format
+from django.utils.safestring import mark_safe
+from jinja2 import Environment, FileSystemBytecodeCache
+from sorl.thumbnail import get_thumbnail
+
+from posts.thumbnails import prefetch_thumbnails
+
+
+def url(name, *args, **kwargs):
+    return reverse(name, args=args, kwargs=kwargs)
+
+
+def thumbnail(file, geometry, **options):
+    if not file:
+        return None
+    return get_thumbnail(file, geometry, **options)
+
+
+def date(value, arg):
+    if not value:
+        return ''
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return date_format(value, arg)
+
+
+def cached(timeout, *vary_on, caller):
+    """Аналог {% cache %}: ``{% call cached(20, key) %}...{% endcall %}``."""
+    key = 'jinja2.cache.' + hashlib.md5(
+        ':'.join(str(part) for part in vary_on).encode()).hexdigest()
+    value = cache.get(key)
+    if value is None:
+        value = caller()
+        cache.set(key, value, timeout)
+    return mark_safe(value)
+
+
+def environment(**options):
+    """Окружение Jinja2 с помощниками, заменяющими теги шаблонов Django."""
+    directory = settings.JINJA2_BYTECODE_CACHE_DIR or os.path.join(
+        tempfile.gettempdir(), 'yatube-jinja2')
+    os.makedirs(directory, exist_ok=True)
+    options.setdefault('bytecode_cache', FileSystemBytecodeCache(directory))
+    env = Environment(**options)
+    env.globals.update({
+        'url': url,
+        'static': static,
+        'thumbnail': thumbnail,
+        'cached': cached,
+        'prefetch_thumbnails': prefetch_thumbnails,
+    })
+    env.filters.update({
+        'date': date,
+        'linebreaksbr': linebreaksbr,
+    })
+    return env
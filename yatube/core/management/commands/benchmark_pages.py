@@ -0,0 +1,57 @@
+import statistics
+import time
+import zlib
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from core.middleware import GZIP_WBITS
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время ответа, размер страниц и стоимость их сжатия '
+            'на разных уровнях gzip')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--levels', default='1,4,6,9')
+
+    def handle(self, *args, **options):
+        client = Client()
+        levels = [int(level) for level in options['levels'].split(',')]
+        for path in options['paths']:
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.process_time()
+                response = client.get(path)
+                timings.append(time.process_time() - start)
+            content = response.content
+            self.stdout.write(
+                f'{path}: статус {response.status_code}, '
+                f'{len(content)} байт, '
+                f'CPU на ответ {statistics.median(timings) * 1000:.2f} мс'
+            )
+            for level in levels:
+                start = time.process_time()
+                for _ in range(options['repeat']):
+                    compressor = zlib.compressobj(
+                        level, zlib.DEFLATED, GZIP_WBITS)
+                    compressed = compressor.compress(content)
+                    compressed += compressor.flush()
+                cpu = (time.process_time() - start) / options['repeat']
+                self.stdout.write(
+                    f'  gzip {level}: {len(compressed)} байт '
+                    f'({len(compressed) / len(content):.1%}), '
+                    f'{cpu * 1000:.3f} мс'
+                )
+            etag = response.get('ETag')
+            if etag:
+                start = time.process_time()
+                revalidated = client.get(path, HTTP_IF_NONE_MATCH=etag)
+                cpu = time.process_time() - start
+                self.stdout.write(
+                    f'  повторный запрос с ETag: статус '
+                    f'{revalidated.status_code}, {len(revalidated.content)} '
+                    f'байт, {cpu * 1000:.2f} мс'
+                )
@@ -0,0 +1,63 @@
+import re
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+re_accepts_gzip = re.compile(r'\bgzip\b')
+# 16 + MAX_WBITS: zlib пишет заголовок и трейлер gzip
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+MIN_LENGTH = 200
+
+
+def compress_stream(chunks, level):
+    """Сжимает поток, сбрасывая буфер после каждого чанка."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Сжимает ответы gzip с уровнем из COMPRESSION_LEVELS.
+
+    Типы, которых нет в COMPRESSION_LEVELS, отдаются как есть.
+    Потоковые ответы сжимаются по чанкам, без буферизации всего тела.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0]
+        level = settings.COMPRESSION_LEVELS.get(content_type)
+        if level is None:
+            return response
+        if not response.streaming and len(response.content) < MIN_LENGTH:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if not re_accepts_gzip.search(
+                request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, level)
+            del response['Content-Length']
+        else:
+            compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+            content = compressor.compress(response.content)
+            content += compressor.flush()
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = 'gzip'
+        return response
@@ -0,0 +1,82 @@
+from collections import defaultdict
+
+SURROGATE_HEADER = 'Surrogate-Key'
+
+
+class CachingProxy:
+    """Простой кэширующий прокси перед WSGI-приложением.
+
+    Заменяет настоящий Varnish/Fastly в тестах и при локальной отладке:
+    кэширует GET-ответы без cookie по пути, индексирует их по ключам
+    из Surrogate-Key, умеет сбрасывать их по ключам и считает попадания.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.responses = {}
+        self.paths_by_key = defaultdict(set)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def purge(self, keys):
+        for key in keys:
+            for path in self.paths_by_key.pop(key, ()):
+                self.responses.pop(path, None)
+
+    def __call__(self, environ, start_response):
+        method = environ['REQUEST_METHOD']
+        if method == 'PURGE':
+            self.purge(environ.get('HTTP_SURROGATE_KEY', '').split())
+            start_response('200 OK', [])
+            return []
+        path = environ.get('PATH_INFO', '') + (
+            '?' + environ['QUERY_STRING'] if environ.get('QUERY_STRING')
+            else '')
+        cacheable = method == 'GET' and 'HTTP_COOKIE' not in environ
+        if cacheable and path in self.responses:
+            self.hits += 1
+            status, headers, body = self.responses[path]
+            start_response(status, headers)
+            return [body]
+        if cacheable:
+            self.misses += 1
+
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers
+            return start_response(status, headers, exc_info)
+
+        result = self.application(environ, capture)
+        try:
+            body = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        headers = captured['headers']
+        keys = dict(headers).get(SURROGATE_HEADER, '').split()
+        if (cacheable and keys and captured['status'].startswith('200')
+                and not any(name == 'Set-Cookie' for name, _ in headers)):
+            # как и CDN, ключи наружу не отдаём
+            public = [(name, value) for name, value in headers
+                      if name != SURROGATE_HEADER]
+            self.responses[path] = (captured['status'], public, body)
+            for key in keys:
+                self.paths_by_key[key].add(path)
+        return [body]
+
+
+class LocalPurgeBackend:
+    """Бэкенд SURROGATE_PURGE_BACKEND, сбрасывающий ключи в CachingProxy."""
+
+    proxies = []
+
+    def purge(self, keys):
+        for proxy in self.proxies:
+            proxy.purge(keys)
@@ -0,0 +1,158 @@
+import mimetypes
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import unquote
+
+from django.conf import settings
+
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+BLOCK_SIZE = 64 * 1024
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class FileSlice:
+    """Итератор по части файла для ответов на Range-запросы."""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def __iter__(self):
+        while self.remaining > 0:
+            chunk = self.file.read(min(BLOCK_SIZE, self.remaining))
+            if not chunk:
+                break
+            self.remaining -= len(chunk)
+            yield chunk
+
+    def close(self):
+        self.file.close()
+
+
+class StaticFilesMiddleware:
+    """WSGI-обёртка, отдающая статику и медиа без отдельного веб-сервера.
+
+    Умеет выбирать заранее сжатые .br/.gz варианты, отвечать 304 и 206,
+    ставит долгий Cache-Control на хэшированные имена и передаёт файл
+    в ``wsgi.file_wrapper``, чтобы сервер мог отдать его через sendfile.
+    Если файла нет, запрос уходит в Django.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.roots = [
+            (settings.STATIC_URL, settings.STATIC_ROOT,
+             settings.STATIC_CACHE_MAX_AGE),
+            (settings.MEDIA_URL, settings.MEDIA_ROOT,
+             settings.MEDIA_CACHE_MAX_AGE),
+        ]
+
+    def __call__(self, environ, start_response):
+        if environ['REQUEST_METHOD'] in ('GET', 'HEAD'):
+            found = self.find_file(unquote(environ.get('PATH_INFO', '')))
+            if found is not None:
+                return self.serve(environ, start_response, *found)
+        return self.application(environ, start_response)
+
+    def find_file(self, path):
+        for url, root, max_age in self.roots:
+            if not root or not path.startswith(url):
+                continue
+            name = os.path.normpath(path[len(url):]).lstrip('/')
+            if name.startswith('..') or os.path.isabs(name):
+                return None
+            full_path = os.path.join(root, name)
+            if os.path.isfile(full_path):
+                return full_path, max_age
+        return None
+
+    def cache_control(self, path, max_age):
+        if HASHED_NAME.search(path):
+            return IMMUTABLE
+        return f'public, max-age={max_age}'
+
+    def serve(self, environ, start_response, path, max_age):
+        content_type, _ = mimetypes.guess_type(path)
+        headers = [
+            ('Content-Type', content_type or 'application/octet-stream'),
+            ('Cache-Control', self.cache_control(path, max_age)),
+            ('Accept-Ranges', 'bytes'),
+            ('Vary', 'Accept-Encoding'),
+        ]
+        accepted = environ.get('HTTP_ACCEPT_ENCODING', '')
+        # некорректный заголовок Range по RFC 7233 просто игнорируется
+        has_range = RANGE.match(environ.get('HTTP_RANGE', '').strip())
+        if not has_range:
+            for encoding, extension in ENCODINGS:
+                if encoding in accepted and os.path.isfile(path + extension):
+                    path += extension
+                    headers.append(('Content-Encoding', encoding))
+                    break
+
+        stat = os.stat(path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        headers.append(('ETag', etag))
+        headers.append(('Last-Modified', formatdate(stat.st_mtime,
+                                                    usegmt=True)))
+        if self.not_modified(environ, etag, stat.st_mtime):
+            start_response('304 Not Modified', headers)
+            return []
+
+        start, length = 0, stat.st_size
+        status = '200 OK'
+        if has_range:
+            byte_range = self.parse_range(environ['HTTP_RANGE'], length)
+            if byte_range is None:
+                headers.append(('Content-Range', f'bytes */{length}'))
+                start_response('416 Range Not Satisfiable', headers)
+                return []
+            start, end = byte_range
+            headers.append(('Content-Range', f'bytes {start}-{end}/{length}'))
+            length = end - start + 1
+            status = '206 Partial Content'
+        headers.append(('Content-Length', str(length)))
+        start_response(status, headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+
+        file = open(path, 'rb')
+        if status == '206 Partial Content':
+            return FileSlice(file, start, length)
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            return file_wrapper(file, BLOCK_SIZE)
+        return FileSlice(file, 0, length)
+
+    def not_modified(self, environ, etag, mtime):
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            return etag in if_none_match or if_none_match.strip() == '*'
+        if_modified_since = environ.get('HTTP_IF_MODIFIED_SINCE')
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(mtime) <= since
+        return False
+
+    def parse_range(self, header, size):
+        """Возвращает (start, end) диапазона или None, если он вне файла."""
+        first, last = RANGE.match(header.strip()).groups()
+        if size == 0:
+            return None
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        elif last:
+            start = max(size - int(last), 0)
+            end = size - 1
+        else:
+            return None
+        if start > end:
+            return None
+        return start, end
@@ -0,0 +1,100 @@
+import gzip
+import hashlib
+import os
+import posixpath
+import re
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.svg', '.html', '.txt', '.json', '.xml', '.map',
+)
+# маленькие файлы после сжатия почти не уменьшаются
+MIN_COMPRESS_SIZE = 256
+# имя из content_name(); подходит и для регулярных выражений базы
+CONTENT_NAME_PATTERN = r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.[^/.]+)?$'
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хэширует имена статики и рядом кладёт сжатые .gz и .br копии."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed_names = []
+        for name, hashed_name, processed in super().post_process(
+                paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                processed_names.extend((name, hashed_name))
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in set(processed_names):
+            if name and name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as source:
+            content = source.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+        variants = {'.gz': gzip.compress(content, compresslevel=9)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(content)
+        for extension, compressed in variants.items():
+            if len(compressed) >= len(content):
+                continue
+            if self.exists(name + extension):
+                self.delete(name + extension)
+            self._save(name + extension, ContentFile(compressed))
+
+
+def content_name(name, digest):
+    """Имя файла по его хэшу: posts/ab/cd/abcd….webp."""
+    directory, basename = posixpath.split(name)
+    extension = os.path.splitext(basename)[1].lower()
+    return posixpath.join(
+        directory, digest[:2], digest[2:4], digest + extension)
+
+
+def is_content_name(name):
+    return re.search(CONTENT_NAME_PATTERN, name) is not None
+
+
+def file_digest(content):
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Раскладывает файлы по хэшу содержимого в дереве каталогов.
+
+    Одинаковые файлы получают одно имя и хранятся один раз. Удалять
+    файл, на который больше никто не ссылается, — дело вызывающего кода,
+    см. posts.files.
+    """
+
+    def _save(self, name, content):
+        name = content_name(name, file_digest(content))
+        if self.exists(name):
+            # свежая отметка времени не даст сборщику мусора удалить файл,
+            # пока новая ссылка на него ещё не записана
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
+
+
+content_storage = ContentAddressedStorage()
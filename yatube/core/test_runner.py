@@ -0,0 +1,26 @@
+import os
+import shutil
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Запуск тестов, при котором сигналы пишут файлы во временную папку.
+
+    Индекс спама дописывается при сохранении любого поста или
+    комментария, и без этого каждый прогон оставлял бы его в проекте.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.temp_dir = tempfile.mkdtemp(prefix='yatube-tests-')
+        self.temp_settings = override_settings(
+            SPAM_INDEX_PATH=os.path.join(self.temp_dir, 'spam', 'index.bin'))
+        self.temp_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.temp_settings.disable()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
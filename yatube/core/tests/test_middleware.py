@@ -0,0 +1,40 @@
+import gzip
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from ..middleware import CompressionMiddleware
+
+CONTENT = b'<p>yatube</p>' * 100
+
+
+@override_settings(COMPRESSION_LEVELS={'text/html': 6})
+class CompressionMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.request = RequestFactory().get(
+            '/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+    def process(self, response):
+        return CompressionMiddleware(lambda request: response)(self.request)
+
+    def test_html_is_compressed(self):
+        """HTML сжимается, ETag становится слабым."""
+        response = HttpResponse(CONTENT)
+        response['ETag'] = '"abc"'
+        response = self.process(response)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertEqual(gzip.decompress(response.content), CONTENT)
+
+    def test_streaming_is_compressed_by_chunks(self):
+        """Потоковый ответ сжимается по мере отдачи."""
+        response = self.process(StreamingHttpResponse([CONTENT, CONTENT]))
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(gzip.decompress(b''.join(chunks)), CONTENT * 2)
+
+    def test_unlisted_types_are_not_compressed(self):
+        """Типы без уровня в настройках не сжимаются."""
+        response = self.process(
+            HttpResponse(CONTENT, content_type='image/png'))
+        self.assertFalse(response.has_header('Content-Encoding'))
@@ -0,0 +1,83 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from ..static import IMMUTABLE, StaticFilesMiddleware
+from ..storage import CompressedManifestStaticFilesStorage
+
+TEMP_STATIC_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = b'body { color: red; }\n' * 100
+
+
+def fallback(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/html')])
+    return [b'django']
+
+
+@override_settings(STATIC_ROOT=TEMP_STATIC_ROOT)
+class StaticFilesMiddlewareTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with open(os.path.join(TEMP_STATIC_ROOT, 'site.css'), 'wb') as file:
+            file.write(CONTENT)
+        storage = CompressedManifestStaticFilesStorage(
+            location=TEMP_STATIC_ROOT)
+        storage.compress('site.css')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_STATIC_ROOT, ignore_errors=True)
+
+    def request(self, path, **headers):
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path}
+        environ.update(headers)
+        response = {}
+
+        def start_response(status, response_headers):
+            response['status'] = status
+            response['headers'] = dict(response_headers)
+
+        body = StaticFilesMiddleware(fallback)(environ, start_response)
+        response['body'] = b''.join(body)
+        return response
+
+    def test_serves_precompressed_variant(self):
+        """Клиенту, принимающему gzip, отдаётся сжатая копия."""
+        response = self.request(
+            '/static/site.css', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['headers']['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response['body']), CONTENT)
+
+    def test_range_request(self):
+        """Range-запрос возвращает часть файла."""
+        response = self.request('/static/site.css', HTTP_RANGE='bytes=5-9')
+        self.assertEqual(response['status'], '206 Partial Content')
+        self.assertEqual(response['body'], CONTENT[5:10])
+        response = self.request(
+            '/static/site.css', HTTP_RANGE=f'bytes={len(CONTENT)}-')
+        self.assertEqual(response['status'], '416 Range Not Satisfiable')
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304."""
+        etag = self.request('/static/site.css')['headers']['ETag']
+        response = self.request('/static/site.css', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response['status'], '304 Not Modified')
+
+    def test_hashed_names_are_immutable(self):
+        """Файлы с хэшем в имени кэшируются навсегда."""
+        shutil.copy(os.path.join(TEMP_STATIC_ROOT, 'site.css'),
+                    os.path.join(TEMP_STATIC_ROOT, 'site.0123456789ab.css'))
+        response = self.request('/static/site.0123456789ab.css')
+        self.assertEqual(response['headers']['Cache-Control'], IMMUTABLE)
+
+    def test_missing_files_go_to_django(self):
+        """Запросы мимо файлов и за пределы каталога уходят в Django."""
+        for path in ('/static/missing.css', '/static/../manage.py', '/'):
+            with self.subTest(path=path):
+                self.assertEqual(self.request(path)['body'], b'django')
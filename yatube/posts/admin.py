@@ -1,18 +1,103 @@
 from django.contrib import admin
-from .models import Post, Group
+from .deletion import schedule_deletion
+from .models import (Comment, DailyStats, DeletionJob, Follow, Group, Post,
+                     SpamFlag)
+from .pagination import EstimatedCountPaginator
+from .sharding import for_id
+from .widgets import AdminGroupAutocomplete
+
+
+def delete_in_background(modeladmin, request, queryset):
+    for obj in queryset:
+        schedule_deletion(obj)
+    modeladmin.message_user(
+        request, f'Поставлено в очередь на удаление: {len(queryset)}')
+
+
+delete_in_background.short_description = 'Удалить в фоне'
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список без точного COUNT(*) для таблиц на миллионы строк."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
+
+
+class ShardedAdmin(LargeTableAdmin):
+    """Страница записи читает её с шарда, на котором она лежит."""
+
+    def get_object(self, request, object_id, from_field=None):
+        if from_field is not None or not str(object_id).isdigit():
+            return super().get_object(request, object_id, from_field)
+        queryset = for_id(self.get_queryset(request), int(object_id))
+        return queryset.filter(pk=object_id).first()
 
 
 class GroupAdmin(admin.ModelAdmin):
-    list_display = ('title', 'slug', 'description')
+    list_display = ('title', 'slug', 'description', 'is_deleted')
+    search_fields = ('title', 'slug')
+    actions = [delete_in_background]
 
 
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(ShardedAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
-    list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
-    empty_value_display = '-пусто-'
+    date_hierarchy = 'pub_date'
+    raw_id_fields = ('author',)
+    actions = [delete_in_background]
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['widget'] = AdminGroupAutocomplete
+            kwargs['queryset'] = Group.objects.filter(is_deleted=False)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class CommentAdmin(ShardedAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'post')
+    list_select_related = ('author', 'post')
+    search_fields = ('text',)
+    date_hierarchy = 'created'
+    raw_id_fields = ('author', 'post')
+
+
+class FollowAdmin(ShardedAdmin):
+    list_display = ('pk', 'user', 'author', 'created')
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+
+
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'kind', 'object_id', 'stage', 'processed',
+                    'created', 'finished')
+    list_filter = ('kind',)
+    readonly_fields = ('kind', 'object_id', 'stage', 'processed',
+                       'created', 'finished')
+
+
+class DailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('day', 'posts', 'comments')
+    date_hierarchy = 'day'
+    readonly_fields = ('day', 'posts', 'comments')
+
+
+class SpamFlagAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'kind', 'object_id', 'author', 'duplicates',
+                    'created')
+    list_filter = ('kind',)
+    list_select_related = ('author',)
+    readonly_fields = ('kind', 'object_id', 'author', 'duplicates',
+                       'created')
 
 
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Post, PostAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
+admin.site.register(DeletionJob, DeletionJobAdmin)
+admin.site.register(DailyStats, DailyStatsAdmin)
+admin.site.register(SpamFlag, SpamFlagAdmin)
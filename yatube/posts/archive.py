@@ -0,0 +1,108 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import prefetch_related_objects
+
+from . import versions
+
+# старые посты с комментариями, перенесённые командой archive_posts
+ARCHIVE_MODELS = {'posts.archivedpost', 'posts.archivedcomment'}
+COLD_COUNT_KEY = 'archive:count:{}:{}'
+
+
+def archive_db():
+    return settings.ARCHIVE_DATABASE
+
+
+def is_separate():
+    return archive_db() != DEFAULT_DB_ALIAS
+
+
+class TieredFeed:
+    """Лента из горячей таблицы постов и архива за ней.
+
+    Поддерживает count() и срезы, поэтому подходит для Paginator. Архив
+    старше любого горячего поста, так что ленты просто склеиваются, и
+    пока срез не выходит за конец горячей части, архив не читается.
+    Число постов в архиве кэшируется до смены версии 'archive': её
+    поднимают archive_posts, удаление и отвязка архивных постов и
+    выключение пользователя.
+    """
+
+    def __init__(self, hot, cold):
+        self.hot = hot
+        self.cold = cold
+        if is_separate():
+            # авторы и группы лежат в основной базе
+            self.cold = cold.select_related(None)
+        self._hot_count = None
+
+    def hot_count(self):
+        if self._hot_count is None:
+            self._hot_count = self.hot.count()
+        return self._hot_count
+
+    def cold_count(self):
+        version, = versions.get_versions(['archive'])
+        query = hashlib.md5(str(self.cold.query).encode()).hexdigest()
+        key = COLD_COUNT_KEY.format(version, query)
+        count = cache.get(key)
+        if count is None:
+            count = self.cold.count()
+            cache.set(key, count, None)
+        return count
+
+    def count(self):
+        return self.hot_count() + self.cold_count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        hot_count = self.hot_count()
+        posts = list(self.hot[start:min(stop, hot_count)]) if (
+            start < hot_count) else []
+        if stop > hot_count:
+            cold = list(self.cold[max(start - hot_count, 0):
+                                  stop - hot_count])
+            if is_separate():
+                prefetch_related_objects(cold, 'author', 'group')
+            posts += cold
+        return posts
+
+
+class ArchiveRouter:
+    """Отправляет архив в базу ARCHIVE_DATABASE."""
+
+    def _db(self, model, instance):
+        if model._meta.label_lower in ARCHIVE_MODELS:
+            return archive_db()
+        if (instance is not None
+                and instance._meta.label_lower in ARCHIVE_MODELS):
+            # автор и группа архивного поста лежат в основной базе
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._db(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self._db(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        labels = {obj1._meta.label_lower, obj2._meta.label_lower}
+        if labels & ARCHIVE_MODELS:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if f'{app_label}.{model_name}' in ARCHIVE_MODELS:
+            return db == archive_db()
+        if db == archive_db() and is_separate():
+            return False
+        return None
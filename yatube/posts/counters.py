@@ -0,0 +1,109 @@
+import atexit
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import Post
+from .sharding import per_shard
+
+COUNT_KEY = 'views:{}'
+PENDING_KEY = 'views:pending'
+FLUSH_LOCK_KEY = 'views:flush'
+
+_lock = threading.Lock()
+_buffer = Counter()
+_last_merge = time.monotonic()
+
+
+def _incr(key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, None):
+            cache.incr(key, delta)
+
+
+def record_view(post_id):
+    """Считает просмотр в памяти процесса.
+
+    Раз в VIEW_COUNTER_MERGE_INTERVAL секунд буфер сливается в общий
+    кэш, а раз в VIEW_COUNTER_FLUSH_INTERVAL один из процессов пишет
+    накопленное в базу.
+    """
+    global _last_merge
+    with _lock:
+        _buffer[post_id] += 1
+        if time.monotonic() - _last_merge < (
+                settings.VIEW_COUNTER_MERGE_INTERVAL):
+            return
+        _last_merge = time.monotonic()
+    merge()
+    if cache.add(FLUSH_LOCK_KEY, 1, settings.VIEW_COUNTER_FLUSH_INTERVAL):
+        flush()
+
+
+def merge():
+    """Переносит буфер процесса в кэш."""
+    global _buffer
+    with _lock:
+        counts, _buffer = _buffer, Counter()
+    if not counts:
+        return
+    for post_id, delta in counts.items():
+        _incr(COUNT_KEY.format(post_id), delta)
+    # гонка за список может потерять id, тогда его счётчик
+    # уйдёт в базу после следующего просмотра
+    cache.set(PENDING_KEY, cache.get(PENDING_KEY, set()) | set(counts), None)
+
+
+def flush():
+    """Пишет накопленные в кэше просмотры одним UPDATE ... CASE на шард."""
+    post_ids = cache.get(PENDING_KEY, set())
+    if not post_ids:
+        return 0
+    keys = {COUNT_KEY.format(post_id): post_id for post_id in post_ids}
+    counts = {keys[key]: value
+              for key, value in cache.get_many(list(keys)).items() if value}
+    cache.set(PENDING_KEY, cache.get(PENDING_KEY, set()) - post_ids, None)
+    if not counts:
+        return 0
+    for post_id, value in counts.items():
+        # вычитаем, а не удаляем: пока шла запись, могли прийти просмотры
+        try:
+            cache.decr(COUNT_KEY.format(post_id), value)
+        except ValueError:
+            # ключ вытеснен после чтения: вычитать уже не из чего
+            pass
+    increment = Case(
+        *(When(pk=post_id, then=Value(value))
+          for post_id, value in counts.items()),
+        output_field=IntegerField(),
+    )
+    for queryset in per_shard(Post.objects.filter(pk__in=counts)):
+        queryset.update(views_count=F('views_count') + increment)
+    return len(counts)
+
+
+def view_count(post):
+    """Примерное число просмотров без запросов к базе."""
+    pending = cache.get(COUNT_KEY.format(post.pk), 0)
+    return post.views_count + pending + _buffer[post.pk]
+
+
+def count_views(view):
+    """Считает просмотр до кэша страниц, чтобы учитывались и попадания."""
+    @wraps(view)
+    def wrapper(request, post_id, **kwargs):
+        response = view(request, post_id=post_id, **kwargs)
+        if request.method == 'GET' and response.status_code in (200, 304):
+            record_view(post_id)
+        return response
+    return wrapper
+
+
+atexit.register(merge)
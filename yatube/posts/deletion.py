@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (ArchivedComment, ArchivedPost, Block, Comment,
+                     DeletionJob, Follow, Group, GroupFollow, Mention, Mute,
+                     Post, Recommendation)
+from .sharding import per_shard
+from .versions import bump
+
+User = get_user_model()
+
+
+def _delete(queryset, batch_size):
+    # посты, комментарии и подписки разложены по шардам
+    for queryset in per_shard(queryset):
+        pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if pks:
+            # delete() по id, чтобы сработали сигналы и сброс кэшей
+            queryset.model.objects.using(queryset.db).filter(
+                pk__in=pks).delete()
+            return len(pks)
+    return 0
+
+
+def _detach_posts(group_id, batch_size, model=Post):
+    detached = 0
+    for queryset in per_shard(model.objects.filter(group_id=group_id)):
+        pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if pks:
+            detached = model.objects.using(queryset.db).filter(
+                pk__in=pks).update(group=None)
+            break
+    if detached and model is ArchivedPost:
+        # update() не шлёт сигналов, а архив ленты группы стал короче
+        bump('archive')
+    return detached
+
+
+# этапы каскада: (название, функция(object_id, batch_size) -> обработано)
+STAGES = {
+    DeletionJob.USER: (
+        ('comments', lambda pk, size: _delete(
+            Comment.objects.filter(author_id=pk), size)),
+        ('post_comments', lambda pk, size: _delete(
+            Comment.objects.filter(post__author_id=pk), size)),
+        ('follows', lambda pk, size: _delete(
+            Follow.objects.filter(Q(user_id=pk) | Q(author_id=pk)), size)),
+        ('group_follows', lambda pk, size: _delete(
+            GroupFollow.objects.filter(user_id=pk), size)),
+        ('mutes', lambda pk, size: _delete(
+            Mute.objects.filter(Q(user_id=pk) | Q(author_id=pk)), size)),
+        ('blocks', lambda pk, size: _delete(
+            Block.objects.filter(Q(user_id=pk) | Q(author_id=pk)), size)),
+        ('recommendations', lambda pk, size: _delete(
+            Recommendation.objects.filter(Q(user_id=pk) | Q(author_id=pk)),
+            size)),
+        ('mentions', lambda pk, size: _delete(
+            Mention.objects.filter(user_id=pk), size)),
+        ('posts', lambda pk, size: _delete(
+            Post.objects.filter(author_id=pk), size)),
+        # архив может лежать в другой базе, каскад до него не дойдёт
+        ('archived_comments', lambda pk, size: _delete(
+            ArchivedComment.objects.filter(author_id=pk), size)),
+        ('archived_posts', lambda pk, size: _delete(
+            ArchivedPost.objects.filter(author_id=pk), size)),
+        ('object', lambda pk, size: _delete(
+            User.objects.filter(pk=pk), size)),
+    ),
+    DeletionJob.GROUP: (
+        ('posts', _detach_posts),
+        ('followers', lambda pk, size: _delete(
+            GroupFollow.objects.filter(group_id=pk), size)),
+        ('mutes', lambda pk, size: _delete(
+            Mute.objects.filter(group_id=pk), size)),
+        ('archived_posts', lambda pk, size: _detach_posts(
+            pk, size, ArchivedPost)),
+        ('object', lambda pk, size: _delete(
+            Group.objects.filter(pk=pk), size)),
+    ),
+    DeletionJob.POST: (
+        ('comments', lambda pk, size: _delete(
+            Comment.objects.filter(post_id=pk), size)),
+        ('object', lambda pk, size: _delete(
+            Post.objects.filter(pk=pk), size)),
+    ),
+}
+
+
+def schedule_deletion(obj):
+    """Сразу скрывает объект из лент и ставит его удаление в очередь.
+
+    Пользователь выключается через is_active, посты и группы помечаются
+    is_deleted. Сам каскад выполняет команда process_deletions.
+    """
+    if isinstance(obj, User):
+        kind, field, value = DeletionJob.USER, 'is_active', False
+    elif isinstance(obj, Group):
+        kind, field, value = DeletionJob.GROUP, 'is_deleted', True
+    else:
+        kind, field, value = DeletionJob.POST, 'is_deleted', True
+    with transaction.atomic():
+        setattr(obj, field, value)
+        obj.save(update_fields=[field])
+        job, _ = DeletionJob.objects.get_or_create(
+            kind=kind, object_id=obj.pk, finished=None)
+    return job
+
+
+def run_batch(job, batch_size):
+    """Выполняет одну пачку задания.
+
+    Этап и счётчик сохраняются вместе с пачкой, поэтому прерванное
+    задание продолжается с того же места. Возвращает False, когда
+    удалять больше нечего.
+    """
+    stages = STAGES[job.kind]
+    names = [name for name, _ in stages]
+    index = names.index(job.stage) if job.stage else 0
+    while index < len(stages):
+        name, step = stages[index]
+        with transaction.atomic():
+            done = step(job.object_id, batch_size)
+            job.stage = name
+            if done:
+                job.processed += done
+                job.save(update_fields=['stage', 'processed'])
+                return True
+            index += 1
+            if index < len(stages):
+                job.stage = names[index]
+                job.save(update_fields=['stage'])
+    job.finished = timezone.now()
+    job.save(update_fields=['finished'])
+    return False
+
+
+def purge_orphan_comments(batch_size):
+    """Удаляет пачку комментариев, оставшихся без поста."""
+    return _delete(Comment.objects.filter(post__isnull=True), batch_size)
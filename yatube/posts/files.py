@@ -0,0 +1,108 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from sorl.thumbnail.images import ImageFile
+
+from core.storage import content_storage
+
+from .archive import archive_db
+from .images import variant_name
+from .models import ArchivedPost, Post, StoredFile
+from .sharding import shards
+from .thumbnails import evict_thumbnails
+
+
+def evict(name):
+    # ключ миниатюры зависит от хранилища, одного имени недостаточно
+    evict_thumbnails(ImageFile(name, content_storage))
+
+
+def variant_names(name):
+    return [variant_name(name, width)
+            for width in settings.POST_IMAGE_WIDTHS]
+
+
+def acquire(name, count=1):
+    """Отмечает, что на файл сослались ещё count постов."""
+    changes = {'refs': F('refs') + count, 'updated': timezone.now()}
+    if StoredFile.objects.filter(name=name).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            StoredFile.objects.create(name=name, refs=count)
+    except IntegrityError:
+        # строку успел создать параллельный запрос
+        StoredFile.objects.filter(name=name).update(**changes)
+
+
+def release(name):
+    """Снимает ссылку поста на файл.
+
+    Сам файл удаляет collect_garbage, когда ссылок не осталось дольше
+    MEDIA_GC_GRACE секунд, а миниатюры сбрасываются сразу.
+    """
+    StoredFile.objects.filter(name=name).update(
+        refs=F('refs') - 1, updated=timezone.now())
+    if not StoredFile.objects.filter(name=name, refs__gt=0).exists():
+        evict(name)
+
+
+def referenced(names):
+    """Сколько постов на самом деле ссылается на каждое из имён."""
+    counts = Counter()
+    sources = [Post.objects.using(alias) for alias in shards()]
+    sources.append(ArchivedPost.objects.using(archive_db()))
+    for queryset in sources:
+        counts.update(dict(queryset.filter(image__in=names).order_by()
+                           .values_list('image').annotate(Count('pk'))))
+    return counts
+
+
+def is_fresh(name, cutoff):
+    """Файл только что загрузили повторно, ссылка на него ещё в пути."""
+    return (content_storage.exists(name)
+            and content_storage.get_modified_time(name) > cutoff)
+
+
+def delete_file(name):
+    for variant in variant_names(name):
+        default_storage.delete(variant)
+    content_storage.delete(name)
+    evict(name)
+
+
+def collect_garbage(grace=None, batch_size=500):
+    """Удаляет файлы без ссылок, возвращает число удалённых.
+
+    Перед удалением ссылки пересчитываются по самим постам: счётчик
+    мог разойтись, если строки удалялись в обход сигналов.
+    """
+    if grace is None:
+        grace = settings.MEDIA_GC_GRACE
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    garbage = StoredFile.objects.filter(
+        refs__lte=0, updated__lt=cutoff).order_by('pk')
+    deleted = 0
+    last_pk = 0
+    while True:
+        batch = list(garbage.filter(pk__gt=last_pk).values_list(
+            'pk', 'name')[:batch_size])
+        if not batch:
+            return deleted
+        last_pk = batch[-1][0]
+        counts = referenced([name for _, name in batch])
+        for pk, name in batch:
+            if counts[name]:
+                StoredFile.objects.filter(pk=pk).update(refs=counts[name])
+                continue
+            if is_fresh(name, cutoff):
+                continue
+            # строку могли снова захватить, пока шла проверка
+            if StoredFile.objects.filter(pk=pk, refs__lte=0).delete()[0]:
+                delete_file(name)
+                deleted += 1
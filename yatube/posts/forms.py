@@ -1,15 +1,78 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
 
-from .models import Post, Comment
+from . import spam
+from .images import reencode
+from .models import Group, Post, Comment
+from .widgets import GroupAutocomplete
 
 
-class PostForm(forms.ModelForm):
+class PostImageField(forms.ImageField):
+    """Картинка поста с ограничением по размеру файла и сторонам."""
+
+    def to_python(self, data):
+        if getattr(data, 'oversized', False):
+            raise forms.ValidationError(
+                'Размер картинки не должен превышать '
+                f'{settings.POST_IMAGE_MAX_BYTES // (1024 * 1024)} МБ'
+            )
+        image = super().to_python(data)
+        if image is not None and (
+                max(image.image.size) > settings.POST_IMAGE_MAX_SIDE):
+            raise forms.ValidationError(
+                'Сторона картинки не должна превышать '
+                f'{settings.POST_IMAGE_MAX_SIDE} пикселей'
+            )
+        return image
+
+
+class SpamCheckMixin:
+    """Не принимает почти-копии уже опубликованных текстов.
+
+    Работает при SPAM_ACTION = 'reject', иначе такие тексты только
+    отмечаются после сохранения, см. posts.signals.
+    """
+
+    spam_kind = None
+
+    def clean_text(self):
+        text = self.cleaned_data['text']
+        if settings.SPAM_ACTION != 'reject':
+            return text
+        exclude = None
+        if self.instance.pk is not None:
+            exclude = (self.spam_kind, self.instance.pk)
+        if spam.is_spam(text, exclude):
+            raise forms.ValidationError(
+                'Почти такой же текст уже публиковался несколько раз')
+        return text
+
+
+class PostForm(SpamCheckMixin, forms.ModelForm):
+    spam_kind = spam.POST
+
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
+        field_classes = {'image': PostImageField}
+        widgets = {'group': GroupAutocomplete}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['group'].queryset = Group.objects.filter(
+            is_deleted=False)
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return reencode(image)
+        return image
+
 
+class CommentForm(SpamCheckMixin, forms.ModelForm):
+    spam_kind = spam.COMMENT
 
-class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
@@ -0,0 +1,91 @@
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .versions import bump
+
+HIDDEN_KEY = 'hidden:{}'
+
+
+def _contains(ids, value):
+    index = bisect_left(ids, value)
+    return index < len(ids) and ids[index] == value
+
+
+def _ids(values):
+    return array('q', sorted(set(values)))
+
+
+class Hidden(namedtuple('Hidden', 'authors groups blocked')):
+    """Скрытое пользователем: отсортированные массивы id для bisect.
+
+    ``authors`` — заглушённые авторы, ``blocked`` — заблокированные,
+    ``groups`` — заглушённые группы. Массивы array('q') занимают в кэше
+    по восемь байт на id.
+    """
+
+    def is_empty(self):
+        return not (self.authors or self.groups or self.blocked)
+
+    def hides_author(self, author_id):
+        return self.has_muted(author_id) or self.has_blocked(author_id)
+
+    def hides_post(self, post):
+        return self.hides_author(post.author_id) or (
+            post.group_id is not None
+            and self.has_muted_group(post.group_id))
+
+    def has_muted(self, author_id):
+        return _contains(self.authors, author_id)
+
+    def has_muted_group(self, group_id):
+        return _contains(self.groups, group_id)
+
+    def has_blocked(self, user_id):
+        return _contains(self.blocked, user_id)
+
+    def filter_posts(self, posts):
+        return [post for post in posts if not self.hides_post(post)]
+
+    def filter_comments(self, comments):
+        return [comment for comment in comments
+                if not self.hides_author(comment.author_id)]
+
+
+NOTHING = Hidden(_ids(()), _ids(()), _ids(()))
+
+
+def _load(user):
+    mutes = list(user.mutes.values_list('author_id', 'group_id'))
+    return Hidden(
+        authors=_ids(author_id for author_id, _ in mutes if author_id),
+        groups=_ids(group_id for _, group_id in mutes if group_id),
+        blocked=_ids(user.blocks.values_list('author_id', flat=True)),
+    )
+
+
+def hidden_for(user):
+    """Скрытое пользователем, из кэша или двумя запросами к базе.
+
+    Без SHARED_CACHE сброс forget() не дошёл бы до других процессов,
+    и блокировка там не действовала бы, поэтому списки читаются из базы.
+    """
+    if not user.is_authenticated:
+        return NOTHING
+    if not settings.SHARED_CACHE:
+        return _load(user)
+    key = HIDDEN_KEY.format(user.pk)
+    hidden = cache.get(key)
+    if hidden is None:
+        hidden = _load(user)
+        cache.set(key, hidden, None)
+    return hidden
+
+
+def forget(user_id):
+    cache.delete(HIDDEN_KEY.format(user_id))
+    # ленты пользователя без скрытого выглядят иначе
+    bump(f'hidden:{user_id}')
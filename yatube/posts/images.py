@@ -0,0 +1,105 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from PIL import Image, ImageOps
+
+FORMAT_EXTENSIONS = {
+    'WEBP': '.webp',
+    'JPEG': '.jpg',
+    'PNG': '.png',
+}
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """Обрывает загрузку файла, как только он превысил допустимый размер.
+
+    Лишние чанки не передаются следующим обработчикам, поэтому слишком
+    большой файл не попадает ни в память, ни во временный файл.
+    Вместо него форма получает пустой файл с атрибутом ``oversized``.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.oversized = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            self.oversized = True
+        if self.oversized:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not self.oversized:
+            return None
+        upload = SimpleUploadedFile(self.file_name, b'', self.content_type)
+        upload.size = file_size
+        upload.oversized = True
+        return upload
+
+
+def reencode(file):
+    """Убирает метаданные и перекодирует картинку в POST_IMAGE_FORMAT."""
+    file.seek(0)
+    with Image.open(file) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in source.info
+                                  else 'RGB')
+        # новая картинка без info: EXIF, ICC и комментарии не копируются
+        clean = Image.new(image.mode, image.size)
+        clean.paste(image)
+    output = BytesIO()
+    image_format = settings.POST_IMAGE_FORMAT
+    if image_format == 'JPEG' and clean.mode == 'RGBA':
+        clean = clean.convert('RGB')
+    clean.save(output, image_format, quality=settings.POST_IMAGE_QUALITY)
+    stem = os.path.splitext(os.path.basename(file.name))[0]
+    return ContentFile(
+        output.getvalue(), name=stem + FORMAT_EXTENSIONS[image_format])
+
+
+def variant_name(name, width):
+    stem, extension = os.path.splitext(name)
+    return f'{stem}_{width}w{extension}'
+
+
+def _save_variant(name, source, width):
+    crop_width, crop_height = settings.POST_IMAGE_CROP
+    height = round(width * crop_height / crop_width)
+    variant = ImageOps.fit(source, (width, height), Image.LANCZOS)
+    output = BytesIO()
+    variant.save(output, settings.POST_IMAGE_FORMAT,
+                 quality=settings.POST_IMAGE_QUALITY)
+    name = variant_name(name, width)
+    default_storage.delete(name)
+    default_storage.save(name, ContentFile(output.getvalue()))
+    return width
+
+
+def build_variants(name):
+    """Создаёт адаптивные варианты картинки в пуле потоков.
+
+    Возвращает строку с ширинами созданных вариантов через запятую.
+    Картинка, уже загруженная кем-то раньше, лежит под тем же именем,
+    и её готовые варианты не нарезаются заново.
+    """
+    widths = settings.POST_IMAGE_WIDTHS
+    if all(default_storage.exists(variant_name(name, width))
+           for width in widths):
+        return ','.join(str(width) for width in widths)
+    with default_storage.open(name) as file:
+        with Image.open(file) as image:
+            source = image.copy()
+    with ThreadPoolExecutor(max_workers=len(widths)) as pool:
+        done = pool.map(lambda width: _save_variant(name, source, width),
+                        widths)
+        return ','.join(str(width) for width in done)
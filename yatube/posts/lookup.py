@@ -0,0 +1,46 @@
+import hashlib
+
+from django.core.cache import cache
+
+from .models import Group
+from .versions import get_versions
+
+GROUP_PREFIX_KEY = 'groups:prefix:{}:{}'
+GROUP_PREFIX_TIMEOUT = 60 * 60
+AUTOCOMPLETE_LIMIT = 20
+# больше любого символа, так что [prefix, prefix + MAX_CHAR) — все
+# строки, начинающиеся с prefix
+MAX_CHAR = '\U0010ffff'
+
+
+def prefix_filter(field, prefix):
+    """Условие «начинается с» в виде диапазона, который идёт по индексу.
+
+    LIKE 'prefix%' без учёта регистра индекс не использует, а сравнение
+    с границами диапазона — использует.
+    """
+    return {f'{field}__gte': prefix, f'{field}__lt': prefix + MAX_CHAR}
+
+
+def search_groups(term, limit=AUTOCOMPLETE_LIMIT):
+    """Группы, название или слаг которых начинается с term.
+
+    Ответы кэшируются по префиксу до следующего изменения групп.
+    """
+    prefix = term.strip().casefold()
+    version, = get_versions(['groups'])
+    key = GROUP_PREFIX_KEY.format(
+        version, hashlib.md5(prefix.encode()).hexdigest())
+    found = cache.get(key)
+    if found is not None:
+        return found
+    groups = Group.objects.filter(is_deleted=False)
+    found = list(groups.filter(**prefix_filter(
+        'search_title', prefix)).order_by('search_title').values_list(
+        'pk', 'title')[:limit])
+    if len(found) < limit:
+        found += groups.filter(**prefix_filter('slug', prefix)).exclude(
+            pk__in=[pk for pk, _ in found]).order_by('slug').values_list(
+            'pk', 'title')[:limit - len(found)]
+    cache.set(key, found, GROUP_PREFIX_TIMEOUT)
+    return found
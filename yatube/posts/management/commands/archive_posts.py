@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.utils import timezone
+
+from posts.archive import archive_db
+from posts.models import ArchivedComment, ArchivedPost, Comment, Post
+from posts.sharding import shards
+from posts.versions import bump
+
+POST_FIELDS = ('id', 'text', 'pub_date', 'author_id', 'group_id', 'image',
+               'image_widths', 'is_deleted', 'text_html', 'excerpt_html',
+               'views_count')
+COMMENT_FIELDS = ('id', 'post_id', 'author_id', 'text', 'text_html',
+                  'created')
+
+
+class Command(BaseCommand):
+    help = ('Переносит посты старше POST_ARCHIVE_AFTER_DAYS дней '
+            'вместе с комментариями в архив')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=settings.POST_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--no-vacuum', action='store_true',
+                            help='не сжимать базы после переноса')
+
+    def handle(self, *args, days, batch_size, no_vacuum, **options):
+        cutoff = timezone.now() - timedelta(days=days)
+        total = 0
+        for alias in shards():
+            while True:
+                moved = self.move(alias, cutoff, batch_size)
+                if not moved:
+                    break
+                total += moved
+        if total:
+            # ленты те же, но архивная часть стала длиннее
+            bump('archive')
+            if not no_vacuum:
+                self.vacuum()
+        self.stdout.write(f'Перенесено в архив постов: {total}')
+
+    def move(self, alias, cutoff, batch_size):
+        """Переносит одну пачку постов шарда, самые старые первыми."""
+        posts = list(Post.objects.using(alias).filter(
+            pub_date__lt=cutoff).order_by('pub_date', 'pk').values(
+            *POST_FIELDS)[:batch_size])
+        if not posts:
+            return 0
+        pks = [post['id'] for post in posts]
+        comments = list(Comment.objects.using(alias).filter(
+            post_id__in=pks).values(*COMMENT_FIELDS))
+        target = archive_db()
+        with transaction.atomic(using=alias), \
+                transaction.atomic(using=target):
+            ArchivedPost.objects.using(target).bulk_create(
+                [ArchivedPost(**post) for post in posts])
+            ArchivedComment.objects.using(target).bulk_create(
+                [ArchivedComment(**comment) for comment in comments],
+                batch_size=batch_size)
+            # без сигналов и каскадов: строки не удаляются, а переезжают;
+            # хэштеги и упоминания продолжают ссылаться на те же id
+            Comment.objects.using(alias).filter(
+                post_id__in=pks)._raw_delete(alias)
+            Post.objects.using(alias).filter(pk__in=pks)._raw_delete(alias)
+        return len(posts)
+
+    def vacuum(self):
+        """Возвращает освободившееся место файлам баз."""
+        for alias in {*shards(), archive_db()}:
+            connection = connections[alias]
+            if connection.vendor not in ('sqlite', 'postgresql'):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
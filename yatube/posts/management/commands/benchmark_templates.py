@@ -0,0 +1,71 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template import engines
+from django.template.backends.jinja2 import Jinja2
+from django.test import RequestFactory
+from django.utils import timezone
+
+from posts.models import Group, Post, User
+
+TEMPLATES = ('posts/index.html', 'posts/group_list.html',
+             'posts/profile.html')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время рендеринга шаблонов лент в Django '
+            'и Jinja2 на страницах из 10, 50 и 100 постов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,50,100')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def make_context(self, size):
+        author = User(id=1, username='author', first_name='Лев',
+                      last_name='Толстой')
+        group = Group(id=1, title='Группа', slug='group')
+        now = timezone.now()
+        posts = [
+            Post(id=i, text=f'Текст поста {i}\nвторая строка',
+                 author=author, group=group, pub_date=now)
+            for i in range(size)
+        ]
+        page_obj = Paginator(posts, size).page(1)
+        return {'page_obj': page_obj, 'group': group, 'author': author}
+
+    def measure(self, template, context, request, repeat):
+        timings = []
+        for _ in range(repeat):
+            # фрагментный кэш index.html иначе спрятал бы рендеринг
+            cache.clear()
+            start = time.perf_counter()
+            template.render(dict(context), request)
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings) * 1000
+
+    def handle(self, *args, **options):
+        django_engine = engines['django']
+        params = dict(settings.JINJA2_TEMPLATES, NAME='benchmark')
+        del params['BACKEND']
+        jinja_engine = Jinja2(params)
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        for size in (int(size) for size in options['sizes'].split(',')):
+            context = self.make_context(size)
+            for name in TEMPLATES:
+                django_ms = self.measure(
+                    django_engine.get_template(name), context, request,
+                    options['repeat'])
+                jinja_ms = self.measure(
+                    jinja_engine.get_template(name), context, request,
+                    options['repeat'])
+                self.stdout.write(
+                    f'{name}, постов {size}: Django {django_ms:.2f} мс, '
+                    f'Jinja2 {jinja_ms:.2f} мс '
+                    f'(x{django_ms / jinja_ms:.1f})'
+                )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации "на кого подписаться"'
+
+    def handle(self, *args, **options):
+        total = build_recommendations()
+        self.stdout.write(f'Сохранено рекомендаций: {total}')
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.files import collect_garbage
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы картинок, на которые не ссылается ни один пост'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int,
+                            default=settings.MEDIA_GC_GRACE,
+                            help='сколько секунд файл может быть без ссылок')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, grace, batch_size, **options):
+        deleted = collect_garbage(grace, batch_size)
+        self.stdout.write(f'Удалено файлов: {deleted}')
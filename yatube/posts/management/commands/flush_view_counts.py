@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import flush, merge
+
+
+class Command(BaseCommand):
+    help = 'Записывает накопленные просмотры постов в базу'
+
+    def handle(self, *args, **options):
+        merge()
+        total = flush()
+        self.stdout.write(f'Обновлено постов: {total}')
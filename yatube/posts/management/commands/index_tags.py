@@ -0,0 +1,59 @@
+import os
+from collections import deque
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post
+from posts.sharding import per_shard
+from posts.tags import index_posts, parse_post
+
+
+def parse_batch(rows):
+    return [parse_post(row) for row in rows]
+
+
+class Command(BaseCommand):
+    help = 'Заполняет индекс хэштегов и упоминаний для всех постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Процессы для разбора текста; запись идёт из основного')
+
+    def batches(self, batch_size):
+        for queryset in per_shard(Post.objects.order_by('pk').values_list(
+                'pk', 'pub_date', 'text')):
+            last_pk = 0
+            while True:
+                rows = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+                if not rows:
+                    break
+                last_pk = rows[-1][0]
+                yield rows
+
+    def handle(self, *args, batch_size, workers, **options):
+        batches = self.batches(batch_size)
+        total = 0
+        if workers > 1:
+            # чтение и запись остаются в основном процессе и его потоке,
+            # в работе одновременно не больше workers пачек
+            pending = deque()
+            with Pool(workers) as pool:
+                for rows in batches:
+                    pending.append(pool.apply_async(parse_batch, (rows,)))
+                    if len(pending) >= workers:
+                        total += self.write(pending.popleft().get())
+                while pending:
+                    total += self.write(pending.popleft().get())
+        else:
+            for rows in batches:
+                total += self.write(parse_batch(rows))
+        self.stdout.write(f'Проиндексировано постов: {total}')
+
+    def write(self, parsed):
+        with transaction.atomic():
+            index_posts(parsed)
+        return len(parsed)
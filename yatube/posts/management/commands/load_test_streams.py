@@ -0,0 +1,134 @@
+import asyncio
+import resource
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.urls import reverse
+
+from posts.models import Comment, Post, User
+from posts.sharding import for_id
+
+
+class Command(BaseCommand):
+    help = ('Открывает тысячи потоков комментариев поста на запущенном '
+            'сервере, пишет комментарии и замеряет задержку доставки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('post_id', type=int)
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--listeners', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=20)
+        parser.add_argument('--interval', type=float, default=0.5,
+                            help='пауза между комментариями, в секундах')
+        parser.add_argument('--author', help='по умолчанию автор поста')
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, post_id, url, listeners, author, **options):
+        post = for_id(Post.objects, post_id).filter(pk=post_id).first()
+        if post is None:
+            raise CommandError(f'Нет поста {post_id}')
+        self.post = post
+        self.author = (User.objects.get(username=author) if author
+                       else post.author)
+        self.address = urlsplit(url)
+        self.path = reverse('posts:comment_stream', args=(post_id,))
+        self.raise_open_files(listeners)
+        asyncio.run(self.run(listeners, **options))
+
+    def raise_open_files(self, listeners):
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < listeners + 100:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    async def run(self, listeners, comments, interval, timeout, **options):
+        self.connected = 0
+        self.failed = 0
+        self.created = {}
+        self.received = []
+        everyone = asyncio.Event()
+        tasks = [asyncio.create_task(self.listen(listeners, everyone))
+                 for _ in range(listeners)]
+        try:
+            await asyncio.wait_for(everyone.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.stdout.write(f'Подключено {self.connected} из {listeners}, '
+                          f'ошибок {self.failed}')
+        loop = asyncio.get_running_loop()
+        for number in range(comments):
+            pk, created = await loop.run_in_executor(
+                None, self.create_comment, number)
+            self.created[pk] = created
+            await asyncio.sleep(interval)
+        # последние комментарии ещё идут через опрос таблицы событий
+        await asyncio.sleep(min(timeout, 5))
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.report(comments)
+
+    def create_comment(self, number):
+        try:
+            comment = Comment.objects.create(
+                post=self.post, author=self.author,
+                text=f'Нагрузочный комментарий {number}')
+            return comment.pk, time.monotonic()
+        finally:
+            close_old_connections()
+
+    async def listen(self, listeners, everyone):
+        host = self.address.hostname
+        port = self.address.port or (
+            443 if self.address.scheme == 'https' else 80)
+        try:
+            reader, writer = await asyncio.open_connection(
+                host, port, ssl=self.address.scheme == 'https')
+            # HTTP/1.0: тело идёт до закрытия соединения, без chunked
+            writer.write(f'GET {self.path} HTTP/1.0\r\nHost: {host}\r\n'
+                         f'Accept: text/event-stream\r\n\r\n'.encode())
+            status = await reader.readline()
+            if b' 200 ' not in status:
+                raise ConnectionError(status.decode().strip())
+            while (await reader.readline()).strip():
+                pass
+        except (OSError, ConnectionError) as error:
+            self.failed += 1
+            if self.failed == 1:
+                self.stderr.write(f'Не удалось подключиться: {error}')
+            self.settle(listeners, everyone)
+            return
+        self.connected += 1
+        self.settle(listeners, everyone)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                if line.startswith(b'id: '):
+                    self.received.append(
+                        (int(line[4:]), time.monotonic()))
+        finally:
+            writer.close()
+
+    def settle(self, listeners, everyone):
+        if self.connected + self.failed == listeners:
+            everyone.set()
+
+    def report(self, comments):
+        delays = [received - self.created[pk]
+                  for pk, received in self.received if pk in self.created]
+        expected = self.connected * comments
+        self.stdout.write(
+            f'Доставлено {len(delays)} из {expected} событий'
+            + (f' ({len(delays) / expected:.1%})' if expected else ''))
+        if len(delays) < 2:
+            return
+        quantiles = statistics.quantiles(delays, n=100)
+        self.stdout.write(
+            f'Задержка: медиана {statistics.median(delays) * 1000:.0f} мс, '
+            f'p95 {quantiles[94] * 1000:.0f} мс, '
+            f'p99 {quantiles[98] * 1000:.0f} мс, '
+            f'максимум {max(delays) * 1000:.0f} мс')
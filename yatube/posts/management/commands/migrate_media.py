@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core.storage import CONTENT_NAME_PATTERN, content_storage
+from posts.archive import archive_db
+from posts.files import acquire
+from posts.images import variant_name
+from posts.models import ArchivedPost, Post
+from posts.sharding import shards
+
+
+def copy_file(name):
+    """Копирует файл и его варианты под имя по хэшу.
+
+    Работает только с файлами, без базы, поэтому годится для потоков.
+    Возвращает новое имя или None, если файла нет.
+    """
+    if not content_storage.exists(name):
+        return None
+    with content_storage.open(name) as file:
+        new_name = content_storage.save(name, file)
+    for width in settings.POST_IMAGE_WIDTHS:
+        old_variant = variant_name(name, width)
+        new_variant = variant_name(new_name, width)
+        if (default_storage.exists(old_variant)
+                and not default_storage.exists(new_variant)):
+            with default_storage.open(old_variant) as file:
+                default_storage.save(new_variant, file)
+    return new_name
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов из общего каталога в дерево '
+            'по хэшу содержимого')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, workers, batch_size, **options):
+        sources = [Post.objects.using(alias) for alias in shards()]
+        sources.append(ArchivedPost.objects.using(archive_db()))
+        missing = set()
+        moved = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for queryset in sources:
+                while True:
+                    names = list(queryset.exclude(image='').exclude(
+                        image__regex=CONTENT_NAME_PATTERN).exclude(
+                        image__in=missing).order_by().values_list(
+                        'image', flat=True).distinct()[:batch_size])
+                    if not names:
+                        break
+                    for name, new_name in zip(
+                            names, pool.map(copy_file, names)):
+                        if new_name is None:
+                            missing.add(name)
+                            continue
+                        self.relink(sources, name, new_name)
+                        moved += 1
+        self.stdout.write(f'Перенесено файлов: {moved}')
+        if missing:
+            self.stderr.write(f'Не найдено файлов: {len(missing)}')
+
+    def relink(self, sources, name, new_name):
+        refs = sum(queryset.filter(image=name).update(image=new_name)
+                   for queryset in sources)
+        acquire(new_name, refs)
+        # старый файл удалит collect_media, когда страницы со ссылками
+        # на него выпадут из кэшей
+        acquire(name, 0)
@@ -0,0 +1,56 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.deletion import purge_orphan_comments, run_batch
+from posts.models import DeletionJob
+from posts.surrogate import batched_purges
+
+
+class Command(BaseCommand):
+    help = ('Выполняет отложенные удаления пачками и чистит комментарии '
+            'без поста')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.DELETION_BATCH_SIZE)
+        parser.add_argument(
+            '--pause', type=float, default=settings.DELETION_BATCH_PAUSE,
+            help='Пауза между пачками в секундах, чтобы не держать базу')
+        parser.add_argument(
+            '--max-batches', type=int, default=0,
+            help='Остановиться после стольких пачек, 0 — без ограничения')
+
+    def handle(self, *args, batch_size, pause, max_batches, **options):
+        batches = 0
+
+        def throttle():
+            nonlocal batches
+            batches += 1
+            if pause:
+                time.sleep(pause)
+            return max_batches and batches >= max_batches
+
+        def batch(step, *args):
+            # страницы пачки сбрасываются вместе, а не по строке
+            with batched_purges():
+                return step(*args)
+
+        for job in DeletionJob.objects.filter(finished=None):
+            while batch(run_batch, job, batch_size):
+                if throttle():
+                    self.stdout.write('Достигнут лимит пачек')
+                    return
+            self.stdout.write(
+                f'Удалено: {job}, обработано строк: {job.processed}')
+
+        orphans = 0
+        while True:
+            done = batch(purge_orphan_comments, batch_size)
+            if not done:
+                break
+            orphans += done
+            if throttle():
+                break
+        self.stdout.write(f'Удалено комментариев без поста: {orphans}')
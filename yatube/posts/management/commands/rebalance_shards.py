@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Comment, Follow, Post
+from posts.sharding import shard_for, shards
+
+
+class Command(BaseCommand):
+    help = ('Переносит посты с комментариями и подписки на шарды, '
+            'положенные им по POST_SHARDS')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, batch_size, **options):
+        moved_posts = moved_follows = 0
+        for source in shards():
+            for author_id in self.misplaced(Post, 'author_id', source):
+                moved_posts += self.move_posts(
+                    source, author_id, batch_size)
+            for user_id in self.misplaced(Follow, 'user_id', source):
+                moved_follows += self.move(
+                    Follow.objects.filter(user_id=user_id),
+                    source, shard_for(user_id), batch_size)
+        self.stdout.write(
+            f'Перенесено постов: {moved_posts}, подписок: {moved_follows}')
+
+    def misplaced(self, model, key, source):
+        keys = model.objects.using(source).values_list(
+            key, flat=True).distinct()
+        return [value for value in keys if shard_for(value) != source]
+
+    def copy(self, rows, target):
+        """Пишет строки в другую базу, сохраняя id."""
+        for row in rows:
+            row._state.db = None
+        type(rows[0]).objects.using(target).bulk_create(rows)
+
+    def move(self, queryset, source, target, batch_size):
+        total = 0
+        while True:
+            rows = list(queryset.using(source)[:batch_size])
+            if not rows:
+                return total
+            with transaction.atomic(using=source), \
+                    transaction.atomic(using=target):
+                pks = [row.pk for row in rows]
+                self.copy(rows, target)
+                # без сигналов и каскадов: строки не удаляются, а переезжают
+                queryset.model.objects.using(source).filter(
+                    pk__in=pks)._raw_delete(source)
+            total += len(rows)
+
+    def move_posts(self, source, author_id, batch_size):
+        target = shard_for(author_id)
+        total = 0
+        while True:
+            posts = list(Post.objects.using(source).filter(
+                author_id=author_id)[:batch_size])
+            if not posts:
+                return total
+            pks = [post.pk for post in posts]
+            with transaction.atomic(using=source), \
+                    transaction.atomic(using=target):
+                self.copy(posts, target)
+                self.move(Comment.objects.filter(post_id__in=pks),
+                          source, target, batch_size)
+                Post.objects.using(source).filter(
+                    pk__in=pks)._raw_delete(source)
+            total += len(posts)
@@ -0,0 +1,80 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+from posts.models import (ArchivedComment, ArchivedPost, AuthorDailyStats,
+                          Comment, DailyStats, Follow, GroupDailyStats, Post)
+from posts.sharding import shards
+
+
+def grouped(queryset, date_field, *fields):
+    """Число строк по дню и полям, посчитанное одним GROUP BY в базе."""
+    rows = queryset.annotate(day=TruncDate(date_field)).values(
+        'day', *fields).annotate(count=Count('pk')).order_by()
+    for row in rows.iterator():
+        yield tuple(row[field] for field in ('day', *fields)), row['count']
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает сводные таблицы статистики по постам, '
+            'комментариям и подпискам')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        posts = Counter()
+        comments = Counter()
+        followers = Counter()
+        post_sources = [Post.objects.using(alias) for alias in shards()]
+        comment_sources = [Comment.objects.using(alias) for alias in shards()]
+        for queryset in post_sources + [ArchivedPost.objects.all()]:
+            posts.update(dict(grouped(
+                queryset, 'pub_date', 'author_id', 'group_id')))
+        for queryset in comment_sources + [ArchivedComment.objects.all()]:
+            comments.update(dict(grouped(queryset, 'created')))
+        for alias in shards():
+            followers.update(dict(grouped(
+                Follow.objects.using(alias).filter(created__isnull=False),
+                'created', 'author_id')))
+
+        daily = Counter()
+        by_author = Counter()
+        by_group = Counter()
+        for (day, author_id, group_id), count in posts.items():
+            daily[day] += count
+            by_author[day, author_id] += count
+            if group_id is not None:
+                by_group[day, group_id] += count
+
+        rows = {
+            DailyStats: [
+                DailyStats(day=day, posts=daily[day],
+                           comments=comments[(day,)])
+                for day in set(daily) | {day for day, in comments}
+            ],
+            AuthorDailyStats: [
+                AuthorDailyStats(
+                    day=day, author_id=author_id,
+                    posts=by_author[day, author_id],
+                    followers=followers[day, author_id])
+                for day, author_id in set(by_author) | set(followers)
+            ],
+            GroupDailyStats: [
+                GroupDailyStats(day=day, group_id=group_id, posts=count)
+                for (day, group_id), count in by_group.items()
+            ],
+        }
+        # счётчики, изменённые сигналами во время пересчёта, будут
+        # перезаписаны, поэтому команду лучше запускать в тихие часы
+        with transaction.atomic():
+            for model, objects in rows.items():
+                model.objects.all().delete()
+                model.objects.bulk_create(objects, batch_size=batch_size)
+        self.stdout.write(
+            f'Дней: {len(rows[DailyStats])}, '
+            f'строк авторов: {len(rows[AuthorDailyStats])}, '
+            f'строк групп: {len(rows[GroupDailyStats])}')
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = 'Заполняет готовый HTML текстов постов и комментариев'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересчитать все записи, а не только незаполненные')
+
+    def handle(self, *args, batch_size, **options):
+        for model, fields in ((Post, ['text_html', 'excerpt_html']),
+                              (Comment, ['text_html'])):
+            queryset = model.objects.all()
+            if not options['all']:
+                queryset = queryset.filter(text_html='')
+            total = self.render(queryset, fields, batch_size)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: обновлено {total}')
+
+    def render(self, queryset, fields, batch_size):
+        total, last_pk = 0, 0
+        queryset = queryset.order_by('pk').only('pk', 'text')
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                return total
+            for obj in batch:
+                obj.render()
+            queryset.model.objects.bulk_update(batch, fields)
+            total += len(batch)
+            last_pk = batch[-1].pk
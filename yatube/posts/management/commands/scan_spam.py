@@ -0,0 +1,117 @@
+import os
+from collections import deque
+from multiprocessing import Pool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import spam
+from posts.archive import archive_db
+from posts.models import (ArchivedComment, ArchivedPost, Comment, Post,
+                          SpamFlag)
+from posts.sharding import shards
+
+
+def sign_batch(rows):
+    return [(pk, author_id, spam.signature(text))
+            for pk, author_id, text in rows]
+
+
+class Command(BaseCommand):
+    help = ('Заново строит индекс почти одинаковых текстов по всем постам '
+            'и комментариям и отмечает спам')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Процессы для подписей текстов; индекс строит основной')
+
+    def sources(self):
+        for alias in shards():
+            yield spam.POST, Post.objects.using(alias)
+        yield spam.POST, ArchivedPost.objects.using(archive_db())
+        for alias in shards():
+            yield spam.COMMENT, Comment.objects.using(alias)
+        yield spam.COMMENT, ArchivedComment.objects.using(archive_db())
+
+    def batches(self, queryset, batch_size):
+        last_pk = 0
+        queryset = queryset.order_by('pk').values_list(
+            'pk', 'author_id', 'text')
+        while True:
+            rows = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not rows:
+                return
+            last_pk = rows[-1][0]
+            yield rows
+
+    def handle(self, *args, batch_size, workers, **options):
+        path = settings.SPAM_INDEX_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            start = os.path.getsize(path)
+        except FileNotFoundError:
+            start = 0
+        self.index = spam.SpamIndex()
+        self.flags = 0
+        pool = Pool(workers) if workers > 1 else None
+        try:
+            with open(path + '.tmp', 'wb') as self.file:
+                for kind, queryset in self.sources():
+                    batches = self.batches(queryset, batch_size)
+                    for signed in self.sign(pool, workers, batches):
+                        self.add(kind, signed)
+                self.copy_tail(path, start)
+        finally:
+            if pool is not None:
+                pool.terminate()
+        os.replace(path + '.tmp', path)
+        self.stdout.write(f'Проверено текстов: {len(self.index.signatures)}, '
+                          f'отмечено как спам: {self.flags}')
+
+    def sign(self, pool, workers, batches):
+        if pool is None:
+            for rows in batches:
+                yield sign_batch(rows)
+            return
+        # чтение и запись остаются в основном процессе,
+        # в работе одновременно не больше workers пачек
+        pending = deque()
+        for rows in batches:
+            pending.append(pool.apply_async(sign_batch, (rows,)))
+            if len(pending) >= workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    def add(self, kind, signed):
+        """Добавляет пачку в индекс, сверяя каждый текст с предыдущими."""
+        flag_kind = SpamFlag.POST if kind == spam.POST else SpamFlag.COMMENT
+        records = []
+        flags = []
+        for pk, author_id, sig in signed:
+            if sig is None:
+                continue
+            key = (kind, pk)
+            found = self.index.similar(sig, exclude=key)
+            self.index.add(key, sig)
+            records.append((key, sig))
+            if len(found) >= settings.SPAM_MIN_DUPLICATES:
+                flags.append(SpamFlag(
+                    kind=flag_kind, object_id=pk, author_id=author_id,
+                    duplicates=len(found)))
+        spam.write_records(self.file, records)
+        SpamFlag.objects.bulk_create(flags, ignore_conflicts=True)
+        self.flags += len(flags)
+
+    def copy_tail(self, path, start):
+        # тексты, опубликованные во время проверки, не должны пропасть
+        try:
+            with open(path, 'rb') as file:
+                file.seek(start)
+                tail = file.read()
+        except FileNotFoundError:
+            return
+        self.file.write(tail[:len(tail) // spam.RECORD.size
+                             * spam.RECORD.size])
@@ -0,0 +1,51 @@
+import re
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.html import format_html, urlize
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator, normalize_newlines
+
+TAG_MAX_LENGTH = 50
+# хэштеги и упоминания считаются только в начале слова, чтобы не цеплять
+# якоря в ссылках и адреса почты
+TOKEN = re.compile(
+    r'(?<!\S)(?:#(?P<tag>\w{1,%d})(?!\w)|@(?P<user>[\w.+-]*\w))'
+    % TAG_MAX_LENGTH)
+
+
+def extract_tags(text):
+    return {match['tag'].lower() for match in TOKEN.finditer(text)
+            if match['tag']}
+
+
+def extract_mentions(text):
+    return {match['user'] for match in TOKEN.finditer(text)
+            if match['user']}
+
+
+def _link(match):
+    if match['tag']:
+        url = reverse('posts:tag', args=(match['tag'].lower(),))
+    else:
+        url = reverse('posts:profile', args=(match['user'],))
+    return format_html('<a href="{}">{}</a>', url, match[0])
+
+
+def render_text(text):
+    """HTML текста: экранирование, ссылки с nofollow, хэштеги, упоминания
+    и переносы строк."""
+    text = normalize_newlines(text)
+    parts, last = [], 0
+    for match in TOKEN.finditer(text):
+        parts.append(urlize(text[last:match.start()], nofollow=True,
+                            autoescape=True))
+        parts.append(_link(match))
+        last = match.end()
+    parts.append(urlize(text[last:], nofollow=True, autoescape=True))
+    return mark_safe(''.join(parts).replace('\n', '<br>'))
+
+
+def render_excerpt(text):
+    """HTML начала текста для лент, не длиннее POST_EXCERPT_LENGTH."""
+    return render_text(Truncator(text).chars(settings.POST_EXCERPT_LENGTH))
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_recommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_widths',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-19 15:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_pub_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletionJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('user', 'Пользователь'), ('group', 'Группа'), ('post', 'Пост')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('stage', models.CharField(blank=True, max_length=30)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['created'],
+            },
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='is_deleted',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='is_deleted',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 2.2.16 on 2026-10-19 16:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import posts.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0017_shard_relations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPost',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField()),
+                ('pub_date', models.DateTimeField(db_index=True)),
+                ('image', models.ImageField(blank=True, upload_to='posts/')),
+                ('image_widths', models.CharField(blank=True, max_length=100)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('text_html', models.TextField(blank=True)),
+                ('excerpt_html', models.TextField(blank=True)),
+                ('views_count', models.PositiveIntegerField(default=0)),
+                ('author', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('group', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='posts.Group')),
+            ],
+            options={
+                'ordering': ['-pub_date'],
+            },
+            bases=(posts.models.PostImageMixin, models.Model),
+        ),
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField()),
+                ('text_html', models.TextField(blank=True)),
+                ('created', models.DateTimeField()),
+                ('author', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='posts.ArchivedPost')),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-19 16:17
+
+from django.db import migrations, models
+
+
+def fill_search_title(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    groups = list(Group.objects.only('title'))
+    for group in groups:
+        group.search_title = group.title.casefold()[:200]
+    Group.objects.bulk_update(groups, ['search_title'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_mute_block'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='search_title',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=200),
+        ),
+        migrations.RunPython(fill_search_title, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-19 16:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0023_stored_files'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpamFlag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('comment', 'Комментарий')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('duplicates', models.PositiveIntegerField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spam_flags', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created'],
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-19 17:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_comment_events'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='id',
+            field=models.BigAutoField(primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='deletionjob',
+            name='object_id',
+            field=models.BigIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='follow',
+            name='id',
+            field=models.BigAutoField(primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='id',
+            field=models.BigAutoField(primary_key=True, serialize=False),
+        ),
+    ]
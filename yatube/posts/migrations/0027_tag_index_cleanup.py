@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-19 17:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0026_big_sharded_ids'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mention',
+            name='post',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='mentions', to='posts.Post'),
+        ),
+        migrations.AlterField(
+            model_name='posttag',
+            name='post',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='tag_links', to='posts.Post'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-19 18:02
+
+from django.db import migrations
+
+from posts.markup import render_excerpt, render_text
+
+BATCH_SIZE = 500
+
+
+def render_rows(model, alias, excerpt):
+    """Заполняет пустой HTML пачками по возрастанию id."""
+    fields = ['text_html', 'excerpt_html'] if excerpt else ['text_html']
+    queryset = model.objects.using(alias).filter(
+        text_html='').order_by('pk').only('pk', 'text')
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            return
+        for obj in batch:
+            obj.text_html = render_text(obj.text)
+            if excerpt:
+                obj.excerpt_html = render_excerpt(obj.text)
+        model.objects.using(alias).bulk_update(batch, fields)
+        last_pk = batch[-1].pk
+
+
+def filler(model_name, excerpt):
+    def fill(apps, schema_editor):
+        render_rows(apps.get_model('posts', model_name),
+                    schema_editor.connection.alias, excerpt)
+    return fill
+
+
+def fill_operation(model_name, excerpt=False):
+    # подсказка нужна роутеру: посты и комментарии лежат и на шардах
+    return migrations.RunPython(
+        filler(model_name, excerpt), migrations.RunPython.noop,
+        hints={'model_name': model_name.lower()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0027_tag_index_cleanup'),
+    ]
+
+    operations = [
+        fill_operation('Post', excerpt=True),
+        fill_operation('Comment'),
+        fill_operation('ArchivedPost', excerpt=True),
+        fill_operation('ArchivedComment'),
+    ]
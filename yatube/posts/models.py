@@ -1,6 +1,13 @@
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, models, router
 from django.contrib.auth import get_user_model
 
+from core.storage import content_storage
+
+from . import sharding
+
+from .images import variant_name
+from .markup import TAG_MAX_LENGTH, render_excerpt, render_text
+
 User = get_user_model()
 
 
@@ -8,29 +15,103 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    is_deleted = models.BooleanField(default=False, editable=False)
+    # название без учёта регистра для поиска по префиксу, см. posts.lookup
+    search_title = models.CharField(
+        max_length=200, db_index=True, editable=False, default='')
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, update_fields=None, **kwargs):
+        if update_fields is None or 'title' in update_fields:
+            self.search_title = self.title.casefold()[:200]
+            if update_fields is not None:
+                update_fields = {*update_fields, 'search_title'}
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+
+class ShardedModel(models.Model):
+    """Модель, строки которой раскладываются по POST_SHARDS.
+
+    При нескольких шардах id выдаёт sharding.generator, а не
+    автоинкремент базы, чтобы он был уникален между шардами. Такие id
+    не помещаются в 32 бита, поэтому ключ и ссылки на него 64-битные.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and sharding.is_sharded():
+            # objects.create() передаёт базу менеджера, а не шард записи
+            using = router.db_for_write(type(self), instance=self)
+            kwargs.update(using=using)
+            if self.pk is None:
+                aliases = sharding.shards()
+                self.pk = sharding.generator.next_id(
+                    aliases.index(using) if using in aliases else 0)
+                kwargs.update(force_insert=True)
+        super().save(*args, **kwargs)
+
+
+class PostQuerySet(models.QuerySet):
+    def visible(self):
+        """Посты, не помеченные на удаление вместе с автором или сами."""
+        if sharding.is_sharded() or self.db != DEFAULT_DB_ALIAS:
+            # пользователи лежат в другой базе, JOIN с ними невозможен
+            inactive = User.objects.filter(is_active=False).values_list(
+                'pk', flat=True)
+            return self.filter(is_deleted=False).exclude(
+                author_id__in=list(inactive))
+        return self.filter(is_deleted=False, author__is_active=True)
+
 
-class Post(models.Model):
+class PostImageMixin:
+    is_archived = False
+
+    @property
+    def image_variant_url(self):
+        """Самый широкий из адаптивных вариантов картинки."""
+        if not self.image or not self.image_widths:
+            return ''
+        width = self.image_widths.split(',')[-1]
+        return self.image.storage.url(variant_name(self.image.name, width))
+
+    @property
+    def image_srcset(self):
+        """Адаптивные варианты картинки для атрибута srcset."""
+        if not self.image or not self.image_widths:
+            return ''
+        return ', '.join(
+            f'{self.image.storage.url(variant_name(self.image.name, width))}'
+            f' {width}w'
+            for width in self.image_widths.split(',')
+        )
+
+
+class Post(PostImageMixin, ShardedModel):
 
     def __str__(self):
         return self.text
 
     text = models.TextField(verbose_name='Текст поста',
                             help_text='Напишите пост')
-    pub_date = models.DateTimeField(auto_now_add=True)
+    pub_date = models.DateTimeField(auto_now_add=True, db_index=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='posts'
+        related_name='posts',
+        db_constraint=False,
     )
     group = models.ForeignKey(
         Group,
         blank=True,
         null=True,
         on_delete=models.SET_NULL,
+        db_constraint=False,
         related_name='posts',
         verbose_name='Группа',
         help_text='Выберите группу'
@@ -39,14 +120,44 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=content_storage,
         blank=True
     )
+    image_widths = models.CharField(
+        max_length=100,
+        blank=True,
+        editable=False,
+    )
+    is_deleted = models.BooleanField(default=False, editable=False)
+    # готовый HTML текста, считается при сохранении
+    text_html = models.TextField(blank=True, editable=False)
+    excerpt_html = models.TextField(blank=True, editable=False)
+    # пишется пачками из posts.counters, свежие просмотры лежат в кэше
+    views_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        # ленты подписок читают посты автора или группы с конца
+        indexes = [
+            models.Index(fields=['author', '-pub_date', '-id']),
+            models.Index(fields=['group', '-pub_date', '-id']),
+        ]
+
+    def render(self):
+        self.text_html = render_text(self.text)
+        self.excerpt_html = render_excerpt(self.text)
 
+    def save(self, *args, update_fields=None, **kwargs):
+        if update_fields is None or 'text' in update_fields:
+            self.render()
+            if update_fields is not None:
+                update_fields = {*update_fields, 'text_html', 'excerpt_html'}
+        super().save(*args, update_fields=update_fields, **kwargs)
 
-class Comment(models.Model):
+
+class Comment(ShardedModel):
     post = models.ForeignKey(
         Post,
         blank=True,
@@ -57,22 +168,354 @@ class Comment(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='comments'
+        related_name='comments',
+        db_constraint=False,
     )
     text = models.TextField(verbose_name='Текст комментария')
+    text_html = models.TextField(blank=True, editable=False)
 
-    created = models.DateTimeField(auto_now_add=True)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
 
+    def render(self):
+        self.text_html = render_text(self.text)
 
-class Follow(models.Model):
+    def save(self, *args, update_fields=None, **kwargs):
+        if update_fields is None or 'text' in update_fields:
+            self.render()
+            if update_fields is not None:
+                update_fields = {*update_fields, 'text_html'}
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+
+class Follow(ShardedModel):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='follower',
+        db_constraint=False,
+    )
+
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following',
+        db_constraint=False,
+    )
+    # у подписок, оформленных до появления поля, даты нет
+    created = models.DateTimeField(auto_now_add=True, null=True)
+
+
+class GroupFollow(models.Model):
+    """Подписка на группу; в отличие от Follow не шардируется."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='group_follows',
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='followers',
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'group')
+
+
+class Mute(models.Model):
+    """Автор или группа, скрытые из лент пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='mutes',
+    )
+    author = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    group = models.ForeignKey(
+        Group,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+
+    class Meta:
+        unique_together = (('user', 'author'), ('user', 'group'))
+
+
+class Block(models.Model):
+    """Заблокированный автор: скрыт как при Mute и не может подписаться."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='blocks',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='blocked_by',
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'author')
+
+
+class Recommendation(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['-score']
+        unique_together = ('user', 'author')
+
+
+class ArchivedPost(PostImageMixin, models.Model):
+    """Старый пост, перенесённый командой archive_posts.
+
+    Лежит в базе ARCHIVE_DATABASE и только читается.
+    """
+
+    is_archived = True
+
+    id = models.BigIntegerField(primary_key=True)
+    text = models.TextField()
+    pub_date = models.DateTimeField(db_index=True)
+    # архив может лежать в другой базе, каскад туда не дотянется;
+    # удалением занимается posts.deletion
+    author = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        related_name='+',
+        db_constraint=False,
+    )
+    group = models.ForeignKey(
+        Group,
+        null=True,
+        on_delete=models.DO_NOTHING,
+        related_name='+',
+        db_constraint=False,
+    )
+    image = models.ImageField(
+        upload_to='posts/', storage=content_storage, blank=True)
+    image_widths = models.CharField(max_length=100, blank=True)
+    is_deleted = models.BooleanField(default=False)
+    text_html = models.TextField(blank=True)
+    excerpt_html = models.TextField(blank=True)
+    views_count = models.PositiveIntegerField(default=0)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-pub_date']
+
+    def __str__(self):
+        return self.text
+
+
+class ArchivedComment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name='comments',
+    )
+    # архив может лежать в другой базе, каскад туда не дотянется;
+    # удалением занимается posts.deletion
+    author = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        related_name='+',
+        db_constraint=False,
+    )
+    text = models.TextField()
+    text_html = models.TextField(blank=True)
+    created = models.DateTimeField()
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=TAG_MAX_LENGTH, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class PostTag(models.Model):
+    """Обратный индекс хэштегов; дата поста продублирована для ленты."""
+
+    post = models.ForeignKey(
+        Post,
+        # пост может лежать на другом шарде, строки удаляет сигнал
+        on_delete=models.DO_NOTHING,
+        related_name='tag_links',
+        db_constraint=False,
+    )
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='post_links',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('post', 'tag')
+        indexes = [models.Index(fields=['tag', '-pub_date', '-post'])]
+
+
+class Mention(models.Model):
+    post = models.ForeignKey(
+        Post,
+        # пост может лежать на другом шарде, строки удаляет сигнал
+        on_delete=models.DO_NOTHING,
+        related_name='mentions',
+        db_constraint=False,
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('post', 'user')
+        indexes = [models.Index(fields=['user', '-pub_date', '-post'])]
+
+
+class DeletionJob(models.Model):
+    """Фоновое каскадное удаление объекта, см. posts.deletion."""
+
+    USER = 'user'
+    GROUP = 'group'
+    POST = 'post'
+    KINDS = (
+        (USER, 'Пользователь'),
+        (GROUP, 'Группа'),
+        (POST, 'Пост'),
     )
 
+    kind = models.CharField(max_length=10, choices=KINDS)
+    # id поста при шардировании 64-битный, см. ShardedModel
+    object_id = models.BigIntegerField()
+    stage = models.CharField(max_length=30, blank=True)
+    processed = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created']
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}'
+
+
+class DailyStats(models.Model):
+    """Счётчики по дням для всего сайта, см. posts.rollups."""
+
+    day = models.DateField(unique=True)
+    posts = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day']
+
+
+class AuthorDailyStats(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='following'
+        related_name='daily_stats',
+    )
+    day = models.DateField()
+    posts = models.IntegerField(default=0)
+    # подписки, оформленные в этот день и ещё не отменённые
+    followers = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day']
+        unique_together = ('author', 'day')
+
+
+class GroupDailyStats(models.Model):
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='daily_stats',
     )
+    day = models.DateField()
+    posts = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day']
+        unique_together = ('group', 'day')
+
+
+class StoredFile(models.Model):
+    """Число постов, ссылающихся на файл картинки, см. posts.files."""
+
+    name = models.CharField(max_length=255, unique=True)
+    refs = models.IntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return self.name
+
+
+class SpamFlag(models.Model):
+    """Пост или комментарий, почти повторяющий другие, см. posts.spam."""
+
+    POST = 'post'
+    COMMENT = 'comment'
+    KINDS = (
+        (POST, 'Пост'),
+        (COMMENT, 'Комментарий'),
+    )
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.BigIntegerField()
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='spam_flags',
+    )
+    # сколько почти-копий нашлось в момент публикации
+    duplicates = models.PositiveIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created']
+        unique_together = ('kind', 'object_id')
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}'
+
+
+class CommentEvent(models.Model):
+    """Новый комментарий для потоков других процессов, см. posts.streams.
+
+    Процессы опрашивают таблицу по возрастанию id, поэтому она лежит
+    в основной базе, а не на шардах.
+    """
+
+    post_id = models.BigIntegerField()
+    # готовые данные события, чтобы слушателям не ходить в базу
+    payload = models.TextField()
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -0,0 +1,60 @@
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.views.decorators.http import condition
+
+from .surrogate import SURROGATE_HEADER
+from .versions import feed_etag
+
+PAGE_KEY = 'page:{}'
+
+
+def is_anonymous(request):
+    """Без cookie сессии посетитель точно аноним, базу проверять не нужно."""
+    return settings.SESSION_COOKIE_NAME not in request.COOKIES
+
+
+def cache_anonymous_page(etag_func):
+    """Кэширует готовый HTML страницы для анонимных посетителей.
+
+    Ключ строится из ETag страницы, то есть из пути и версий лент,
+    поэтому после изменения данных старые копии просто не читаются.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or not is_anonymous(request)):
+                return view(request, *args, **kwargs)
+            etag = etag_func(request, *args, **kwargs)
+            key = PAGE_KEY.format(etag)
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type, surrogate_keys = cached
+                response = HttpResponse(content, content_type=content_type)
+                if surrogate_keys:
+                    response[SURROGATE_HEADER] = surrogate_keys
+                response['X-Page-Cache'] = 'hit'
+                return response
+            response = view(request, *args, **kwargs)
+            if (response.status_code == 200 and not response.streaming
+                    and not response.cookies):
+                cache.set(key, (response.content, response['Content-Type'],
+                                response.get(SURROGATE_HEADER)),
+                          settings.PAGE_CACHE_TIMEOUT)
+                response['X-Page-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
+
+
+def feed_page(view_name, period=None):
+    """Условные ответы по ETag и кэш страниц для анонимов вместе."""
+    etag_func = feed_etag(view_name, period)
+
+    def decorator(view):
+        view = cache_anonymous_page(etag_func)(view)
+        return condition(etag_func=etag_func)(view)
+    return decorator
@@ -0,0 +1,241 @@
+import heapq
+from collections import defaultdict
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# ниже этого числа строк точный COUNT(*) дешевле, чем неточная оценка
+ESTIMATE_THRESHOLD = 100000
+# во сколько раз растёт следующий запрос ленты, когда фильтр отсеял
+# часть строк, и сколько запросов можно сделать на одну страницу
+OVERFETCH_FACTOR = 2
+MAX_FETCHES = 5
+
+
+def estimated_count(model, using='default'):
+    """Оценка числа строк таблицы по статистике базы, None если её нет."""
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples FROM pg_class WHERE relname = %s'
+    elif connection.vendor == 'sqlite':
+        # первая цифра stat — число строк, собирается командой ANALYZE
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1'
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None:
+        return None
+    return int(str(row[0]).split()[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, который для нефильтрованной таблицы не считает COUNT(*).
+
+    На больших таблицах число строк берётся из статистики планировщика,
+    для отфильтрованных выборок и маленьких таблиц считается точно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if (query is None or query.where or query.low_mark
+                or query.high_mark is not None):
+            return super().count
+        estimate = estimated_count(queryset.model, queryset.db)
+        if estimate is None or estimate < ESTIMATE_THRESHOLD:
+            return super().count
+        return estimate
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class KeysetPage(Sequence):
+    """Страница ленты, продолжаемая курсором вместо номера."""
+
+    def __init__(self, object_list, cursor, next_cursor):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Пагинация по (дата, id) по убыванию без OFFSET и COUNT(*).
+
+    Следующая страница начинается строго после последней строки
+    предыдущей, поэтому запрос идёт по индексу с любой глубины ленты.
+    Курсор — микросекунды даты и id через точку.
+
+    ``keep`` — необязательный фильтр пачки строк, например скрытых
+    пользователем авторов. Отсеянное добирается следующими запросами,
+    каждый читает вдвое больше предыдущего, так что страница остаётся
+    полной, а в запрос не попадают длинные списки исключений.
+    """
+
+    def __init__(self, queryset, per_page, date_field='pub_date',
+                 id_field='pk', keep=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.date_field = date_field
+        self.id_field = id_field
+        self.keep = keep
+
+    def get_sources(self):
+        return [self.queryset]
+
+    def parse_cursor(self, cursor):
+        try:
+            micros, pk = (int(part) for part in cursor.split('.'))
+        except (AttributeError, ValueError):
+            return None
+        return EPOCH + micros * MICROSECOND, pk
+
+    def make_cursor(self, position):
+        date, pk = position
+        return f'{(date - EPOCH) // MICROSECOND}.{pk}'
+
+    def key(self, obj):
+        return getattr(obj, self.date_field), getattr(obj, self.id_field)
+
+    def after(self, queryset, position):
+        """Строки queryset строго после позиции курсора."""
+        queryset = queryset.order_by(
+            f'-{self.date_field}', f'-{self.id_field}')
+        if position is None:
+            return queryset
+        date, pk = position
+        return queryset.filter(
+            Q(**{f'{self.date_field}__lt': date})
+            | Q(**{self.date_field: date, f'{self.id_field}__lt': pk}))
+
+    def fetch(self, position, limit):
+        """До limit строк после позиции из всех источников.
+
+        Источники сливаются кучей размером в их число, строка, попавшая
+        в несколько источников, берётся один раз. Вторым значением
+        возвращается признак того, что строк больше нет.
+        """
+        streams = self.read([self.after(source, position)[:limit]
+                             for source in self.get_sources()])
+        rows = []
+        seen = set()
+        for obj in heapq.merge(*streams, key=self.key, reverse=True):
+            pk = getattr(obj, self.id_field)
+            if pk in seen:
+                continue
+            seen.add(pk)
+            rows.append(obj)
+            if len(rows) == limit:
+                break
+        return rows, all(len(stream) < limit for stream in streams)
+
+    def read(self, querysets):
+        """Строки каждой выборки отдельным списком."""
+        return [list(queryset) for queryset in querysets]
+
+    def page(self, cursor=None):
+        position = self.parse_cursor(cursor)
+        if position is None:
+            cursor = None
+        limit = self.per_page + 1
+        rows = []
+        for _ in range(MAX_FETCHES):
+            batch, exhausted = self.fetch(position, limit)
+            rows += batch if self.keep is None else self.keep(batch)
+            if len(rows) > self.per_page or exhausted:
+                break
+            position = self.key(batch[-1])
+            limit *= OVERFETCH_FACTOR
+        else:
+            # почти всё отсеялось: отдаём неполную страницу и продолжаем
+            # с места, где остановилось чтение
+            return KeysetPage(rows, cursor, self.make_cursor(position))
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = self.make_cursor(self.key(rows[-1]))
+        return KeysetPage(rows, cursor, next_cursor)
+
+
+def union_all(querysets):
+    """Читает выборки с LIMIT одним запросом UNION ALL на каждую базу.
+
+    Django не собирает UNION из подзапросов с ORDER BY и LIMIT на SQLite,
+    поэтому запрос склеивается из их SQL, а строки раскладываются по
+    выборкам по колонке _source. Выборки должны читать одни и те же
+    колонки одной модели; связанные объекты select_related не читаются.
+    """
+    results = [[] for _ in querysets]
+    by_db = defaultdict(list)
+    for index, queryset in enumerate(querysets):
+        by_db[queryset.db].append((index, queryset))
+    for using, group in by_db.items():
+        if len(group) == 1:
+            index, queryset = group[0]
+            results[index] = list(queryset)
+            continue
+        parts, params = [], []
+        for index, queryset in group:
+            query = queryset.select_related(None).query
+            sql, part_params = query.get_compiler(using).as_sql()
+            parts.append(f'SELECT *, {index} AS _source FROM ({sql}) '
+                         f'AS source{index}')
+            params.extend(part_params)
+        model = group[0][1].model
+        for obj in model._default_manager.raw(
+                ' UNION ALL '.join(parts), params, using=using):
+            results[obj._source].append(obj)
+    return results
+
+
+class MergedKeysetPaginator(KeysetPaginator):
+    """Keyset-пагинация по слиянию нескольких лент.
+
+    Каждый источник читается по индексу (дата, id) с LIMIT в размер
+    страницы, а все источники одной базы — одним запросом UNION ALL.
+    Работа зависит от размера страницы и числа источников, но не от
+    того, сколько строк подходит под каждый из них, а число запросов на
+    страницу — только от числа баз.
+    """
+
+    def __init__(self, sources, per_page, date_field='pub_date',
+                 id_field='pk', keep=None):
+        super().__init__(None, per_page, date_field, id_field, keep)
+        self.sources = sources
+
+    def get_sources(self):
+        return self.sources
+
+    def read(self, querysets):
+        streams = union_all(querysets)
+        # UNION ALL не обязан сохранять порядок подзапросов
+        for stream in streams:
+            stream.sort(key=self.key, reverse=True)
+        return streams
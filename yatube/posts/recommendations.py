@@ -0,0 +1,89 @@
+import heapq
+import random
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from .models import Follow, Post, Recommendation
+from .sharding import per_shard
+
+RECOMMENDATIONS_PER_USER = 10
+# вес общего автора "друга друга" и общего сообщества
+FRIEND_OF_FRIEND_WEIGHT = 1.0
+SHARED_GROUP_WEIGHT = 0.5
+# у популярных авторов тысячи подписок, берём только случайную часть
+MAX_FANOUT = 500
+BATCH_SIZE = 1000
+
+
+def load_follow_graph():
+    """Возвращает словарь {user_id: set(author_id)} из таблицы Follow."""
+    following = defaultdict(set)
+    for edges in per_shard(Follow.objects.values_list('user_id', 'author_id')):
+        for user_id, author_id in edges.iterator(chunk_size=10000):
+            following[user_id].add(author_id)
+    return following
+
+
+def load_group_members():
+    """Возвращает авторов по сообществам и сообщества по авторам."""
+    group_authors = defaultdict(set)
+    author_groups = defaultdict(set)
+    pairs = (Post.objects.exclude(group=None)
+             .values_list('author_id', 'group_id').distinct())
+    for pairs in per_shard(pairs):
+        for author_id, group_id in pairs.iterator(chunk_size=10000):
+            group_authors[group_id].add(author_id)
+            author_groups[author_id].add(group_id)
+    return group_authors, author_groups
+
+
+def _capped(ids):
+    if len(ids) <= MAX_FANOUT:
+        return ids
+    # не наименьшие id: иначе рекомендовались бы только старые аккаунты
+    return random.sample(list(ids), MAX_FANOUT)
+
+
+def score_user(user_id, following, group_authors, author_groups):
+    """Считает рекомендации для одного пользователя."""
+    followed = following.get(user_id, set())
+    scores = Counter()
+    for author_id in followed:
+        for candidate in _capped(following.get(author_id, ())):
+            scores[candidate] += FRIEND_OF_FRIEND_WEIGHT
+    for group_id in author_groups.get(user_id, ()):
+        for candidate in _capped(group_authors[group_id]):
+            scores[candidate] += SHARED_GROUP_WEIGHT
+    scores.pop(user_id, None)
+    for author_id in followed:
+        scores.pop(author_id, None)
+    return heapq.nlargest(
+        RECOMMENDATIONS_PER_USER, scores.items(), key=lambda item: item[1]
+    )
+
+
+def build_recommendations():
+    """Пересчитывает таблицу Recommendation целиком.
+
+    Возвращает количество сохранённых рекомендаций.
+    """
+    following = load_follow_graph()
+    group_authors, author_groups = load_group_members()
+    users = set(following) | set(author_groups)
+    batch = []
+    total = 0
+    with transaction.atomic():
+        Recommendation.objects.all().delete()
+        for user_id in users:
+            for author_id, score in score_user(
+                    user_id, following, group_authors, author_groups):
+                batch.append(Recommendation(
+                    user_id=user_id, author_id=author_id, score=score))
+            if len(batch) >= BATCH_SIZE:
+                Recommendation.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        Recommendation.objects.bulk_create(batch)
+        total += len(batch)
+    return total
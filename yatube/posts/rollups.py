@@ -0,0 +1,62 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import AuthorDailyStats, DailyStats, GroupDailyStats
+
+
+def day_of(value):
+    return timezone.localdate(value)
+
+
+def increment(model, keys, **deltas):
+    """Прибавляет deltas к строке сводной таблицы.
+
+    Строки создаются только при росте счётчиков: уменьшать
+    несуществующую строку незачем, а при каскадном удалении автора или
+    группы её уже могли удалить.
+    """
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**keys).update(**changes):
+        return
+    if all(delta <= 0 for delta in deltas.values()):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **deltas)
+    except IntegrityError:
+        # строку успел создать параллельный запрос
+        model.objects.filter(**keys).update(**changes)
+
+
+def count_post(post, delta):
+    day = day_of(post.pub_date)
+    increment(DailyStats, {'day': day}, posts=delta)
+    increment(AuthorDailyStats, {'author_id': post.author_id, 'day': day},
+              posts=delta)
+    count_group_post(post, delta, post.group_id)
+
+
+def count_group_post(post, delta, group_id):
+    if group_id is not None:
+        increment(GroupDailyStats,
+                  {'group_id': group_id, 'day': day_of(post.pub_date)},
+                  posts=delta)
+
+
+def move_post(post, old_group_id):
+    """Переносит пост в статистике другой группы после правки."""
+    count_group_post(post, -1, old_group_id)
+    count_group_post(post, 1, post.group_id)
+
+
+def count_comment(comment, delta):
+    increment(DailyStats, {'day': day_of(comment.created)}, comments=delta)
+
+
+def count_follow(follow, delta):
+    if follow.created is None:
+        return
+    increment(AuthorDailyStats,
+              {'author_id': follow.author_id, 'day': day_of(follow.created)},
+              followers=delta)
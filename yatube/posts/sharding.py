@@ -0,0 +1,253 @@
+import heapq
+import os
+import threading
+import time
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+
+# строки этих моделей лежат на шарде автора: посты — по автору,
+# комментарии — вместе со своим постом, подписки — по подписчику
+SHARDED_MODELS = {'posts.post', 'posts.comment', 'posts.follow'}
+
+# id: 41 бит миллисекунд от EPOCH_MS, 6 бит шарда, 5 бит процесса
+# и 11 бит счётчика внутри миллисекунды
+EPOCH_MS = 1640995200000
+SHARD_BITS = 6
+WORKER_BITS = 5
+SEQUENCE_BITS = 11
+SHARD_SHIFT = WORKER_BITS + SEQUENCE_BITS
+TIME_SHIFT = SHARD_BITS + SHARD_SHIFT
+
+
+def shards():
+    return settings.POST_SHARDS
+
+
+def is_sharded():
+    return len(shards()) > 1
+
+
+def shard_for(author_id):
+    aliases = shards()
+    return aliases[author_id % len(aliases)]
+
+
+class IdGenerator:
+    """Генератор глобально уникальных id в духе Snowflake.
+
+    id растут со временем и хранят номер шарда, поэтому по id поста
+    сразу понятно, в какой базе его искать.
+    """
+
+    def __init__(self, worker_id=None):
+        if worker_id is None:
+            worker_id = os.getpid()
+        self.worker_id = worker_id % (1 << WORKER_BITS)
+        self.lock = threading.Lock()
+        self.last_ms = 0
+        self.sequence = 0
+
+    def next_id(self, shard_index):
+        with self.lock:
+            now = max(int(time.time() * 1000), self.last_ms)
+            if now == self.last_ms:
+                self.sequence = (self.sequence + 1) % (1 << SEQUENCE_BITS)
+                if self.sequence == 0:
+                    # счётчик кончился, ждём следующую миллисекунду
+                    while now <= self.last_ms:
+                        now = int(time.time() * 1000)
+            else:
+                self.sequence = 0
+            self.last_ms = now
+            return ((now - EPOCH_MS) << TIME_SHIFT
+                    | shard_index << SHARD_SHIFT
+                    | self.worker_id << SEQUENCE_BITS
+                    | self.sequence)
+
+
+generator = IdGenerator(getattr(settings, 'SNOWFLAKE_WORKER_ID', None))
+
+
+def shard_of_id(pk):
+    """Шард записи по её id или None для id, выданных до шардирования."""
+    if pk >> TIME_SHIFT == 0:
+        return None
+    index = pk >> SHARD_SHIFT & ((1 << SHARD_BITS) - 1)
+    aliases = shards()
+    return aliases[index] if index < len(aliases) else None
+
+
+def _candidates(pk):
+    """Шарды, где может лежать запись: сначала тот, что записан в id.
+
+    Записанный шард — только подсказка: после смены POST_SHARDS
+    rebalance_shards переносит записи, не меняя их id. Старые id
+    номер шарда не несут вовсе.
+    """
+    encoded = shard_of_id(pk)
+    if encoded is None:
+        return shards()
+    return [encoded] + [alias for alias in shards() if alias != encoded]
+
+
+def for_id(queryset, pk):
+    """Выборка из шарда, где лежит запись с этим id."""
+    if not is_sharded():
+        return queryset
+    candidates = _candidates(pk)
+    alias = next((alias for alias in candidates if queryset.using(
+        alias).filter(pk=pk).exists()), candidates[0])
+    return queryset.using(alias)
+
+
+def in_bulk(queryset, pks):
+    if not is_sharded():
+        return queryset.in_bulk(pks)
+    # связанные записи лежат в основной базе, JOIN с ними невозможен
+    related = queryset.query.select_related
+    queryset = queryset.select_related(None)
+    by_shard = defaultdict(list)
+    for pk in pks:
+        by_shard[shard_of_id(pk)].append(pk)
+    found = {}
+    for alias, ids in by_shard.items():
+        for target in ([alias] if alias else shards()):
+            found.update(queryset.using(target).in_bulk(ids))
+    # перенесённые rebalance_shards записи ищутся на остальных шардах
+    missing = [pk for pk in pks if pk not in found
+               and shard_of_id(pk) is not None]
+    for alias in shards() if missing else ():
+        found.update(queryset.using(alias).in_bulk(missing))
+        missing = [pk for pk in missing if pk not in found]
+    if isinstance(related, dict):
+        prefetch_related_objects(list(found.values()), *related)
+    return found
+
+
+def merge_sorted(iterables, key, limit=None):
+    """k-путевое слияние лент, каждая отсортирована по убыванию key."""
+    merged = heapq.merge(*iterables, key=key, reverse=True)
+    return list(islice(merged, limit))
+
+
+class ScatterGather:
+    """Лента постов, собранная со всех шардов.
+
+    Поддерживает count() и срезы, поэтому подходит для Paginator: на
+    срез [a:b] каждый шард отдаёт первые b постов, а результат
+    сливается по (pub_date, id). Авторы и группы лежат в основной базе
+    и догружаются отдельно.
+    """
+
+    def __init__(self, queryset, aliases):
+        self.queryset = queryset.select_related(None).order_by(
+            '-pub_date', '-pk')
+        self.aliases = sorted(aliases)
+
+    def count(self):
+        return sum(self.queryset.using(alias).count()
+                   for alias in self.aliases)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        streams = [self.queryset.using(alias)[:stop]
+                   for alias in self.aliases]
+        posts = merge_sorted(
+            streams, key=lambda post: (post.pub_date, post.pk),
+            limit=stop)[start:]
+        prefetch_related_objects(posts, 'author', 'group')
+        return posts
+
+
+def _aliases(author_ids):
+    if author_ids is None:
+        return shards()
+    return sorted({shard_for(author_id) for author_id in author_ids})
+
+
+def scatter(queryset, author_ids=None):
+    """Лента по всем шардам или только по шардам этих авторов."""
+    if not is_sharded():
+        return queryset
+    return ScatterGather(queryset, _aliases(author_ids))
+
+
+def per_shard(queryset, author_ids=None):
+    """Та же выборка отдельно на каждом нужном шарде.
+
+    Авторы и группы лежат в основной базе, их нужно догрузить
+    prefetch_related_objects. Выборки нешардированных моделей
+    возвращаются как есть.
+    """
+    if (not is_sharded()
+            or queryset.model._meta.label_lower not in SHARDED_MODELS):
+        return [queryset]
+    if queryset.query.select_related:
+        queryset = queryset.select_related(None)
+    return [queryset.using(alias) for alias in _aliases(author_ids)]
+
+
+def gather(queryset):
+    """Строки выборки со всех шардов одним списком, без общего порядка."""
+    return [obj for part in per_shard(queryset) for obj in part]
+
+
+def partition_shard(instance):
+    """Шард, в который нужно записать объект шардированной модели."""
+    label = instance._meta.label_lower
+    if label == 'posts.post':
+        return shard_for(instance.author_id)
+    if label == 'posts.follow':
+        return shard_for(instance.user_id)
+    if instance.post_id is None:
+        return shards()[0]
+    post = instance.post
+    return post._state.db or shard_for(post.author_id)
+
+
+class ShardRouter:
+    """Разносит посты, комментарии и подписки по базам POST_SHARDS."""
+
+    def _shard(self, model, instance):
+        if not is_sharded() or instance is None:
+            return None
+        if model._meta.label_lower not in SHARDED_MODELS:
+            # иначе Django возьмёт базу объекта-подсказки, то есть шард
+            return 'default'
+        if instance._meta.label_lower in SHARDED_MODELS:
+            if instance._meta.model is model:
+                # у новой записи _state.db мог проставить ForeignKey
+                # по связанному объекту из другой базы
+                if instance._state.adding:
+                    return partition_shard(instance)
+                return instance._state.db
+            # комментарии поста лежат рядом с ним
+            return instance._state.db
+        if (instance._meta.label_lower == settings.AUTH_USER_MODEL.lower()
+                and model._meta.label_lower != 'posts.comment'):
+            # author.posts и user.follower — шард пользователя
+            return shard_for(instance.pk)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # связи между базами держит приложение, ограничений в БД нет
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == 'default' or db not in shards():
+            return None
+        return f'{app_label}.{model_name}' in SHARDED_MODELS
@@ -0,0 +1,192 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import files, hidden, rollups, spam, streams
+from .models import (ArchivedPost, Block, Comment, Follow, Group, GroupFollow,
+                     Mute, Post, SpamFlag)
+from .surrogate import purge
+from .tags import forget_post, index_post
+from .versions import bump
+
+User = get_user_model()
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_post(sender, instance, update_fields=None, **kwargs):
+    instance._old_group_id = instance.group_id
+    instance._old_image = '' if instance._state.adding else instance.image.name
+    if instance.pk is None or update_fields is not None and not (
+            {'image', 'group'} & set(update_fields)):
+        return
+    old = (Post.objects.using(instance._state.db).filter(pk=instance.pk)
+           .values_list('image', 'group_id').first())
+    if old is None:
+        instance._old_image = ''
+        return
+    instance._old_image, instance._old_group_id = old
+
+
+@receiver(post_save, sender=Post)
+def count_image_refs(sender, instance, **kwargs):
+    old_image = getattr(instance, '_old_image', instance.image.name)
+    if old_image == instance.image.name:
+        return
+    if instance.image:
+        files.acquire(instance.image.name)
+    if old_image:
+        files.release(old_image)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=ArchivedPost)
+def release_deleted_image(sender, instance, **kwargs):
+    if instance.image:
+        files.release(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_versions(sender, instance, **kwargs):
+    group_ids = {instance.group_id, getattr(instance, '_old_group_id', None)}
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True)
+    bump(
+        'index',
+        f'post:{instance.pk}',
+        f'profile:{instance.author.username}',
+        *(f'group:{slug}' for slug in slugs),
+    )
+
+
+@receiver(post_delete, sender=ArchivedPost)
+def bump_archive_version(sender, instance, **kwargs):
+    # число постов архива в лентах, см. TieredFeed.cold_count
+    bump('archive')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def purge_post_pages(sender, instance, signal, created=False,
+                     update_fields=None, **kwargs):
+    keys = {f'post-{instance.pk}'}
+    old_group_id = getattr(instance, '_old_group_id', instance.group_id)
+    deleted = signal is post_delete or 'is_deleted' in (update_fields or ())
+    # новый или удалённый пост сдвигает страницы всех своих лент
+    if created or deleted:
+        keys.update({'feed-index', f'author-{instance.author_id}'})
+    if created or deleted or old_group_id != instance.group_id:
+        slugs = Group.objects.filter(
+            pk__in={instance.group_id, old_group_id}).values_list(
+                'slug', flat=True)
+        keys.update(f'group-{slug}' for slug in slugs)
+    purge(*keys)
+
+
+@receiver(post_save, sender=Post)
+def index_post_tags(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'text' in update_fields:
+        index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def forget_post_tags(sender, instance, **kwargs):
+    forget_post(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def count_post(sender, instance, signal, created=False, **kwargs):
+    if signal is post_delete:
+        rollups.count_post(instance, -1)
+    elif created:
+        rollups.count_post(instance, 1)
+    elif instance._old_group_id != instance.group_id:
+        rollups.move_post(instance, instance._old_group_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def count_comment(sender, instance, signal, created=False, **kwargs):
+    if signal is post_delete or created:
+        rollups.count_comment(instance, -1 if signal is post_delete else 1)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_versions(sender, instance, **kwargs):
+    if instance.post_id is not None:
+        bump(f'post:{instance.post_id}')
+        purge(f'comments-{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def purge_follow_pages(sender, instance, **kwargs):
+    purge(f'author-{instance.author_id}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def count_follow(sender, instance, signal, created=False, **kwargs):
+    if signal is post_delete or created:
+        rollups.count_follow(instance, -1 if signal is post_delete else 1)
+
+
+@receiver(post_save, sender=GroupFollow)
+@receiver(post_delete, sender=GroupFollow)
+def bump_group_follow_version(sender, instance, **kwargs):
+    # кнопка подписки на странице группы
+    bump(f'group:{instance.group.slug}')
+
+
+@receiver(post_save, sender=Mute)
+@receiver(post_delete, sender=Mute)
+@receiver(post_save, sender=Block)
+@receiver(post_delete, sender=Block)
+def forget_hidden(sender, instance, **kwargs):
+    hidden.forget(instance.user_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_version(sender, instance, **kwargs):
+    # 'groups' — версия поиска групп по префиксу
+    bump(f'group:{instance.slug}', 'groups')
+    purge(f'group-{instance.slug}')
+
+
+@receiver(post_save, sender=User)
+def bump_profile_version(sender, instance, update_fields=None, **kwargs):
+    bump(f'profile:{instance.username}')
+    # вход на сайт обновляет только last_login, страницы от него не меняются
+    if update_fields != frozenset({'last_login'}):
+        purge(f'author-{instance.pk}')
+    # выключенный пользователь пропадает из общей ленты и её архива
+    if update_fields and 'is_active' in update_fields:
+        bump('index', 'archive')
+        purge('feed-index')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def check_spam(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'text' not in update_fields:
+        return
+    if sender is Post:
+        kind, flag_kind = spam.POST, SpamFlag.POST
+    else:
+        kind, flag_kind = spam.COMMENT, SpamFlag.COMMENT
+    found = spam.remember(kind, instance.pk, instance.text)
+    if len(found) >= settings.SPAM_MIN_DUPLICATES:
+        SpamFlag.objects.update_or_create(
+            kind=flag_kind, object_id=instance.pk,
+            defaults={'author_id': instance.author_id,
+                      'duplicates': len(found)})
+
+
+@receiver(post_save, sender=Comment)
+def stream_comment(sender, instance, created, **kwargs):
+    if created and instance.post_id is not None:
+        streams.publish(instance)
@@ -0,0 +1,167 @@
+import heapq
+import os
+import random
+import re
+import struct
+import threading
+from hashlib import blake2b
+
+from django.conf import settings
+
+# 64 хэша = 16 полос по 4 строки: тексты с похожестью 0.7 попадают
+# в одну корзину почти наверняка, с похожестью 0.3 — редко
+BANDS = 16
+ROWS = 4
+NUM_HASHES = BANDS * ROWS
+SHINGLE_SIZE = 3
+# в тексте короче этого числа слов совпадения случайны: «Спасибо!»
+MIN_WORDS = 5
+# от длинного текста берутся шинглы с наименьшими хэшами: выборка
+# одинакова у одинаковых текстов, а время подписи ограничено
+MAX_SHINGLES = 128
+PRIME = (1 << 61) - 1
+_random = random.Random(49)
+PERMUTATIONS = [(_random.randrange(1, PRIME), _random.randrange(PRIME))
+                for _ in range(NUM_HASHES)]
+# запись файла индекса: тип, id и подпись текста
+RECORD = struct.Struct(f'<cq{NUM_HASHES}Q')
+POST = b'p'
+COMMENT = b'c'
+WORD_RE = re.compile(r'\w+')
+
+
+def shingles(text):
+    """Хэши всех последовательностей из SHINGLE_SIZE слов текста."""
+    words = WORD_RE.findall(text.casefold())
+    if len(words) < MIN_WORDS:
+        return set()
+    return {
+        int.from_bytes(blake2b(' '.join(
+            words[i:i + SHINGLE_SIZE]).encode(), digest_size=8).digest(),
+            'little')
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def signature(text):
+    """MinHash-подпись текста или None для слишком короткого."""
+    hashes = shingles(text)
+    if not hashes:
+        return None
+    if len(hashes) > MAX_SHINGLES:
+        hashes = heapq.nsmallest(MAX_SHINGLES, hashes)
+    return tuple(min([(a * x + b) % PRIME for x in hashes])
+                 for a, b in PERMUTATIONS)
+
+
+def similarity(first, second):
+    """Оценка коэффициента Жаккара по двум подписям."""
+    return sum(x == y for x, y in zip(first, second)) / NUM_HASHES
+
+
+def band_keys(sig):
+    return [hash((band, sig[band * ROWS:(band + 1) * ROWS]))
+            for band in range(BANDS)]
+
+
+class SpamIndex:
+    """LSH-индекс подписей постов и комментариев.
+
+    Живёт в памяти процесса, а на диске хранится журналом записей RECORD,
+    который только дописывается. Процессы дописывают свои тексты и
+    перед каждой проверкой дочитывают чужие, см. refresh().
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.path = None
+        self.reset()
+
+    def reset(self):
+        self.buckets = {}
+        self.signatures = {}
+        self.offset = 0
+        self.inode = None
+
+    def add(self, key, sig):
+        if self.signatures.get(key) == sig:
+            return
+        self.signatures[key] = sig
+        for band_key in band_keys(sig):
+            keys = self.buckets.setdefault(band_key, [])
+            if key not in keys:
+                keys.append(key)
+
+    def similar(self, sig, exclude=None):
+        """Ключи текстов, похожих на подпись не меньше SPAM_SIMILARITY."""
+        candidates = set()
+        for band_key in band_keys(sig):
+            candidates.update(self.buckets.get(band_key, ()))
+        candidates.discard(exclude)
+        return [key for key in candidates
+                if similarity(sig, self.signatures[key])
+                >= settings.SPAM_SIMILARITY]
+
+    def refresh(self):
+        path = settings.SPAM_INDEX_PATH
+        if path != self.path:
+            self.path = path
+            self.reset()
+        try:
+            with open(path, 'rb') as file:
+                inode = os.fstat(file.fileno()).st_ino
+                if inode != self.inode:
+                    # scan_spam заменил файл целиком
+                    self.reset()
+                    self.inode = inode
+                file.seek(self.offset)
+                data = file.read()
+        except FileNotFoundError:
+            self.reset()
+            return
+        # хвост может быть недописанной записью соседнего процесса
+        count = len(data) // RECORD.size
+        for kind, pk, *sig in RECORD.iter_unpack(data[:count * RECORD.size]):
+            self.add((kind, pk), tuple(sig))
+        self.offset += count * RECORD.size
+
+
+index = SpamIndex()
+
+
+def write_records(file, items):
+    file.write(b''.join(RECORD.pack(kind, pk, *sig)
+                        for (kind, pk), sig in items))
+
+
+def duplicates(text, exclude=None):
+    """Ключи (тип, id) уже известных текстов, почти совпадающих с text."""
+    sig = signature(text)
+    if sig is None:
+        return []
+    with index.lock:
+        index.refresh()
+        return index.similar(sig, exclude)
+
+
+def is_spam(text, exclude=None):
+    return len(duplicates(text, exclude)) >= settings.SPAM_MIN_DUPLICATES
+
+
+def remember(kind, pk, text):
+    """Добавляет текст в индекс, возвращает его почти-дубликаты."""
+    sig = signature(text)
+    if sig is None:
+        return []
+    key = (kind, pk)
+    with index.lock:
+        index.refresh()
+        found = index.similar(sig, exclude=key)
+        if index.signatures.get(key) == sig:
+            return found
+        os.makedirs(os.path.dirname(index.path), exist_ok=True)
+        # одна запись одним write в режиме дозаписи не перемешается
+        # с записями других процессов
+        with open(index.path, 'ab', buffering=0) as file:
+            write_records(file, [(key, sig)])
+    return found
@@ -0,0 +1,191 @@
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import CommentEvent
+
+logger = logging.getLogger(__name__)
+
+# через сколько миллисекунд браузер переподключается после обрыва
+RETRY_MS = 3000
+POLL_BATCH_SIZE = 1000
+PRUNE_INTERVAL = 60
+
+
+def comment_payload(comment, username):
+    return json.dumps({
+        'id': comment.pk,
+        'author_id': comment.author_id,
+        'author': username,
+        'text_html': comment.text_html,
+        'created': comment.created.isoformat(),
+    }, ensure_ascii=False)
+
+
+def format_event(comment_id, data):
+    return f'id: {comment_id}\nevent: comment\ndata: {data}\n\n'
+
+
+def publish(comment):
+    """Передаёт новый комментарий слушателям во всех процессах."""
+    CommentEvent.objects.create(
+        post_id=comment.post_id,
+        payload=comment_payload(comment, comment.author.username))
+    # чистится и там, где никто не слушает: события копятся от записи
+    broker.prune()
+
+
+class Subscription:
+    """Соединение, ждущее комментарии поста, с ограниченным буфером."""
+
+    def __init__(self, post_id):
+        self.post_id = post_id
+        self.queue = queue.Queue(settings.STREAM_QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # медленный читатель не задерживает остальных: его поток
+            # закроется, а пропущенное он получит при переподключении
+            self.overflowed = True
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class Broker:
+    """Подписки соединений процесса на комментарии постов.
+
+    Один фоновый поток на процесс раз в STREAM_POLL_INTERVAL секунд
+    забирает из CommentEvent события для всех открытых соединений сразу,
+    так что число запросов к базе не зависит от числа слушателей.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+        self.last_id = None
+        self.thread = None
+        self.pruned = 0
+
+    def subscribe(self, post_id):
+        subscription = Subscription(post_id)
+        with self.lock:
+            if self.last_id is None:
+                # история не нужна: пропущенное отдаёт сам поток
+                self.last_id = CommentEvent.objects.aggregate(
+                    last_id=Max('pk'))['last_id'] or 0
+            self.subscriptions.setdefault(post_id, set()).add(subscription)
+        self.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.post_id)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[subscription.post_id]
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(
+                target=self.run, name='comment-streams', daemon=True)
+        self.thread.start()
+
+    def dispatch(self, post_id, event):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(post_id, ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def poll(self):
+        """Раздаёт соединениям события, появившиеся с прошлого опроса."""
+        with self.lock:
+            post_ids = list(self.subscriptions)
+        if not post_ids:
+            return
+        events = list(CommentEvent.objects.filter(
+            pk__gt=self.last_id, post_id__in=post_ids).order_by(
+            'pk').values_list('pk', 'post_id', 'payload')[:POLL_BATCH_SIZE])
+        for pk, post_id, payload in events:
+            self.last_id = pk
+            # разбирается один раз на процесс, а не на каждое соединение
+            comment = json.loads(payload)
+            self.dispatch(
+                post_id, (comment['id'], comment['author_id'], payload))
+
+    def prune(self):
+        """Удаляет события старше STREAM_EVENT_TTL раз в PRUNE_INTERVAL."""
+        with self.lock:
+            if time.monotonic() - self.pruned < PRUNE_INTERVAL:
+                return
+            self.pruned = time.monotonic()
+        CommentEvent.objects.filter(created__lt=timezone.now() - timedelta(
+            seconds=settings.STREAM_EVENT_TTL)).delete()
+
+    def run(self):
+        while True:
+            time.sleep(settings.STREAM_POLL_INTERVAL)
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('Не удалось опросить события комментариев')
+            finally:
+                close_old_connections()
+
+
+broker = Broker()
+
+
+def stream_events(subscription, missed, hidden, after=0):
+    """Тело ответа text/event-stream.
+
+    ``missed`` — комментарии, пропущенные до подписки, в виде пар
+    (комментарий, имя автора). ``after`` — id последнего комментария,
+    который у клиента уже есть: опрос брокера мог забрать его событие
+    уже после подписки. Поток закрывается через STREAM_MAX_AGE секунд
+    или при переполнении буфера, браузер сам переподключается.
+    """
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        sent = set()
+        for comment, username in missed:
+            sent.add(comment.pk)
+            yield format_event(
+                comment.pk, comment_payload(comment, username))
+        deadline = time.monotonic() + settings.STREAM_MAX_AGE
+        while not subscription.overflowed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            event = subscription.get(
+                min(settings.STREAM_HEARTBEAT, remaining))
+            if event is None:
+                # заодно выясняется, что клиент отключился
+                yield ': ping\n\n'
+                continue
+            comment_id, author_id, payload = event
+            if (comment_id <= after or comment_id in sent
+                    or hidden.hides_author(author_id)):
+                continue
+            sent.add(comment_id)
+            yield format_event(comment_id, payload)
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,122 @@
+import logging
+import threading
+import urllib.request
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.utils.module_loading import import_string
+
+from tasks.signals import task_finished, task_started
+
+from .versions import bump
+
+logger = logging.getLogger(__name__)
+
+SURROGATE_HEADER = 'Surrogate-Key'
+# ключи страниц с {% cache %}: после сброса прокси заново запросит
+# страницу и без новой версии фрагмента сохранит его старую копию
+FRAGMENT_KEYS = {'feed-index'}
+
+_state = threading.local()
+
+
+def post_keys(post):
+    """Ключи страниц, на которых виден пост."""
+    keys = {f'post-{post.pk}', f'author-{post.author_id}'}
+    if post.group_id is not None:
+        keys.add(f'group-{post.group.slug}')
+    return keys
+
+
+def page_keys(posts, *extra):
+    """Ключи страницы ленты: сама лента и все посты на ней."""
+    keys = set(extra)
+    for post in posts:
+        keys.add(f'post-{post.pk}')
+    return keys
+
+
+def tag_response(response, keys):
+    response[SURROGATE_HEADER] = ' '.join(sorted(keys))
+    return response
+
+
+class HttpPurgeBackend:
+    """Отправляет PURGE с заголовком Surrogate-Key на SURROGATE_PURGE_URL."""
+
+    def purge(self, keys):
+        request = urllib.request.Request(
+            settings.SURROGATE_PURGE_URL,
+            method='PURGE',
+            headers={SURROGATE_HEADER: ' '.join(keys)},
+        )
+        try:
+            urllib.request.urlopen(
+                request, timeout=settings.SURROGATE_PURGE_TIMEOUT).close()
+        except OSError:
+            logger.exception('Не удалось сбросить кэш прокси: %s', keys)
+
+
+def get_backend():
+    if not settings.SURROGATE_PURGE_BACKEND:
+        return None
+    return import_string(settings.SURROGATE_PURGE_BACKEND)()
+
+
+def _pending():
+    if not hasattr(_state, 'keys'):
+        _state.keys = set()
+    return _state.keys
+
+
+def purge(*keys):
+    """Ставит ключи в очередь на сброс.
+
+    Внутри запроса, задачи из очереди и batched_purges() ключи копятся
+    до их окончания и уходят пачками, в остальных случаях (shell)
+    отправляются сразу.
+    """
+    _pending().update(keys)
+    if not getattr(_state, 'in_request', False):
+        flush()
+
+
+def flush(**kwargs):
+    _state.in_request = False
+    keys = sorted(_pending())
+    _pending().clear()
+    backend = get_backend()
+    if backend is None or not keys:
+        return
+    bump(*(f'purged:{key}' for key in FRAGMENT_KEYS.intersection(keys)))
+    size = settings.SURROGATE_PURGE_BATCH_SIZE
+    for start in range(0, len(keys), size):
+        backend.purge(keys[start:start + size])
+
+
+@contextmanager
+def batched_purges():
+    """Копит ключи до выхода из блока и отправляет их вместе.
+
+    Для команд, которые меняют много строк: иначе каждый сигнал
+    отправлял бы свой PURGE. Внутри запроса ключи и так копятся.
+    """
+    if getattr(_state, 'in_request', False):
+        yield
+        return
+    _start_request()
+    try:
+        yield
+    finally:
+        flush()
+
+
+def _start_request(**kwargs):
+    _state.in_request = True
+
+
+request_started.connect(_start_request)
+request_finished.connect(flush)
+task_started.connect(_start_request)
+task_finished.connect(flush)
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+
+from .markup import extract_mentions, extract_tags
+from .models import Mention, PostTag, Tag
+
+User = get_user_model()
+
+
+def tag_ids(names):
+    """id тегов по именам, недостающие теги создаются."""
+    if not names:
+        return {}
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in names], ignore_conflicts=True)
+    return dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+
+
+def user_ids(usernames):
+    if not usernames:
+        return {}
+    return dict(User.objects.filter(username__in=usernames).values_list(
+        'username', 'id'))
+
+
+def index_posts(parsed):
+    """Записывает теги и упоминания разобранных постов.
+
+    ``parsed`` — последовательность (post_id, pub_date, теги, упоминания).
+    Прежние строки этих постов удаляются.
+    """
+    parsed = list(parsed)
+    post_ids = [post_id for post_id, *_ in parsed]
+    tags = tag_ids({name for _, _, names, _ in parsed for name in names})
+    users = user_ids(
+        {name for _, _, _, usernames in parsed for name in usernames})
+    PostTag.objects.filter(post_id__in=post_ids).delete()
+    Mention.objects.filter(post_id__in=post_ids).delete()
+    PostTag.objects.bulk_create(
+        PostTag(post_id=post_id, tag_id=tags[name], pub_date=pub_date)
+        for post_id, pub_date, names, _ in parsed for name in names)
+    Mention.objects.bulk_create(
+        Mention(post_id=post_id, user_id=users[name], pub_date=pub_date)
+        for post_id, pub_date, _, usernames in parsed
+        for name in usernames if name in users)
+
+
+def parse_post(row):
+    post_id, pub_date, text = row
+    return post_id, pub_date, extract_tags(text), extract_mentions(text)
+
+
+def index_post(post):
+    index_posts([parse_post((post.pk, post.pub_date, post.text))])
+
+
+def forget_post(post):
+    """Удаляет теги и упоминания удалённого поста."""
+    PostTag.objects.filter(post_id=post.pk).delete()
+    Mention.objects.filter(post_id=post.pk).delete()
@@ -0,0 +1,32 @@
+from django.db import transaction
+
+from tasks.queue import task
+
+from .images import build_variants
+from .models import Post
+from .sharding import for_id
+
+
+@task(priority=10)
+def build_image_variants(post_id, image=None):
+    """Нарезает адаптивные варианты картинки поста.
+
+    ``image`` — имя картинки на момент постановки в очередь: если её
+    успели заменить, варианты нарежет задача, поставленная при замене.
+    """
+    post = for_id(Post.objects.all(), post_id).filter(pk=post_id).first()
+    if post is None:
+        return
+    if image is None:
+        image = post.image.name
+    if post.image.name != image:
+        return
+    widths = build_variants(image) if image else ''
+    with transaction.atomic(using=post._state.db):
+        post = Post.objects.using(post._state.db).select_for_update().filter(
+            pk=post_id, image=image).first()
+        # картинку заменили, пока нарезались варианты
+        if post is None:
+            return
+        post.image_widths = widths
+        post.save(update_fields=['image_widths'])
@@ -0,0 +1,12 @@
+from django import template
+
+from posts.thumbnails import prefetch_thumbnails as prefetch
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_thumbnails(page_obj):
+    """Загружает метаданные всех миниатюр страницы одним запросом."""
+    prefetch(page_obj)
+    return ''
@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..pagination import EstimatedCountPaginator, estimated_count
+
+User = get_user_model()
+
+
+class PostAdminTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='description',
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self, posts):
+        Post.objects.bulk_create(
+            Post(author=self.admin, group=self.group, text=f'Пост {i}')
+            for i in range(posts))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                reverse('admin:posts_post_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return context.captured_queries
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Авторы и группы строк не догружаются отдельными запросами."""
+        self.changelist_queries(0)
+        few = len(self.changelist_queries(2))
+        many = len(self.changelist_queries(20))
+        self.assertEqual(few, many)
+
+    def test_change_form_uses_autocomplete_for_group(self):
+        post = Post.objects.create(
+            author=self.admin, group=self.group, text='Пост')
+        response = self.client.get(
+            reverse('admin:posts_post_change', args=(post.pk,)))
+        self.assertContains(response, 'admin-autocomplete')
+
+    def test_paginator_uses_table_statistics(self):
+        """Для нефильтрованной таблицы число строк берётся из ANALYZE."""
+        Post.objects.bulk_create(
+            Post(author=self.admin, text=f'Пост {i}') for i in range(5))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(estimated_count(Post), 5)
+        Post.objects.create(author=self.admin, text='Без статистики')
+        with mock.patch('posts.pagination.ESTIMATE_THRESHOLD', 0):
+            self.assertEqual(
+                EstimatedCountPaginator(Post.objects.all(), 10).count, 5)
+            filtered = Post.objects.filter(text__startswith='Пост')
+            self.assertEqual(
+                EstimatedCountPaginator(filtered, 10).count, 5)
+            self.assertEqual(
+                EstimatedCountPaginator(Post.objects.all()[:3], 10).count, 3)
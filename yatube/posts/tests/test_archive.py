@@ -0,0 +1,145 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..archive import TieredFeed
+from ..deletion import run_batch, schedule_deletion
+from ..models import (ArchivedComment, ArchivedPost, Comment, Group, Post,
+                      PostTag)
+from ..sharding import gather
+from ..views import AMOUNT_OF_POSTS
+
+User = get_user_model()
+
+
+class ArchiveTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='description',
+        )
+        now = timezone.now()
+        self.posts = []
+        for i in range(15):
+            tag = '#старое' if i < 5 else '#новое'
+            post = Post.objects.create(
+                author=self.user, group=self.group, text=f'Пост {i} {tag}')
+            # первые пять постов старше года
+            age = timedelta(days=400 - i) if i < 5 else timedelta(hours=i)
+            self.user.posts.filter(pk=post.pk).update(pub_date=now - age)
+            self.posts.append(post)
+        self.old = self.posts[:5]
+        Comment.objects.create(
+            post=self.old[0], author=self.user, text='Старый комментарий')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def archive(self):
+        call_command('archive_posts', days=180, no_vacuum=True,
+                     stdout=StringIO())
+
+    def page_texts(self, response):
+        return [post.text for post in response.context['page_obj']]
+
+    def test_old_posts_move_with_comments(self):
+        self.archive()
+        old_ids = {post.pk for post in self.old}
+        self.assertFalse(self.user.posts.filter(pk__in=old_ids).exists())
+        self.assertEqual(
+            set(ArchivedPost.objects.values_list('pk', flat=True)), old_ids)
+        self.assertEqual(self.user.posts.count(), 10)
+        comment = ArchivedComment.objects.get()
+        self.assertEqual(comment.post_id, self.old[0].pk)
+        self.assertFalse(gather(Comment.objects.all()))
+
+    def test_feeds_continue_into_archive(self):
+        expected = {}
+        for name, args in (('posts:index', ()),
+                           ('posts:group_list', (self.group.slug,)),
+                           ('posts:profile', (self.user.username,))):
+            url = reverse(name, args=args)
+            expected[url] = [self.page_texts(self.client.get(url)),
+                             self.page_texts(self.client.get(url + '?page=2'))]
+        self.archive()
+        cache.clear()
+        for url, pages in expected.items():
+            with self.subTest(url=url):
+                self.assertEqual(
+                    [self.page_texts(self.client.get(url)),
+                     self.page_texts(self.client.get(url + '?page=2'))],
+                    pages)
+
+    def test_first_page_reads_only_hot_posts(self):
+        self.archive()
+        feed = TieredFeed(self.user.posts.all(), ArchivedPost.objects.all())
+        feed.count()
+        with CaptureQueriesContext(connection) as queries:
+            page = feed[:AMOUNT_OF_POSTS]
+            feed.count()
+        self.assertEqual(len(page), AMOUNT_OF_POSTS)
+        self.assertFalse(any('archivedpost' in query['sql']
+                             for query in queries.captured_queries))
+        self.assertEqual(
+            [post.pk for post in feed[8:12]],
+            [post.pk for post in self.posts[13:] + self.old[:2:-1]])
+
+    def test_cold_count_follows_deletions(self):
+        self.archive()
+
+        def cold_count(**filters):
+            cold = ArchivedPost.objects.visible().filter(**filters)
+            return TieredFeed(Post.objects.none(), cold).cold_count()
+
+        group_id = self.group.pk
+        self.assertEqual((cold_count(), cold_count(group_id=group_id)), (5, 5))
+        ArchivedPost.objects.filter(pk=self.old[0].pk).delete()
+        self.assertEqual(cold_count(), 4)
+        job = schedule_deletion(self.group)
+        while run_batch(job, 100):
+            pass
+        self.assertEqual(cold_count(group_id=group_id), 0)
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        self.assertEqual(cold_count(), 0)
+
+    def test_post_detail_resolves_archived_id(self):
+        post = self.old[0]
+        self.archive()
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['user_post'].is_archived)
+        self.assertEqual(
+            [comment.text for comment in response.context['all_comments']],
+            ['Старый комментарий'])
+        self.assertNotContains(
+            response, reverse('posts:add_comment', args=(post.pk,)))
+        self.assertNotContains(
+            response, reverse('posts:post_edit', args=(post.pk,)))
+
+    def test_tag_feed_keeps_archived_posts(self):
+        self.archive()
+        self.assertEqual(PostTag.objects.count(), 15)
+        response = self.client.get(reverse('posts:tag', args=('старое',)))
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [post.pk for post in self.old[::-1]])
+
+    def test_second_run_moves_nothing(self):
+        self.archive()
+        out = StringIO()
+        call_command('archive_posts', days=180, stdout=out)
+        self.assertIn('постов: 0', out.getvalue())
@@ -0,0 +1,78 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import versions
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalResponseTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='description',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def assert_revalidates(self, url, change):
+        etag = self.client.get(url)['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_group_page_revalidates(self):
+        """Страница группы отвечает 304, пока в группе нет новых постов."""
+        self.assert_revalidates(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            lambda: Post.objects.create(
+                author=self.user, text='Новый', group=self.group),
+        )
+
+    def test_post_detail_revalidates(self):
+        """Новый комментарий меняет ETag страницы поста."""
+        self.assert_revalidates(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            lambda: Comment.objects.create(
+                post=self.post, author=self.user, text='Комментарий'),
+        )
+
+    def test_etag_depends_on_user(self):
+        """Гость и авторизованный пользователь получают разные ETag."""
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        guest_etag = self.client.get(url)['ETag']
+        self.client.force_login(self.user)
+        self.assertNotEqual(self.client.get(url)['ETag'], guest_etag)
+
+    @override_settings(SHARED_CACHE=False)
+    def test_process_local_versions_expire(self):
+        """Без общего кэша изменение из другого процесса видно со временем."""
+        url = reverse('posts:group_list', args=(self.group.slug,))
+        with mock.patch.object(versions, 'LOCAL_VERSION_TIMEOUT', 0.05):
+            etag = self.client.get(url)['ETag']
+            # изменение без сигналов, как запись в другом процессе
+            Post.objects.filter(pk=self.post.pk).update(text='Изменено')
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            time.sleep(0.1)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
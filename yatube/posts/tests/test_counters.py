@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import counters
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(VIEW_COUNTER_MERGE_INTERVAL=3600,
+                   VIEW_COUNTER_FLUSH_INTERVAL=3600)
+class ViewCounterTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        cache.clear()
+        counters._buffer.clear()
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        self.other = Post.objects.create(author=self.user, text='Другой')
+
+    def test_views_are_buffered_without_writes(self):
+        """Просмотр не пишет в базу, но виден в счётчике страницы."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        counters.record_view(self.post.pk)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertFalse(any(query['sql'].startswith('UPDATE')
+                             for query in context.captured_queries))
+        self.assertEqual(response.context['views'], 1)
+        # второй ответ взят из кэша страниц, но просмотр тоже засчитан
+        self.client.get(url)
+        self.assertEqual(counters.view_count(self.post), 3)
+
+    def test_flush_writes_all_posts_in_one_update(self):
+        for post_id in (self.post.pk, self.post.pk, self.other.pk):
+            counters.record_view(post_id)
+        counters.merge()
+        self.assertEqual(counters.view_count(self.post), 2)
+        counters.record_view(self.other.pk)
+        counters.merge()
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(counters.flush(), 2)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.post.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(
+            (self.post.views_count, self.other.views_count), (2, 2))
+        self.assertEqual(counters.view_count(self.post), 2)
+        self.assertEqual(counters.flush(), 0)
+
+    def test_flush_survives_evicted_counter(self):
+        """Счётчик, вытесненный из кэша после чтения, всё равно пишется."""
+        counters.record_view(self.post.pk)
+        counters.merge()
+        get_many = cache.get_many
+
+        def read_then_evict(keys):
+            values = get_many(keys)
+            cache.delete_many(keys)
+            return values
+
+        with mock.patch.object(cache, 'get_many', read_then_evict):
+            self.assertEqual(counters.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 1)
@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..deletion import run_batch, schedule_deletion
+from ..models import Comment, DeletionJob, Follow, Group, Post
+from ..sharding import gather
+
+User = get_user_model()
+
+
+class DeletionTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='description',
+        )
+        self.posts = [
+            Post.objects.create(
+                author=self.user, group=self.group, text=f'Пост {i}')
+            for i in range(5)
+        ]
+        self.post = Post.objects.create(author=self.reader, text='Чужой')
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Ответ')
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.client = Client()
+
+    def run_deletions(self, **options):
+        call_command('process_deletions', pause=0, stdout=StringIO(),
+                     **options)
+
+    def test_user_is_hidden_at_once(self):
+        """Пользователь пропадает из лент до выполнения каскада."""
+        schedule_deletion(self.user)
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [self.post])
+        response = self.client.get(
+            reverse('posts:profile', args=(self.user.username,)))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.user.posts.count(), 5)
+
+    def test_user_cascade_runs_in_batches(self):
+        job = schedule_deletion(self.user)
+        self.run_deletions(batch_size=2, max_batches=3)
+        job.refresh_from_db()
+        self.assertIsNone(job.finished)
+        self.assertTrue(User.objects.filter(pk=self.user.pk).exists())
+
+        self.run_deletions(batch_size=2)
+        job.refresh_from_db()
+        self.assertIsNotNone(job.finished)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(gather(Comment.objects.all()))
+        self.assertFalse(gather(Follow.objects.all()))
+        self.assertEqual(gather(Post.objects.all()), [self.post])
+
+    def test_group_is_detached_from_posts(self):
+        schedule_deletion(self.group)
+        response = self.client.get(
+            reverse('posts:group_list', args=(self.group.slug,)))
+        self.assertEqual(response.status_code, 404)
+        job = DeletionJob.objects.get()
+        while run_batch(job, 2):
+            pass
+        self.assertFalse(Group.objects.exists())
+        self.assertEqual(len(gather(Post.objects.filter(group=None))), 6)
+
+    def test_post_deletion_and_orphan_comments(self):
+        orphan = Comment.objects.create(
+            post=None, author=self.reader, text='Без поста')
+        schedule_deletion(self.post)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,)))
+        self.assertEqual(response.status_code, 404)
+        self.run_deletions()
+        self.assertFalse(gather(Post.objects.filter(pk=self.post.pk)))
+        self.assertFalse(gather(Comment.objects.filter(pk=orphan.pk)))
+        self.assertEqual(len(gather(Comment.objects.all())), 1)
@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.storage import content_storage, is_content_name
+from ..files import collect_garbage
+from ..images import variant_name
+from ..models import ArchivedPost, Post, StoredFile
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+OTHER_GIF = SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\x00\x00\x00')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class StoredFileTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, content, name='small.gif'):
+        return Post.objects.create(
+            author=self.user, text='Пост',
+            image=SimpleUploadedFile(name, content))
+
+    def refs(self, name):
+        return StoredFile.objects.get(name=name).refs
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.create_post(SMALL_GIF, 'a.gif')
+        second = self.create_post(SMALL_GIF, 'b.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(is_content_name(first.image.name))
+        self.assertTrue(first.image.name.startswith('posts/'))
+        directory = os.path.dirname(content_storage.path(first.image.name))
+        self.assertEqual(len(os.listdir(directory)), 1)
+        self.assertEqual(self.refs(first.image.name), 2)
+
+    def test_edits_and_deletes_release_files(self):
+        post = self.create_post(SMALL_GIF)
+        other = self.create_post(SMALL_GIF)
+        name = post.image.name
+        post.image = SimpleUploadedFile('other.gif', OTHER_GIF)
+        post.save()
+        self.assertEqual(self.refs(name), 1)
+        self.assertEqual(self.refs(post.image.name), 1)
+        post.text = 'Без новой картинки'
+        post.save()
+        self.assertEqual(self.refs(post.image.name), 1)
+
+        other.delete()
+        self.assertEqual(self.refs(name), 0)
+        self.assertEqual(collect_garbage(grace=60), 0)
+        self.assertTrue(content_storage.exists(name))
+        self.assertEqual(collect_garbage(grace=0), 1)
+        self.assertFalse(content_storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+        self.assertTrue(content_storage.exists(post.image.name))
+
+    def test_garbage_collection_rechecks_posts(self):
+        post = self.create_post(SMALL_GIF)
+        name = post.image.name
+        # ссылку сняли в обход сигналов
+        StoredFile.objects.filter(name=name).update(refs=0)
+        ArchivedPost.objects.create(
+            id=1, text='Архив', pub_date=post.pub_date,
+            author=self.user, image=name)
+        Post.objects.using(post._state.db).filter(
+            pk=post.pk)._raw_delete(post._state.db)
+        self.assertEqual(collect_garbage(grace=0), 0)
+        self.assertEqual(self.refs(name), 1)
+        self.assertTrue(content_storage.exists(name))
+
+    def test_migrate_media_moves_flat_files(self):
+        old_name = default_storage.save('posts/old.gif',
+                                        ContentFile(SMALL_GIF))
+        variant = variant_name(old_name, 320)
+        default_storage.save(variant, ContentFile(b'variant'))
+        posts = [Post.objects.create(author=self.user, text=f'Пост {i}')
+                 for i in range(2)]
+        for post in posts:
+            Post.objects.using(post._state.db).filter(pk=post.pk).update(
+                image=old_name)
+        duplicate = self.create_post(SMALL_GIF)
+
+        call_command('migrate_media', workers=2, stdout=StringIO())
+        for post in posts:
+            post.refresh_from_db()
+            self.assertEqual(post.image.name, duplicate.image.name)
+        self.assertEqual(self.refs(duplicate.image.name), 3)
+        self.assertTrue(default_storage.exists(
+            variant_name(duplicate.image.name, 320)))
+
+        self.assertEqual(collect_garbage(grace=0), 1)
+        self.assertFalse(default_storage.exists(old_name))
+        self.assertFalse(default_storage.exists(variant))
@@ -0,0 +1,122 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Follow, Group, GroupFollow, Post
+from ..pagination import MergedKeysetPaginator
+from ..sharding import shard_for
+from ..views import AMOUNT_OF_POSTS
+
+User = get_user_model()
+
+
+class FollowFeedTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        self.stranger = User.objects.create_user(username='stranger')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='description',
+        )
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed(self, cursor=None):
+        response = self.client.get(
+            reverse('posts:follow_index'),
+            {'after': cursor} if cursor else None)
+        return response.context['page_obj']
+
+    def test_group_follow_and_unfollow(self):
+        url = reverse('posts:group_list', args=(self.group.slug,))
+        self.client.get(reverse('posts:group_follow', args=(self.group.slug,)))
+        self.client.get(reverse('posts:group_follow', args=(self.group.slug,)))
+        self.assertEqual(GroupFollow.objects.filter(
+            user=self.reader, group=self.group).count(), 1)
+        self.assertTrue(self.client.get(url).context['following'])
+        self.client.get(
+            reverse('posts:group_unfollow', args=(self.group.slug,)))
+        self.assertFalse(GroupFollow.objects.exists())
+        self.assertFalse(self.client.get(url).context['following'])
+
+    def test_feed_merges_authors_and_groups(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        GroupFollow.objects.create(user=self.reader, group=self.group)
+        expected = []
+        for i in range(15):
+            if i % 3 == 0:
+                # и автор, и группа: пост должен показаться один раз
+                post = Post.objects.create(
+                    author=self.author, group=self.group, text=f'Оба {i}')
+            elif i % 3 == 1:
+                post = Post.objects.create(
+                    author=self.stranger, group=self.group,
+                    text=f'Группа {i}')
+            else:
+                post = Post.objects.create(
+                    author=self.author, text=f'Автор {i}')
+            expected.append(post.pk)
+        Post.objects.create(author=self.stranger, text='Чужой')
+        expected.reverse()
+
+        first = self.feed()
+        self.assertEqual(len(first), AMOUNT_OF_POSTS)
+        self.assertTrue(first.has_next())
+        second = self.feed(first.next_cursor)
+        self.assertFalse(second.has_next())
+        self.assertEqual([post.pk for post in [*first, *second]], expected)
+
+    def test_each_subscription_is_read_by_its_index(self):
+        GroupFollow.objects.create(user=self.reader, group=self.group)
+        for i in range(3):
+            author = User.objects.create_user(username=f'author{i}')
+            Follow.objects.create(user=self.reader, author=author)
+            for j in range(AMOUNT_OF_POSTS * 2):
+                Post.objects.create(author=author, text=f'Пост {i} {j}')
+        with ExitStack() as stack:
+            shards = [stack.enter_context(CaptureQueriesContext(
+                connections[alias])) for alias in settings.POST_SHARDS]
+            self.feed()
+        feeds = [query['sql'] for queries in shards
+                 for query in queries.captured_queries
+                 if query['sql'].startswith('SELECT')
+                 and 'FROM "posts_post"' in query['sql']
+                 and 'ORDER BY' in query['sql']]
+        # источники одной базы читаются одним запросом; группа читается
+        # на каждом шарде, автор — только на своём
+        self.assertEqual(len(feeds), len(settings.POST_SHARDS))
+        self.assertEqual(
+            sum(sql.count(f'LIMIT {AMOUNT_OF_POSTS + 1}') for sql in feeds),
+            3 + len(settings.POST_SHARDS))
+        with connection.cursor() as cursor:
+            for sql in feeds:
+                # без сортировки всех постов подписки перед LIMIT
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_paginator_limits_each_source_to_page_size(self):
+        for i in range(5):
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+        sources = [self.author.posts.all(),
+                   self.author.posts.filter(group=None)]
+        paginator = MergedKeysetPaginator(sources, 2)
+        with CaptureQueriesContext(
+                connections[shard_for(self.author.pk)]) as queries:
+            page = paginator.page()
+        self.assertEqual(len(page), 2)
+        self.assertTrue(all('LIMIT 3' in query['sql']
+                            for query in queries.captured_queries))
+        rest = paginator.page(page.next_cursor)
+        self.assertEqual(len({*page, *rest}), 4)
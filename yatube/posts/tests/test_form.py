@@ -7,6 +7,8 @@ from django.db.models.fields.files import ImageFieldFile
 
 
 class PostFormTests(TestCase):
+    databases = '__all__'
+
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -45,9 +47,8 @@ class PostFormTests(TestCase):
                              reverse('posts:profile',
                                      kwargs={'username': self.user.username}))
 
-        self.assertTrue(Post.objects.filter(text='Тестовый пост',
-                                            author=self.user,
-                                            group=self.group).exists())
+        self.assertTrue(self.user.posts.filter(text='Тестовый пост',
+                                               group=self.group).exists())
 
     def test_create_post_with_picture(self):
         """Валидная форма создает запись в create_post с картинкой."""
@@ -81,9 +82,8 @@ class PostFormTests(TestCase):
                              reverse('posts:profile',
                                      kwargs={'username': self.user.username}))
         #print(form_data)
-        self.assertTrue(Post.objects.filter(text='Тестовый пост(картинка)',
-                                            author=self.user,
-                                            group=self.group).exists())
+        self.assertTrue(self.user.posts.filter(
+            text='Тестовый пост(картинка)', group=self.group).exists())
 
     def test_edit_post(self):
         """Валидная форма изменяет запись в edit_post."""
@@ -96,8 +96,9 @@ class PostFormTests(TestCase):
                 'post_id': self.post_0.id}),
             data=form_data,
             follow=True)
-        modified_post = Post.objects.get(id=self.post_0.id)
-        self.assertRedirects(response, reverse('posts:post_detail', args=(1,)))
+        modified_post = self.user.posts.get(id=self.post_0.id)
+        self.assertRedirects(response, reverse('posts:post_detail',
+                                               args=(self.post_0.id,)))
         self.assertNotEqual(modified_post.text, self.post_0.text)
 
     def test_edit_post_invalid(self):
@@ -106,10 +107,10 @@ class PostFormTests(TestCase):
             'text': ' ',
         }
         self.authorized_client.post(
-            reverse('posts:post_edit', args=f'{self.post_0.id}'),
+            reverse('posts:post_edit', args=(self.post_0.id,)),
             data=form_data,
             follow=True)
-        self.assertFalse(Post.objects.filter(text='').exists())
+        self.assertFalse(self.user.posts.filter(text='').exists())
 
     def test_guest_cannot_edit_post(self):
         """Проверка edit_post для guest_client."""
@@ -0,0 +1,130 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..hidden import HIDDEN_KEY, NOTHING, hidden_for
+from ..models import Block, Comment, Follow, Group, GroupFollow, Mute, Post
+from ..views import AMOUNT_OF_POSTS
+
+User = get_user_model()
+
+
+class HiddenTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        self.troll = User.objects.create_user(username='troll')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='description',
+        )
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def author_client(self):
+        client = Client()
+        client.force_login(self.author)
+        return client
+
+    def get_page(self, name, *args, **params):
+        response = self.client.get(reverse(name, args=args), params)
+        return response.context['page_obj']
+
+    @override_settings(SHARED_CACHE=True)
+    def test_hidden_lists_are_cached_and_reset(self):
+        Mute.objects.create(user=self.reader, author=self.author)
+        Mute.objects.create(user=self.reader, group=self.group)
+        with self.assertNumQueries(2):
+            hidden = hidden_for(self.reader)
+        with self.assertNumQueries(0):
+            self.assertEqual(hidden_for(self.reader), hidden)
+        self.assertEqual(list(hidden.authors), [self.author.pk])
+        self.assertTrue(hidden.has_muted_group(self.group.pk))
+        self.assertFalse(hidden.has_blocked(self.author.pk))
+
+        self.client.get(reverse('posts:profile_block', args=('troll',)))
+        self.assertTrue(hidden_for(self.reader).has_blocked(self.troll.pk))
+        self.client.get(reverse('posts:profile_unmute', args=('author',)))
+        self.assertFalse(hidden_for(self.reader).hides_author(self.author.pk))
+
+    @override_settings(SHARED_CACHE=False)
+    def test_process_local_cache_is_not_trusted(self):
+        hidden_for(self.reader)
+        # блокировка в другом процессе: сброс кэша сюда не доходит
+        Block.objects.create(user=self.reader, author=self.troll)
+        cache.set(HIDDEN_KEY.format(self.reader.pk), NOTHING)
+        with self.assertNumQueries(2):
+            hidden = hidden_for(self.reader)
+        self.assertTrue(hidden.has_blocked(self.troll.pk))
+
+    def test_follow_feed_stays_full(self):
+        GroupFollow.objects.create(user=self.reader, group=self.group)
+        Follow.objects.create(user=self.reader, author=self.author)
+        shown = []
+        for i in range(3 * AMOUNT_OF_POSTS):
+            # на каждый видимый пост в группе два поста заблокированного
+            author = self.author if i % 3 == 0 else self.troll
+            post = Post.objects.create(
+                author=author, group=self.group, text=f'Пост {i}')
+            if author == self.author:
+                shown.append(post.pk)
+        for i in range(3):
+            shown.append(Post.objects.create(
+                author=self.author, text=f'Без группы {i}').pk)
+        shown.reverse()
+        Block.objects.create(user=self.reader, author=self.troll)
+
+        first = self.get_page('posts:follow_index')
+        self.assertEqual(len(first), AMOUNT_OF_POSTS)
+        second = self.get_page('posts:follow_index', after=first.next_cursor)
+        self.assertFalse(second.has_next())
+        self.assertEqual([post.pk for post in [*first, *second]], shown)
+
+    def test_tag_feed_skips_muted_group(self):
+        for i in range(AMOUNT_OF_POSTS):
+            Post.objects.create(author=self.author, text=f'#тег {i}')
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'#тег скрыт {i}')
+        Mute.objects.create(user=self.reader, group=self.group)
+        page = self.get_page('posts:tag', 'тег')
+        self.assertEqual(len(page), AMOUNT_OF_POSTS)
+        self.assertTrue(all(post.group_id is None for post in page))
+
+    def test_index_and_comments_hide_muted_author(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        Post.objects.create(author=self.troll, text='Троллинг')
+        Comment.objects.create(post=post, author=self.troll, text='Спам')
+        Comment.objects.create(post=post, author=self.author, text='Ответ')
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:profile_mute', args=('troll',)))
+
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+        self.assertNotIn('Троллинг', response.content.decode())
+        # отфильтрованный фрагмент ленты не достаётся другим читателям
+        for client in (Client(), self.author_client()):
+            self.assertIn('Троллинг', client.get(
+                reverse('posts:index')).content.decode())
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,)))
+        self.assertEqual(
+            [comment.text for comment in response.context['all_comments']],
+            ['Ответ'])
+
+    def test_blocked_user_cannot_follow(self):
+        Follow.objects.create(user=self.troll, author=self.reader)
+        self.client.get(reverse('posts:profile_block', args=('troll',)))
+        self.assertFalse(Follow.objects.filter(user=self.troll).exists())
+
+        troll = Client()
+        troll.force_login(self.troll)
+        troll.get(reverse('posts:profile_follow', args=('reader',)))
+        self.assertFalse(Follow.objects.filter(user=self.troll).exists())
+        troll.get(reverse('posts:profile_follow', args=('author',)))
+        self.assertTrue(Follow.objects.filter(
+            user=self.troll, author=self.author).exists())
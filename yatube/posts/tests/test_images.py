@@ -0,0 +1,107 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from tasks.queue import claim, run_job
+
+from ..forms import PostForm
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(size, image_format='PNG'):
+    output = BytesIO()
+    Image.new('RGB', size, 'red').save(output, image_format)
+    return output.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_upload_is_reencoded_with_variants(self):
+        """Картинка перекодируется и получает адаптивные варианты."""
+        uploaded = SimpleUploadedFile(
+            'photo.png', make_image((1200, 800)), content_type='image/png')
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': uploaded},
+        )
+        post = self.user.posts.get(text='Пост с картинкой')
+        self.assertTrue(post.image.name.endswith('.webp'))
+        # варианты нарезаются в фоне
+        self.assertEqual(post.image_widths, '')
+        call_command('run_tasks', once=True, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.image_widths, '320,640,960')
+        self.assertIn('640w', post.image_srcset)
+
+        response = self.authorized_client.get(
+            reverse('posts:profile', kwargs={'username': self.user}))
+        self.assertContains(response, 'srcset=')
+
+    def test_image_replaced_while_variants_are_built(self):
+        """Задача по старой картинке не портит варианты новой."""
+        self.authorized_client.post(reverse('posts:post_create'), data={
+            'text': 'Пост', 'image': SimpleUploadedFile(
+                'old.png', make_image((1000, 700)), content_type='image/png'),
+        })
+        post = self.user.posts.get()
+        running = claim('worker')
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=(post.pk,)), data={
+                'text': 'Пост', 'image': SimpleUploadedFile(
+                    'new.png', make_image((700, 500)),
+                    content_type='image/png'),
+            })
+        run_job(running)
+        post.refresh_from_db()
+        self.assertEqual(post.image_widths, '')
+        call_command('run_tasks', once=True, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.image_widths, '320,640,960')
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_too_large_dimensions_rejected(self):
+        """Слишком большая по сторонам картинка не проходит валидацию."""
+        uploaded = SimpleUploadedFile(
+            'photo.png', make_image((200, 50)), content_type='image/png')
+        form = PostForm(data={'text': 'Пост'}, files={'image': uploaded})
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    @override_settings(POST_IMAGE_MAX_BYTES=1024)
+    def test_too_large_file_rejected_while_uploading(self):
+        """Слишком большой файл отбрасывается ещё при загрузке."""
+        uploaded = SimpleUploadedFile(
+            'photo.bmp', make_image((200, 200), 'BMP'),
+            content_type='image/bmp')
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Большой пост', 'image': uploaded},
+        )
+        self.assertIn('image', response.context['form'].errors)
+        self.assertFalse(self.user.posts.filter(text='Большой пост').exists())
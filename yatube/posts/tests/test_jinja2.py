@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+@override_settings(
+    TEMPLATES=[settings.JINJA2_TEMPLATES] + settings.TEMPLATES[-1:])
+class Jinja2FeedTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='description',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_feeds_render_with_jinja2(self):
+        """Ленты рендерятся шаблонами Jinja2 с теми же данными."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Пользователь: auth')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.text)
+        self.assertContains(
+            response,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}))
+
+    def test_other_pages_use_django_templates(self):
+        """Страницы без Jinja2-шаблона рендерит движок Django."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        self.assertTemplateUsed(response, 'posts/post_detail.html')
@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..lookup import search_groups
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class GroupLookupTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        self.groups = [
+            Group.objects.create(title=title, slug=slug, description='')
+            for title, slug in (
+                ('Котики', 'cats'),
+                ('Кошки и коты', 'koshki'),
+                ('Собаки', 'dogs'),
+                ('Скрытая группа', 'hidden'),
+            )
+        ]
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def autocomplete(self, term):
+        response = self.client.get(
+            reverse('posts:group_autocomplete'), {'term': term})
+        return [result['text'] for result in response.json()['results']]
+
+    def test_prefix_search_ignores_case(self):
+        self.assertEqual(self.autocomplete('КО'), ['Котики', 'Кошки и коты'])
+        self.assertEqual(self.autocomplete('кот'), ['Котики'])
+        self.assertEqual(self.autocomplete('dog'), ['Собаки'])
+        self.assertEqual(self.autocomplete('бак'), [])
+
+    def test_results_are_cached_until_groups_change(self):
+        search_groups('ко')
+        with self.assertNumQueries(0):
+            self.assertEqual(len(search_groups('ко')), 2)
+        Group.objects.create(title='Коровы', slug='cows', description='')
+        self.assertEqual(len(search_groups('ко')), 3)
+        self.groups[0].is_deleted = True
+        self.groups[0].save(update_fields=['is_deleted'])
+        self.assertEqual([title for _, title in search_groups('ко')],
+                         ['Коровы', 'Кошки и коты'])
+
+    def test_forms_render_only_selected_group(self):
+        response = self.client.get(reverse('posts:post_create'))
+        for group in self.groups:
+            self.assertNotContains(response, group.title)
+        self.assertContains(response, reverse('posts:group_autocomplete'))
+
+        post = Post.objects.create(
+            author=self.user, group=self.groups[2], text='Пост')
+        for url in (reverse('posts:post_edit', args=(post.pk,)),
+                    reverse('admin:posts_post_change', args=(post.pk,))):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Собаки')
+                self.assertNotContains(response, 'Котики')
+
+    def test_any_group_can_be_chosen(self):
+        self.client.post(reverse('posts:post_create'),
+                         {'text': 'Пост', 'group': self.groups[3].pk})
+        self.assertEqual(self.user.posts.get().group, self.groups[3])
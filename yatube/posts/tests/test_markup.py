@@ -0,0 +1,72 @@
+from importlib import import_module
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Post
+from ..sharding import shards
+
+User = get_user_model()
+
+
+class RenderedTextTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_html_is_rendered_on_save(self):
+        """Текст экранируется, ссылки и переносы строк размечаются."""
+        post = Post.objects.create(
+            author=self.user, text='<b>Привет</b>\nсм. https://example.com')
+        self.assertEqual(
+            post.text_html,
+            '&lt;b&gt;Привет&lt;/b&gt;<br>см. <a href="https://example.com"'
+            ' rel="nofollow">https://example.com</a>')
+        post.text = 'Новый текст'
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, 'Новый текст')
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='a\nb')
+        self.assertEqual(comment.text_html, 'a<br>b')
+
+    @override_settings(POST_EXCERPT_LENGTH=10)
+    def test_feed_shows_excerpt_without_full_text(self):
+        post = Post.objects.create(
+            author=self.user, text='Очень длинный текст поста')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Очень дли…')
+        self.assertNotContains(response, 'текст поста')
+        page_post = response.context['page_obj'][0]
+        self.assertEqual(page_post.get_deferred_fields(),
+                         {'text', 'text_html'})
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,)))
+        self.assertContains(response, 'Очень длинный текст поста')
+
+    def test_backfill_command(self):
+        Post.objects.bulk_create([Post(author=self.user, text='a\nb')])
+        call_command('render_texts', stdout=StringIO())
+        post = Post.objects.get()
+        self.assertEqual(post.text_html, 'a<br>b')
+        self.assertEqual(post.excerpt_html, 'a<br>b')
+
+    def test_migration_fills_rows_without_html(self):
+        """Ленты не откатываются к полному тексту: его заполняет миграция."""
+        Post.objects.bulk_create([Post(author=self.user, text='a\nb')])
+        migration = import_module('posts.migrations.0028_fill_rendered_text')
+        for alias in shards():
+            migration.render_rows(Post, alias, excerpt=True)
+        self.assertEqual(Post.objects.get().excerpt_html, 'a<br>b')
+        self.assertContains(self.client.get(reverse('posts:index')),
+                            'a<br>b')
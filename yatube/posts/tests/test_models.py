@@ -7,6 +7,8 @@ User = get_user_model()
 
 
 class PostModelTest(TestCase):
+    databases = '__all__'
+
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='description',
+        )
+        Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:group_list',
+                           kwargs={'slug': self.group.slug})
+
+    def test_anonymous_hit_skips_database(self):
+        """Повторный запрос анонима отдаётся из кэша без запросов к базе."""
+        first = self.client.get(self.url)
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(first.content, second.content)
+
+    def test_new_post_invalidates_page(self):
+        """Новый пост в группе делает закэшированную страницу неактуальной."""
+        self.client.get(self.url)
+        Post.objects.create(
+            author=self.user, text='Свежий пост', group=self.group)
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Свежий пост')
+
+    def test_authorized_users_bypass_cache(self):
+        """Авторизованный пользователь не получает страницу анонима."""
+        self.client.get(self.url)
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(self.url)
+        self.assertFalse(response.has_header('X-Page-Cache'))
+        self.assertContains(response, 'Пользователь: auth')
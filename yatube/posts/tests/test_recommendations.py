@@ -0,0 +1,65 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import recommendations
+from ..models import Follow, Group, Post, Recommendation
+
+User = get_user_model()
+
+
+class RecommendationTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.friend = User.objects.create_user(username='friend')
+        cls.friend_of_friend = User.objects.create_user(username='fof')
+        cls.neighbour = User.objects.create_user(username='neighbour')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='description',
+        )
+        Follow.objects.create(user=cls.user, author=cls.friend)
+        Follow.objects.create(user=cls.friend, author=cls.friend_of_friend)
+        Follow.objects.create(user=cls.friend, author=cls.user)
+        Post.objects.create(author=cls.user, text='Пост', group=cls.group)
+        Post.objects.create(
+            author=cls.neighbour, text='Пост соседа', group=cls.group)
+
+    def test_build_recommendations(self):
+        """Рекомендуются друзья друзей и авторы из общих групп."""
+        call_command('build_recommendations', stdout=StringIO())
+        recommended = list(
+            Recommendation.objects.filter(user=self.user)
+            .values_list('author_id', flat=True)
+        )
+        self.assertEqual(
+            recommended, [self.friend_of_friend.id, self.neighbour.id])
+
+    def test_follow_index_shows_recommendations(self):
+        """Виджет рекомендаций выводится на странице подписок."""
+        Recommendation.objects.create(
+            user=self.user, author=self.neighbour, score=1)
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['recommendations']),
+            list(self.user.recommendations.all()),
+        )
+        self.assertContains(response, self.neighbour.username)
+
+    def test_fanout_cap_does_not_prefer_old_accounts(self):
+        ids = set(range(1000))
+        with mock.patch.object(recommendations, 'MAX_FANOUT', 10):
+            picked = set().union(*(recommendations._capped(ids)
+                                   for _ in range(20)))
+        self.assertGreater(max(picked), 100)
@@ -0,0 +1,123 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import (AuthorDailyStats, Comment, DailyStats, Follow, Group,
+                      GroupDailyStats, Post)
+
+User = get_user_model()
+
+
+def snapshot():
+    """Содержимое сводных таблиц без обнулившихся строк."""
+    return (
+        sorted(DailyStats.objects.exclude(posts=0, comments=0).values_list(
+            'day', 'posts', 'comments')),
+        sorted(AuthorDailyStats.objects.exclude(
+            posts=0, followers=0).values_list(
+            'author_id', 'day', 'posts', 'followers')),
+        sorted(GroupDailyStats.objects.exclude(posts=0).values_list(
+            'group_id', 'day', 'posts')),
+    )
+
+
+class RollupTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='description',
+        )
+        self.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='description',
+        )
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.today = timezone.localdate()
+
+    def test_views_update_rollups(self):
+        self.client.post(reverse('posts:post_create'),
+                         data={'text': 'Пост', 'group': self.group.pk})
+        post = self.user.posts.get()
+        self.reader_client.post(
+            reverse('posts:add_comment', args=(post.pk,)),
+            data={'text': 'Комментарий'})
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.user.username,)))
+
+        daily = DailyStats.objects.get()
+        self.assertEqual((daily.day, daily.posts, daily.comments),
+                         (self.today, 1, 1))
+        author = AuthorDailyStats.objects.get(author=self.user)
+        self.assertEqual((author.posts, author.followers), (1, 1))
+        self.assertEqual(GroupDailyStats.objects.get(group=self.group).posts,
+                         1)
+
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=(self.user.username,)))
+        self.client.post(reverse('posts:post_edit', args=(post.pk,)),
+                         data={'text': 'Пост', 'group': self.other_group.pk})
+        author.refresh_from_db()
+        self.assertEqual(author.followers, 0)
+        self.assertEqual(
+            dict(GroupDailyStats.objects.values_list('group__slug', 'posts')),
+            {'test_slug': 0, 'other_slug': 1})
+
+    def test_rebuild_matches_incremental_counts(self):
+        for days in (0, 0, 3):
+            post = Post.objects.create(
+                author=self.user, group=self.group, text='Пост')
+            self.user.posts.filter(pk=post.pk).update(
+                pub_date=timezone.now() - timedelta(days=days))
+        Post.objects.create(author=self.reader, text='Без группы')
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        Follow.objects.create(user=self.reader, author=self.user)
+        # update() мимо сигналов сдвинул даты, счётчики устарели
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(
+            AuthorDailyStats.objects.get(
+                author=self.user, day=self.today - timedelta(days=3)).posts,
+            1)
+
+        self.reader.posts.all().delete()
+        post.comments.all().delete()
+        self.reader.follower.all().delete()
+        Post.objects.create(author=self.reader, text='Новый')
+        incremental = snapshot()
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(snapshot(), incremental)
+
+    def test_stats_pages_read_only_rollups(self):
+        AuthorDailyStats.objects.create(
+            author=self.user, day=self.today, posts=7, followers=2)
+        GroupDailyStats.objects.create(
+            group=self.group, day=self.today, posts=5)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:author_stats', args=(self.user.username,)))
+        tables = ('"posts_post"', '"posts_comment"', '"posts_follow"')
+        self.assertFalse([query for query in queries.captured_queries
+                          if any(table in query['sql'] for table in tables)])
+        self.assertEqual(response.context['totals'],
+                         {'posts': 7, 'followers': 2})
+        self.assertContains(response, 'Всего постов: 7')
+        response = self.client.get(
+            reverse('posts:group_stats', args=(self.group.slug,)))
+        self.assertContains(response, 'Всего постов: 5')
@@ -0,0 +1,111 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Post
+from ..sharding import (IdGenerator, ShardRouter, in_bulk, merge_sorted,
+                        shard_for, shard_of_id)
+
+User = get_user_model()
+SHARDS = ['default', 'shard1', 'shard2']
+
+
+@override_settings(POST_SHARDS=SHARDS)
+class ShardingUnitTests(SimpleTestCase):
+    def test_ids_are_unique_increasing_and_carry_shard(self):
+        generator = IdGenerator(worker_id=7)
+        ids = [generator.next_id(2) for _ in range(5000)]
+        self.assertEqual(ids, sorted(set(ids)))
+        self.assertEqual({shard_of_id(pk) for pk in ids}, {'shard2'})
+        # id, выданные базой до шардирования, шард не несут
+        self.assertIsNone(shard_of_id(42))
+
+    def test_k_way_merge(self):
+        streams = [[9, 6, 3], [8, 5, 2], [7, 4, 1], []]
+        self.assertEqual(
+            merge_sorted(streams, key=lambda value: value, limit=5),
+            [9, 8, 7, 6, 5])
+
+    def test_router(self):
+        router = ShardRouter()
+        self.assertEqual(shard_for(4), 'shard1')
+        self.assertTrue(router.allow_migrate('shard1', 'posts', 'post'))
+        self.assertFalse(router.allow_migrate('shard1', 'posts', 'group'))
+        self.assertFalse(router.allow_migrate('shard1', 'auth', 'user'))
+        self.assertIsNone(router.allow_migrate('default', 'auth', 'user'))
+        user = User(pk=5)
+        self.assertEqual(
+            router.db_for_write(Post, instance=Post(author=user)), 'shard2')
+
+
+@skipUnless(len(settings.POST_SHARDS) > 1,
+            'запустите с YATUBE_POST_SHARDS=3')
+class ShardedFeedTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(username=f'user{i}')
+                      for i in range(3)]
+        self.posts = []
+        for i in range(12):
+            author = self.users[i % 3]
+            self.posts.append(
+                Post.objects.create(author=author, text=f'Пост {i}'))
+
+    def test_posts_live_on_author_shards(self):
+        for post in self.posts:
+            self.assertEqual(post._state.db, shard_for(post.author_id))
+            self.assertEqual(shard_of_id(post.pk), post._state.db)
+
+    def test_index_merges_shards_by_date(self):
+        response = self.client.get(reverse('posts:index'))
+        page = list(response.context['page_obj'])
+        self.assertEqual(page, self.posts[::-1][:10])
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+
+    def test_post_detail_and_comments(self):
+        post = self.posts[4]
+        client = Client()
+        client.force_login(self.users[0])
+        client.post(reverse('posts:add_comment', args=(post.pk,)),
+                    {'text': 'Комментарий'})
+        comment = Comment.objects.using(post._state.db).get()
+        self.assertEqual(comment.post_id, post.pk)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,)))
+        self.assertContains(response, 'Комментарий')
+
+    def test_rebalance_moves_misplaced_rows(self):
+        source = shard_for(self.users[1].pk)
+        with override_settings(POST_SHARDS=settings.POST_SHARDS[::-1]):
+            call_command('rebalance_shards', stdout=StringIO())
+            target = shard_for(self.users[1].pk)
+            self.assertEqual(
+                Post.objects.using(target).filter(
+                    author=self.users[1]).count(), 4)
+        if source != target:
+            self.assertFalse(Post.objects.using(source).filter(
+                author=self.users[1]).exists())
+
+    def test_moved_posts_are_found_by_id(self):
+        # пост записан, пока шардов было меньше, и переехал после
+        # добавления шарда, а номер шарда в его id остался прежним
+        author = next(user for user in self.users
+                      if user.pk % len(settings.POST_SHARDS)
+                      != user.pk % (len(settings.POST_SHARDS) - 1))
+        with override_settings(POST_SHARDS=settings.POST_SHARDS[:-1]):
+            post = Post.objects.create(author=author, text='Переедет')
+        call_command('rebalance_shards', stdout=StringIO())
+        self.assertNotEqual(shard_of_id(post.pk), shard_for(author.pk))
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(in_bulk(Post.objects.all(), [post.pk])),
+                         [post.pk])
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import spam
+from ..models import Comment, Post, SpamFlag
+from ..sharding import gather
+
+User = get_user_model()
+TEMP_SPAM_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEXT = ('Только сегодня лучшие скидки на часы, сумки и кроссовки известных '
+        'брендов, переходите по ссылке в профиле и заказывайте со скидкой '
+        'до девяноста процентов, доставка бесплатно {}')
+
+
+@override_settings(SPAM_INDEX_PATH=os.path.join(TEMP_SPAM_DIR, 'index.bin'))
+class SpamTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_SPAM_DIR, ignore_errors=True)
+
+    def setUp(self):
+        if os.path.exists(settings.SPAM_INDEX_PATH):
+            os.remove(settings.SPAM_INDEX_PATH)
+        self.bots = [User.objects.create_user(username=f'bot{i}')
+                     for i in range(4)]
+        self.user = User.objects.create_user(username='user')
+        self.client = Client()
+        self.client.force_login(self.bots[-1])
+
+    def test_signatures_estimate_similarity(self):
+        first = spam.signature(TEXT.format(1))
+        self.assertGreater(spam.similarity(first, spam.signature(
+            TEXT.format(2))), 0.7)
+        self.assertLess(spam.similarity(first, spam.signature(
+            'Сегодня ходили в парк, кормили уток и смотрели на закат '
+            'над рекой')), 0.2)
+        self.assertIsNone(spam.signature('Спасибо, отличный пост!'))
+
+    def test_near_duplicates_are_flagged(self):
+        posts = [Post.objects.create(author=bot, text=TEXT.format(i))
+                 for i, bot in enumerate(self.bots)]
+        Post.objects.create(author=self.user, text='Короткий пост')
+        flag = SpamFlag.objects.get()
+        self.assertEqual((flag.kind, flag.object_id, flag.duplicates),
+                         (SpamFlag.POST, posts[-1].pk, 3))
+
+        post = Post.objects.create(author=self.user, text='Пост')
+        for bot in self.bots:
+            Comment.objects.create(post=post, author=bot, text=TEXT.format(0))
+        self.assertTrue(SpamFlag.objects.filter(
+            kind=SpamFlag.COMMENT).exists())
+
+    @override_settings(SPAM_ACTION='reject')
+    def test_near_duplicates_are_rejected(self):
+        for i, bot in enumerate(self.bots[:3]):
+            Post.objects.create(author=bot, text=TEXT.format(i))
+        post = Post.objects.create(author=self.user, text='Обычный пост')
+        response = self.client.post(reverse('posts:post_create'),
+                                    {'text': TEXT.format('!')})
+        self.assertIn('text', response.context['form'].errors)
+        self.client.post(reverse('posts:add_comment', args=(post.pk,)),
+                         {'text': TEXT.format('?')})
+        self.assertFalse(post.comments.exists())
+        self.assertEqual(len(gather(Post.objects.all())), 4)
+
+    def test_index_is_read_back_from_disk(self):
+        for i, bot in enumerate(self.bots[:3]):
+            Post.objects.create(author=bot, text=TEXT.format(i))
+        index = spam.SpamIndex()
+        index.refresh()
+        self.assertEqual(len(index.signatures), 3)
+        Post.objects.create(author=self.user,
+                            text='Совсем другой текст про котов и собак')
+        index.refresh()
+        self.assertEqual(len(index.signatures), 4)
+        self.assertEqual(len(index.similar(spam.signature(TEXT.format(9)))),
+                         3)
+
+    def test_scan_rebuilds_index(self):
+        for i, bot in enumerate(self.bots):
+            Post.objects.create(author=bot, text=TEXT.format(i))
+        SpamFlag.objects.all().delete()
+        os.remove(settings.SPAM_INDEX_PATH)
+
+        call_command('scan_spam', workers=2, batch_size=2, stdout=StringIO())
+        self.assertEqual(SpamFlag.objects.count(), 1)
+        self.assertTrue(spam.is_spam(TEXT.format(5)))
@@ -0,0 +1,109 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import streams
+from ..models import Comment, CommentEvent, Mute, Post
+
+User = get_user_model()
+
+
+@override_settings(STREAM_MAX_AGE=5, STREAM_HEARTBEAT=1)
+class CommentStreamTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        # опрос вызывается из теста, фоновый поток не нужен
+        patcher = mock.patch.object(streams.broker, 'start')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        streams.broker.last_id = None
+        streams.broker.subscriptions.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.troll = User.objects.create_user(username='troll')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def comment(self, text, author=None):
+        return Comment.objects.create(
+            post=self.post, author=author or self.author, text=text)
+
+    def open_stream(self, **params):
+        self.response = self.client.get(
+            reverse('posts:comment_stream', args=(self.post.pk,)), params)
+        self.assertEqual(self.response['Content-Type'], 'text/event-stream')
+        return iter(self.response.streaming_content)
+
+    def test_missed_comments_are_sent_first(self):
+        first = self.comment('Первый')
+        second = self.comment('Второй')
+        self.comment('Скрытый', self.troll)
+        Mute.objects.create(user=self.reader, author=self.troll)
+        stream = self.open_stream(after=first.pk)
+        self.assertTrue(next(stream).startswith(b'retry: '))
+        event = next(stream).decode()
+        self.assertIn(f'id: {second.pk}\n', event)
+        self.assertIn('Второй', event)
+        self.assertEqual(next(stream), b': ping\n\n')
+
+    def test_new_comments_are_streamed(self):
+        Mute.objects.create(user=self.reader, author=self.troll)
+        stream = self.open_stream()
+        next(stream)
+        self.comment('Скрытый', self.troll)
+        comment = self.comment('Новый')
+        self.assertEqual(CommentEvent.objects.count(), 2)
+        streams.broker.poll()
+        event = next(stream).decode()
+        self.assertTrue(event.startswith(f'id: {comment.pk}\nevent: comment'))
+        # так сервер закрывает ответ, когда клиент отключился
+        self.response.close()
+        self.assertEqual(streams.broker.subscriptions, {})
+
+    def test_comments_already_on_page_are_not_repeated(self):
+        # брокер процесса уже опрашивал события, пока у поста не было
+        # слушателей, и событие комментария ещё впереди
+        streams.broker.last_id = 0
+        comment = self.comment('Свой')
+        stream = self.open_stream(after=comment.pk)
+        next(stream)
+        streams.broker.poll()
+        self.assertEqual(next(stream), b': ping\n\n')
+        newer = self.comment('Новый')
+        streams.broker.poll()
+        self.assertIn(f'id: {newer.pk}\n', next(stream).decode())
+        self.response.close()
+
+    @override_settings(STREAM_EVENT_TTL=60)
+    def test_old_events_are_pruned_without_listeners(self):
+        self.comment('Старый')
+        CommentEvent.objects.update(
+            created=timezone.now() - timedelta(seconds=61))
+        streams.broker.pruned = 0
+        comment = self.comment('Новый')
+        self.assertEqual(streams.broker.subscriptions, {})
+        self.assertEqual(
+            [json.loads(payload)['id'] for payload in
+             CommentEvent.objects.values_list('payload', flat=True)],
+            [comment.pk])
+
+    @override_settings(STREAM_QUEUE_SIZE=2)
+    def test_slow_listener_is_disconnected(self):
+        fast = streams.broker.subscribe(self.post.pk)
+        slow = streams.broker.subscribe(self.post.pk)
+        for number in range(3):
+            self.comment(f'Комментарий {number}')
+            streams.broker.poll()
+            fast.get(0)
+        self.assertFalse(fast.overflowed)
+        self.assertTrue(slow.overflowed)
+        events = list(streams.stream_events(slow, [], mock.Mock()))
+        self.assertEqual(len(events), 1)
+        self.assertNotIn(slow, streams.broker.subscriptions[self.post.pk])
@@ -0,0 +1,120 @@
+from io import StringIO
+from unittest import mock
+from wsgiref.util import setup_testing_defaults
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+from django.test import TestCase, override_settings
+
+from core.proxy import CachingProxy, LocalPurgeBackend
+from tasks.queue import task
+
+from ..deletion import schedule_deletion
+from ..models import Comment, Group, Post
+from ..sharding import for_id
+
+User = get_user_model()
+
+
+@task
+def add_comments(post_id, count):
+    post = for_id(Post.objects.all(), post_id).get(pk=post_id)
+    for i in range(count):
+        Comment.objects.create(
+            post=post, author=post.author, text=f'Комментарий {i}')
+
+
+@override_settings(SURROGATE_PURGE_BACKEND='core.proxy.LocalPurgeBackend')
+class SurrogateKeyPurgeTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='description',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        # как и тестовый клиент, не даём запросам закрыть соединение с базой
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        self.proxy = CachingProxy(WSGIHandler())
+        LocalPurgeBackend.proxies.append(self.proxy)
+
+    def tearDown(self):
+        LocalPurgeBackend.proxies.remove(self.proxy)
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
+
+    def get(self, path):
+        environ = {'PATH_INFO': path}
+        setup_testing_defaults(environ)
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        response['body'] = b''.join(self.proxy(environ, start_response))
+        return response
+
+    def test_responses_are_tagged(self):
+        """Ответы помечены ключами постов, автора, группы и ленты."""
+        self.get('/index/')
+        status, headers, body = self.proxy.responses['/index/']
+        keys = self.proxy.paths_by_key
+        self.assertIn('/index/', keys['feed-index'])
+        self.assertIn('/index/', keys[f'post-{self.post.pk}'])
+        self.get(f'/posts/{self.post.pk}/')
+        for key in (f'author-{self.user.pk}', 'group-test_slug',
+                    f'comments-{self.post.pk}'):
+            with self.subTest(key=key):
+                self.assertIn(f'/posts/{self.post.pk}/', keys[key])
+        self.assertNotIn('Surrogate-Key', headers)
+
+    def test_writes_purge_only_affected_pages(self):
+        """Комментарий сбрасывает страницу поста, но не ленты."""
+        paths = ['/index/', f'/group/{self.group.slug}/',
+                 f'/posts/{self.post.pk}/']
+        for path in paths * 2:
+            self.get(path)
+        self.assertEqual(self.proxy.hits, 3)
+
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        self.assertIn('/index/', self.proxy.responses)
+        self.assertNotIn(f'/posts/{self.post.pk}/', self.proxy.responses)
+
+        Post.objects.create(author=self.user, text='Новый', group=self.group)
+        self.assertEqual(self.proxy.responses, {})
+        bodies = [self.get(path)['body'].decode() for path in paths]
+        self.assertEqual(self.proxy.misses, 6)
+        # ленты рендерятся заново, а не из фрагмента {% cache %}
+        for body in bodies[:2]:
+            self.assertIn('Новый', body)
+        self.assertAlmostEqual(self.proxy.hit_ratio, 3 / 9)
+
+    def test_commands_and_tasks_purge_once_per_batch(self):
+        """Команды и задачи не шлют PURGE на каждую изменённую строку."""
+        author = User.objects.create_user(username='author')
+        for i in range(5):
+            Post.objects.create(author=author, text=f'Пост {i}')
+        schedule_deletion(author)
+        add_comments.delay(self.post.pk, 3)
+        with mock.patch.object(LocalPurgeBackend, 'purge') as purge:
+            call_command('process_deletions', pause=0, stdout=StringIO())
+            self.assertEqual(purge.call_count, 1)
+            call_command('run_tasks', once=True, stdout=StringIO())
+            self.assertEqual(purge.call_count, 2)
+        self.assertIn(f'comments-{self.post.pk}', purge.call_args[0][0])
@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..markup import extract_mentions, extract_tags
+from ..models import Mention, Post, PostTag, Tag
+
+User = get_user_model()
+
+
+class TagTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_extraction(self):
+        text = ('#Django и #джанго, пишите @reader. '
+                'https://example.com/#anchor mail@example.com')
+        self.assertEqual(extract_tags(text), {'django', 'джанго'})
+        self.assertEqual(extract_mentions(text), {'reader'})
+
+    def test_index_follows_post_text(self):
+        post = Post.objects.create(author=self.user, text='#a #b @reader')
+        self.assertEqual(
+            set(post.tag_links.values_list('tag__name', flat=True)),
+            {'a', 'b'})
+        self.assertIn('href="/tag/a/"', post.text_html)
+        post.text = '#b'
+        post.save()
+        self.assertEqual(
+            list(post.tag_links.values_list('tag__name', flat=True)), ['b'])
+        self.assertFalse(Mention.objects.exists())
+
+    def test_tag_feed_keyset_pages(self):
+        """Страницы тега идут по курсору и не повторяют посты."""
+        posts = [Post.objects.create(author=self.user, text=f'#тег {i}')
+                 for i in range(13)]
+        Post.objects.create(author=self.user, text='без тега')
+        url = reverse('posts:tag', args=('ТЕГ',))
+        response = self.client.get(url)
+        first = list(response.context['page_obj'])
+        self.assertEqual(len(first), 10)
+        cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(url, {'after': cursor})
+        second = list(response.context['page_obj'])
+        self.assertFalse(response.context['page_obj'].has_next())
+        self.assertEqual(first + second, posts[::-1])
+
+    def test_mentions_feed(self):
+        post = Post.objects.create(author=self.user, text='привет @reader')
+        Post.objects.create(author=self.user, text='привет всем')
+        response = self.authorized_client.get(reverse('posts:mentions'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    def test_backfill_command(self):
+        Post.objects.bulk_create([
+            Post(author=self.user, text='#a @reader'),
+            Post(author=self.user, text='#a #b'),
+        ])
+        call_command('index_tags', workers=2, batch_size=1,
+                     stdout=StringIO())
+        self.assertEqual(Tag.objects.count(), 2)
+        self.assertEqual(PostTag.objects.count(), 3)
+        self.assertEqual(Mention.objects.get().user, self.reader)
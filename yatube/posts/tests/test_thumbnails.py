@@ -0,0 +1,83 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from sorl.thumbnail import default
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from ..models import Post
+from ..thumbnails import prefetch_thumbnails, thumbnail_key
+from ..views import AMOUNT_OF_POSTS
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def colored_gif(color):
+    # одинаковые файлы хранятся под одним именем, поэтому у постов
+    # теста картинки разного цвета
+    return SMALL_GIF.replace(b'\xFF\xFF\xFF', bytes((color,) * 3))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailStoreTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # имена файлов по содержимому совпадают между тестами
+        cache.clear()
+        default.kvstore._forget()
+        for i in range(3):
+            Post.objects.create(
+                author=self.user,
+                text=f'Пост {i}',
+                image=SimpleUploadedFile(f'small{i}.gif', colored_gif(i)),
+            )
+        self.page = Paginator(self.user.posts.all(), AMOUNT_OF_POSTS).page(1)
+        self.client.get(f'/profile/{self.user.username}/')
+
+    def test_prefetch_uses_single_query(self):
+        """Метаданные миниатюр страницы читаются одним запросом."""
+        cache.clear()
+        default.kvstore._forget()
+        list(self.page)
+        with CaptureQueriesContext(connection) as queries:
+            prefetch_thumbnails(self.page)
+        self.assertEqual(len(queries), 1)
+        for post in self.page:
+            self.assertIsNotNone(
+                default.kvstore._get_raw(thumbnail_key(post.image)))
+
+    def test_replaced_image_is_evicted(self):
+        """При замене картинки её миниатюры удаляются из хранилища."""
+        post = self.user.posts.first()
+        key = thumbnail_key(post.image)
+        self.assertTrue(KVStoreModel.objects.filter(key=key).exists())
+        post.image = SimpleUploadedFile('other.gif', colored_gif(100))
+        post.save()
+        self.assertFalse(KVStoreModel.objects.filter(key=key).exists())
@@ -12,6 +12,8 @@ User = get_user_model()
 
 
 class PostsViewTests(TestCase):
+    databases = '__all__'
+
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -71,7 +73,7 @@ class PostsViewTests(TestCase):
         self.assertTemplateUsed(response, 'posts/index.html')
         self.assertIn('page_obj', response.context)
         posts = response.context.get('page_obj').object_list
-        expected = list(Post.objects.all())
+        expected = list(self.user.posts.all())
         self.assertEqual(posts[0], expected[0])
         self.assertEqual(posts[1], expected[1])
 
@@ -94,7 +96,7 @@ class PostsViewTests(TestCase):
         self.assertIn('page_obj', response.context)
         posts = response.context.get('page_obj').object_list
         group = response.context.get('group')
-        expected = list(Post.objects.filter(group_id=self.group.id))
+        expected = list(self.user.posts.filter(group_id=self.group.id))
 
         self.assertEqual(posts, expected)
         self.assertEqual(group, self.group)
@@ -108,7 +110,7 @@ class PostsViewTests(TestCase):
         self.assertIn('page_obj', response.context)
         posts = response.context.get('page_obj').object_list
         author = response.context.get('author')
-        expected = list(Post.objects.filter(author_id=self.user.id))
+        expected = list(self.user.posts.all())
 
         self.assertEqual(posts, expected)
         self.assertEqual(author, self.user)
@@ -164,6 +166,8 @@ class PostsViewTests(TestCase):
 
 
 class PaginatorViewsTest(TestCase):
+    databases = '__all__'
+
     @classmethod
     def setUpClass(cls):
         """Создаем автора и группу."""
@@ -0,0 +1,134 @@
+import threading
+
+from django.core.signals import request_finished
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+# должны совпадать с параметрами {% thumbnail %} в includes/post_image.html
+THUMBNAIL_GEOMETRY = '960x339'
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+class KVStore(CachedDBStore):
+    """Хранилище sorl-thumbnail с пакетной предзагрузкой ключей.
+
+    ``prefetch`` достаёт метаданные миниатюр всей страницы одним
+    ``get_many`` из кэша и одним запросом к базе для промахов. До конца
+    запроса ``_get_raw`` отдаёт их из памяти потока.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._local = threading.local()
+        request_finished.connect(self._forget, weak=False)
+
+    @property
+    def _prefetched(self):
+        if not hasattr(self._local, 'values'):
+            self._local.values = {}
+        return self._local.values
+
+    def _forget(self, **kwargs):
+        self._prefetched.clear()
+
+    def _load_many(self, keys):
+        values = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            found = dict(KVStoreModel.objects.filter(
+                key__in=missing).values_list('key', 'value'))
+            loaded = {key: found.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(loaded, settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(loaded)
+        return values, missing
+
+    def prefetch(self, keys):
+        """Загружает ключи в память потока, возвращает промахи кэша."""
+        keys = [key for key in keys if key not in self._prefetched]
+        if not keys:
+            return []
+        values, missing = self._load_many(keys)
+        self._prefetched.update(values)
+        return missing
+
+    def warm(self, keys):
+        """Прогревает общий кэш, не занимая память потока."""
+        if keys:
+            self._load_many(list(keys))
+
+    def _get_raw(self, key):
+        value = self._prefetched.get(key)
+        if value is None:
+            return super()._get_raw(key)
+        if value == EMPTY_VALUE:
+            return None
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self._prefetched[key] = value
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        for key in keys:
+            self._prefetched.pop(key, None)
+
+
+def thumbnail_key(image):
+    """Ключ в хранилище sorl для миниатюры картинки поста.
+
+    Повторяет подготовку параметров из ThumbnailBackend.get_thumbnail.
+    """
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(THUMBNAIL_OPTIONS)
+    if settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(
+        source, THUMBNAIL_GEOMETRY, options)
+    return add_prefix(ImageFile(name, default.storage).key)
+
+
+def _keys(images):
+    # картинкам с адаптивными вариантами миниатюра не нужна
+    return [thumbnail_key(image) for image, widths in images
+            if image and not widths]
+
+
+def prefetch_thumbnails(page_obj):
+    """Загружает миниатюры страницы, при промахах прогревает следующую."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, KVStore):
+        return
+    missing = kvstore.prefetch(
+        _keys((post.image, post.image_widths) for post in page_obj))
+    # страницы с курсором вместо номера следующую не прогревают
+    if (missing and page_obj.has_next()
+            and hasattr(page_obj, 'next_page_number')):
+        next_page = page_obj.paginator.page(page_obj.next_page_number())
+        object_list = next_page.object_list
+        if hasattr(object_list, 'values_list'):
+            images = object_list.values_list('image', 'image_widths')
+        else:
+            # лента со всех шардов уже отдаёт готовые объекты
+            images = ((post.image, post.image_widths)
+                      for post in object_list)
+        kvstore.warm(_keys(images))
+
+
+def evict_thumbnails(image):
+    """Удаляет метаданные и файлы миниатюр картинки."""
+    if image:
+        default.backend.delete(image, delete_file=False)
@@ -6,17 +6,41 @@ app_name = 'posts'
 urlpatterns = [
     path('', views.index),
     path('index/', views.index, name='index'),
+    path('groups/autocomplete/',
+         views.group_autocomplete, name='group_autocomplete'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('group/<slug:slug>/stats/', views.group_stats, name='group_stats'),
+    path('group/<slug:slug>/follow/',
+         views.group_follow, name='group_follow'),
+    path('group/<slug:slug>/unfollow/',
+         views.group_unfollow, name='group_unfollow'),
+    path('group/<slug:slug>/mute/', views.group_mute, name='group_mute'),
+    path('group/<slug:slug>/unmute/',
+         views.group_unmute, name='group_unmute'),
     path('about/', include('about.urls', namespace='about')),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('profile/<str:username>/stats/',
+         views.author_stats, name='author_stats'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/',
          views.add_comment, name='add_comment'),
+    path('posts/<int:post_id>/comments/stream/',
+         views.comment_stream, name='comment_stream'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('tag/<str:name>/', views.tag_posts, name='tag'),
+    path('mentions/', views.mentions, name='mentions'),
     path('profile/<str:username>/follow/',
          views.profile_follow, name='profile_follow'),
     path('profile/<str:username>/unfollow/',
          views.profile_unfollow, name='profile_unfollow'),
+    path('profile/<str:username>/mute/',
+         views.profile_mute, name='profile_mute'),
+    path('profile/<str:username>/unmute/',
+         views.profile_unmute, name='profile_unmute'),
+    path('profile/<str:username>/block/',
+         views.profile_block, name='profile_block'),
+    path('profile/<str:username>/unblock/',
+         views.profile_unblock, name='profile_unblock'),
 ]
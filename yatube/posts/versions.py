@@ -0,0 +1,82 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'version:{}'
+# без SHARED_CACHE процесс не видит bump() из других процессов, поэтому
+# его версии живут столько секунд: ETag, кэш страниц для анонимов и
+# число постов архива устаревают не дольше
+LOCAL_VERSION_TIMEOUT = 10
+
+
+def _key(name):
+    # в слагах и именах пользователей бывают недопустимые для memcached символы
+    return VERSION_KEY.format(hashlib.md5(name.encode()).hexdigest())
+
+
+def _initial():
+    # после вытеснения ключа из кэша версия не должна повториться
+    return int(time.time() * 1000)
+
+
+def _timeout():
+    return None if settings.SHARED_CACHE else LOCAL_VERSION_TIMEOUT
+
+
+def feed_names(view_name, **kwargs):
+    """Имена версий, от которых зависит страница ленты."""
+    if view_name == 'group_list':
+        return [f'group:{kwargs["slug"]}']
+    if view_name == 'profile':
+        return [f'profile:{kwargs["username"]}']
+    if view_name == 'post_detail':
+        return [f'post:{kwargs["post_id"]}', 'index']
+    return ['index']
+
+
+def get_versions(names):
+    keys = [_key(name) for name in names]
+    versions = cache.get_many(keys)
+    missing = {key: _initial() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, _timeout())
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump(*names):
+    """Увеличивает версии после изменения данных."""
+    for name in names:
+        key = _key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial(), _timeout())
+
+
+def feed_etag(view_name, period=None):
+    """Возвращает функцию слабого ETag для декоратора condition.
+
+    ETag считается по версиям из кэша, без запросов к базе и рендеринга.
+    ``period`` нужен страницам с {% cache %}: фрагмент может устареть
+    на это время, поэтому ETag меняется не реже.
+    """
+    def etag(request, **kwargs):
+        if hasattr(request, 'feed_etag'):
+            return request.feed_etag
+        names = feed_names(view_name, **kwargs)
+        user = request.user.pk if request.user.is_authenticated else 'anon'
+        if request.user.is_authenticated:
+            # скрытые авторы и группы, см. posts.hidden
+            names.append(f'hidden:{user}')
+        versions = get_versions(names)
+        if period:
+            versions.append(int(time.time() // period))
+        token = '|'.join(
+            [request.get_full_path(), str(user)] + [str(v) for v in versions])
+        request.feed_etag = 'W/"{}"'.format(
+            hashlib.md5(token.encode()).hexdigest())
+        return request.feed_etag
+    return etag
@@ -1,63 +1,236 @@
+from functools import partial
+
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db.models import Sum, prefetch_related_objects
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 
+from .archive import TieredFeed
+from .counters import count_views, view_count
+from .hidden import NOTHING, hidden_for
+from .lookup import search_groups
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Comment, Follow
+from .models import (ArchivedPost, Block, Follow, Group, GroupFollow, Mute,
+                     Post, Tag, User)
+from .pagination import KeysetPaginator, MergedKeysetPaginator
+from .sharding import for_id, in_bulk, per_shard, scatter
+from .streams import broker, stream_events
+from .recommendations import RECOMMENDATIONS_PER_USER
+from .surrogate import page_keys, post_keys, tag_response
+from .tasks import build_image_variants
+from .page_cache import feed_page
+from .versions import get_versions
 from django.views.decorators.cache import cache_page
 
 AMOUNT_OF_POSTS = 10
+# совпадает с таймаутом {% cache %} в posts/index.html
+INDEX_CACHE_TIMEOUT = 20
+# ленты показывают только отрывок, полный текст грузится на странице поста
+FULL_TEXT_FIELDS = ('text', 'text_html')
+# сколько последних дней показывают страницы статистики
+STATS_DAYS = 30
+
+
+def archived(**filters):
+    """Архивная часть ленты, читается после горячей."""
+    return ArchivedPost.objects.visible().filter(**filters).select_related(
+        'group', 'author').defer(*FULL_TEXT_FIELDS)
+
+
+def update_image_variants(post):
+    build_image_variants.delay(post.pk, post.image.name,
+                               dedupe_key=f'variants-{post.pk}')
 
 
+@feed_page('index', period=INDEX_CACHE_TIMEOUT)
 def index(request):
-    post_list = Post.objects.select_related('group', 'author').all()
+    post_list = TieredFeed(scatter(Post.objects.visible().select_related(
+        'group', 'author').defer(*FULL_TEXT_FIELDS)), archived())
     paginator = Paginator(post_list, AMOUNT_OF_POSTS)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = hide_posts(request, paginator.get_page(page_number))
     context = {
         'page_obj': page_obj,
+        'fragment_key': fragment_key(request),
     }
-    return render(request, 'posts/index.html', context)
+    return tag_response(render(request, 'posts/index.html', context),
+                        page_keys(page_obj, 'feed-index'))
 
 
+@feed_page('group_list')
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('group', 'author')
+    group = get_object_or_404(Group, slug=slug, is_deleted=False)
+    posts = TieredFeed(scatter(group.posts.visible().select_related(
+        'group', 'author').defer(*FULL_TEXT_FIELDS)), archived(group=group))
     paginator = Paginator(posts, AMOUNT_OF_POSTS)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = hide_posts(request, paginator.get_page(page_number))
     context = {
         'group': group,
         'page_obj': page_obj,
+        'following': request.user.is_authenticated and (
+            request.user.group_follows.filter(group=group).exists()),
+        'muted': hidden_for(request.user).has_muted_group(group.pk),
     }
-    return render(request, 'posts/group_list.html', context)
+    return tag_response(render(request, 'posts/group_list.html', context),
+                        page_keys(page_obj, f'group-{group.slug}'))
+
+
+def load_posts(entries, hidden=NOTHING):
+    """Подгружает посты для строк индекса хэштегов или упоминаний.
+
+    Строки удалённых и скрытых постов отбрасываются, у остальных пост
+    кладётся в ``entry.loaded_post``.
+    """
+    ids = [entry.post_id for entry in entries]
+    posts = in_bulk(Post.objects.visible().select_related(
+        'group', 'author').defer(*FULL_TEXT_FIELDS), ids)
+    missing = [pk for pk in ids if pk not in posts]
+    if missing:
+        posts.update(ArchivedPost.objects.visible().prefetch_related(
+            'group', 'author').defer(*FULL_TEXT_FIELDS).in_bulk(missing))
+    kept = []
+    for entry in entries:
+        post = posts.get(entry.post_id)
+        if post is not None and not hidden.hides_post(post):
+            entry.loaded_post = post
+            kept.append(entry)
+    return kept
 
 
+def index_page(request, entries):
+    """Страница постов по строкам индекса, без скрытого пользователем."""
+    paginator = KeysetPaginator(
+        entries, AMOUNT_OF_POSTS, id_field='post_id',
+        keep=partial(load_posts, hidden=hidden_for(request.user)))
+    page_obj = paginator.page(request.GET.get('after'))
+    page_obj.object_list = [entry.loaded_post for entry in page_obj]
+    return page_obj
+
+
+def hide_posts(request, page_obj):
+    """Убирает со страницы общей ленты скрытых авторов и группы.
+
+    Страницы с номерами нельзя добрать без сдвига нумерации, поэтому
+    страница может оказаться короче.
+    """
+    hidden = hidden_for(request.user)
+    if not hidden.is_empty():
+        page_obj.object_list = hidden.filter_posts(page_obj.object_list)
+    return page_obj
+
+
+def fragment_key(request):
+    """Часть ключа {% cache %} общей ленты.
+
+    Фрагмент живёт свои 20 секунд, но после сброса страницы в прокси
+    строится заново (см. surrogate.FRAGMENT_KEYS), иначе прокси сохранил
+    бы устаревшую копию. После hide_posts фрагмент у каждого читателя
+    свой и меняется вместе с его скрытым, а без скрытого он общий для
+    всех посетителей.
+    """
+    names, parts = ['purged:feed-index'], []
+    if not hidden_for(request.user).is_empty():
+        names.append(f'hidden:{request.user.pk}')
+        parts.append(request.user.pk)
+    return '-'.join(str(part) for part in parts + get_versions(names))
+
+
+def tag_posts(request, name):
+    tag = get_object_or_404(Tag, name=name.lower())
+    context = {
+        'tag': tag,
+        'page_obj': index_page(request, tag.post_links.all()),
+    }
+    return render(request, 'posts/tag.html', context)
+
+
+@login_required
+def mentions(request):
+    context = {
+        'page_obj': index_page(request, request.user.mentions.all()),
+    }
+    return render(request, 'posts/mentions.html', context)
+
+
+@feed_page('profile')
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    user_posts = author.posts.select_related('group', 'author')
+    author = get_object_or_404(User, username=username, is_active=True)
+    user_posts = TieredFeed(scatter(author.posts.visible().select_related(
+        'group', 'author').defer(*FULL_TEXT_FIELDS), author_ids=[author.pk]),
+        archived(author=author))
     paginator = Paginator(user_posts, AMOUNT_OF_POSTS)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    hidden = hidden_for(request.user)
     context = {
         'author': author,
         'page_obj': page_obj,
+        'muted': hidden.has_muted(author.pk),
+        'blocked': hidden.has_blocked(author.pk),
     }
-    return render(request, 'posts/profile.html', context)
+    return tag_response(render(request, 'posts/profile.html', context),
+                        page_keys(page_obj, f'author-{author.pk}'))
 
 
+def author_stats(request, username):
+    author = get_object_or_404(User, username=username, is_active=True)
+    # только сводные таблицы, сами посты и подписки не читаются
+    context = {
+        'author': author,
+        'days': author.daily_stats.all()[:STATS_DAYS],
+        'totals': author.daily_stats.aggregate(
+            posts=Sum('posts'), followers=Sum('followers')),
+    }
+    return render(request, 'posts/author_stats.html', context)
+
+
+def group_autocomplete(request):
+    """Группы по началу названия в формате select2."""
+    groups = search_groups(request.GET.get('term', ''))
+    return JsonResponse({
+        'results': [{'id': pk, 'text': title} for pk, title in groups],
+        'pagination': {'more': False},
+    })
+
+
+def group_stats(request, slug):
+    group = get_object_or_404(Group, slug=slug, is_deleted=False)
+    context = {
+        'group': group,
+        'days': group.daily_stats.all()[:STATS_DAYS],
+        'totals': group.daily_stats.aggregate(posts=Sum('posts')),
+    }
+    return render(request, 'posts/group_stats.html', context)
+
+
+@count_views
+@feed_page('post_detail')
 def post_detail(request, post_id):
-    user_post = get_object_or_404(Post, id=post_id)
+    user_post = for_id(Post.objects.visible(), post_id).filter(
+        id=post_id).first()
+    if user_post is None:
+        # старые посты лежат в архиве, их адреса не меняются
+        user_post = get_object_or_404(ArchivedPost.objects.visible(),
+                                      id=post_id)
     form_comments = CommentForm(request.POST or None)
-    all_posts = user_post.author.posts.all()
-    all_comments = Comment.objects.filter(post=user_post)
+    all_posts = user_post.author.posts.visible()
+    all_comments = hidden_for(request.user).filter_comments(
+        user_post.comments.all())
     context = {
         'user_post': user_post,
         'all_posts': all_posts,
         'form_comments': form_comments,
         'all_comments': all_comments,
+        'last_comment_id': max(
+            (comment.pk for comment in all_comments), default=0),
+        'views': view_count(user_post),
     }
-    return render(request, 'posts/post_detail.html', context)
+    keys = post_keys(user_post) | {f'comments-{user_post.pk}'}
+    return tag_response(render(request, 'posts/post_detail.html', context),
+                        keys)
 
 
 @login_required
@@ -67,6 +240,8 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        if post.image:
+            update_image_variants(post)
         return redirect('posts:profile', username=request.user)
     return render(request, 'posts/create_post.html', {'form': form})
     groups = Group.objects.all()
@@ -79,13 +254,19 @@ def post_create(request):
 
 # @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(for_id(Post.objects.visible(), post_id),
+                             pk=post_id)
     if post.author != request.user:
         return redirect('posts:post_detail', post_id)
     form = PostForm(request.POST or None, files=request.FILES or None,
                     instance=post)
     if form.is_valid():
+        if 'image' in form.changed_data:
+            # до готовности новых вариантов показывается миниатюра
+            post.image_widths = ''
         form.save()
+        if 'image' in form.changed_data:
+            update_image_variants(post)
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
@@ -96,7 +277,8 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(for_id(Post.objects.visible(), post_id),
+                             pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -106,27 +288,81 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id)
 
 
+def comment_stream(request, post_id):
+    """Новые комментарии поста потоком Server-Sent Events.
+
+    Комментарии с id больше Last-Event-ID или параметра after, написанные
+    до подключения, отдаются сразу, затем — по мере появления.
+    """
+    post = get_object_or_404(for_id(Post.objects.visible(), post_id),
+                             pk=post_id)
+    after = request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('after')
+    after = int(after) if after and after.isdigit() else 0
+    hidden = hidden_for(request.user)
+    # подписка раньше чтения пропущенного, иначе комментарий между ними
+    # потеряется; повторы поток отбрасывает сам
+    subscription = broker.subscribe(post.pk)
+    missed = []
+    if after:
+        comments = hidden.filter_comments(post.comments.filter(
+            pk__gt=after).order_by('pk')[:settings.STREAM_CATCHUP_LIMIT])
+        usernames = dict(User.objects.filter(
+            pk__in={comment.author_id for comment in comments}).values_list(
+            'pk', 'username'))
+        missed = [(comment, usernames.get(comment.author_id, ''))
+                  for comment in comments]
+    response = StreamingHttpResponse(
+        stream_events(subscription, missed, hidden, after),
+        content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx не должен копить поток в буфере
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 def follow_index(request):
     # информация о текущем пользователе доступна в переменной request.user
-    follow = Follow.objects.filter(user=request.user).values_list(
-        "author_id", flat=True
-    )
-    post_list = Post.objects.filter(author_id__in=follow)
-    paginator = Paginator(post_list, AMOUNT_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    hidden = hidden_for(request.user)
+    author_ids = [author_id for author_id in request.user.follower.values_list(
+        'author_id', flat=True) if not hidden.hides_author(author_id)]
+    group_ids = list(request.user.group_follows.values_list(
+        'group_id', flat=True))
+    posts = Post.objects.visible().select_related(
+        'group', 'author').defer(*FULL_TEXT_FIELDS)
+    # по источнику на каждого автора и каждую группу: такой подзапрос
+    # идёт по индексу (автор или группа, дата, id) и читает не больше
+    # LIMIT строк, а с author_id__in база сортировала бы все посты
+    # подписок; источники одной базы уходят одним UNION ALL
+    sources = []
+    for author_id in author_ids:
+        sources += per_shard(posts.filter(author_id=author_id),
+                             author_ids=[author_id])
+    for group_id in group_ids:
+        sources += per_shard(posts.filter(group_id=group_id))
+    # в группах остаются посты скрытых авторов, их отсеивает фильтр
+    paginator = MergedKeysetPaginator(
+        sources, AMOUNT_OF_POSTS,
+        keep=None if hidden.is_empty() else hidden.filter_posts)
+    page_obj = paginator.page(request.GET.get('after'))
+    prefetch_related_objects(page_obj.object_list, 'author', 'group')
+    recommendations = request.user.recommendations.filter(
+        author__is_active=True).select_related(
+        'author')[:RECOMMENDATIONS_PER_USER]
     context = {
         'page_obj': page_obj,
+        'recommendations': recommendations,
     }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
-    if author != request.user and (not Follow.objects.filter(
-            user=request.user, author=author).exists()):
+    author = get_object_or_404(User, username=username, is_active=True)
+    if hidden_for(author).has_blocked(request.user.pk):
+        return redirect('posts:profile', username=username)
+    if author != request.user and (not request.user.follower.filter(
+            author=author).exists()):
         Follow.objects.create(user=request.user, author=author)
     return redirect("posts:index")
 
@@ -134,5 +370,61 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    request.user.follower.filter(author=author).delete()
     return redirect("posts:index")
+
+
+@login_required
+def group_follow(request, slug):
+    group = get_object_or_404(Group, slug=slug, is_deleted=False)
+    GroupFollow.objects.get_or_create(user=request.user, group=group)
+    return redirect('posts:group_list', slug=slug)
+
+
+@login_required
+def group_unfollow(request, slug):
+    request.user.group_follows.filter(group__slug=slug).delete()
+    return redirect('posts:group_list', slug=slug)
+
+
+@login_required
+def profile_mute(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        Mute.objects.get_or_create(user=request.user, author=author)
+    return redirect('posts:profile', username=username)
+
+
+@login_required
+def profile_unmute(request, username):
+    request.user.mutes.filter(author__username=username).delete()
+    return redirect('posts:profile', username=username)
+
+
+@login_required
+def profile_block(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        Block.objects.get_or_create(user=request.user, author=author)
+        # заблокированный больше не читает ленту пользователя
+        author.follower.filter(author=request.user).delete()
+    return redirect('posts:profile', username=username)
+
+
+@login_required
+def profile_unblock(request, username):
+    request.user.blocks.filter(author__username=username).delete()
+    return redirect('posts:profile', username=username)
+
+
+@login_required
+def group_mute(request, slug):
+    group = get_object_or_404(Group, slug=slug, is_deleted=False)
+    Mute.objects.get_or_create(user=request.user, group=group)
+    return redirect('posts:group_list', slug=slug)
+
+
+@login_required
+def group_unmute(request, slug):
+    request.user.mutes.filter(group__slug=slug).delete()
+    return redirect('posts:group_list', slug=slug)
@@ -0,0 +1,57 @@
+from django import forms
+from django.urls import reverse
+
+
+class GroupAutocomplete(forms.Select):
+    """Выбор группы без выгрузки всего списка групп в страницу.
+
+    В HTML попадает только выбранная группа, остальные варианты скрипт
+    подгружает по мере ввода из posts:group_autocomplete.
+    """
+
+    class Media:
+        js = ('js/group_autocomplete.js',)
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['data-autocomplete-url'] = reverse('posts:group_autocomplete')
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        selected = [pk for pk in value if pk not in (None, '')]
+        options = [self.create_option(
+            name, '', self.choices.field.empty_label or '',
+            not selected, 0)]
+        if selected:
+            groups = self.choices.queryset.filter(pk__in=selected)
+            for index, group in enumerate(groups, 1):
+                options.append(self.create_option(
+                    name, group.pk, str(group), True, index))
+        return [(None, options, 0)]
+
+
+class AdminGroupAutocomplete(GroupAutocomplete):
+    """Тот же выбор группы на select2 из админки."""
+
+    class Media:
+        # скрипт сайта здесь не нужен, его заменяет select2
+        extend = False
+        css = {'screen': ('admin/css/vendor/select2/select2.min.css',
+                          'admin/css/autocomplete.css')}
+        js = ('admin/js/vendor/jquery/jquery.min.js',
+              'admin/js/vendor/select2/select2.full.min.js',
+              'admin/js/jquery.init.js',
+              'admin/js/autocomplete.js')
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs.update({
+            'class': 'admin-autocomplete',
+            'data-ajax--cache': 'true',
+            'data-ajax--type': 'GET',
+            'data-ajax--url': attrs['data-autocomplete-url'],
+            'data-theme': 'admin-autocomplete',
+            'data-allow-clear': 'true',
+            'data-placeholder': '',
+        })
+        return attrs
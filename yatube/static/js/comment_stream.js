@@ -0,0 +1,47 @@
+// Новые комментарии поста приходят потоком Server-Sent Events
+// и добавляются в конец списка без перезагрузки страницы.
+(function () {
+  'use strict';
+
+  function render(container, comment) {
+    var item = document.createElement('div');
+    var body = document.createElement('div');
+    var title = document.createElement('h5');
+    var link = document.createElement('a');
+    var text = document.createElement('p');
+    item.className = 'media mb-4';
+    body.className = 'media-body';
+    title.className = 'mt-0';
+    link.href = container.dataset.profileUrl.replace(
+      '__username__', encodeURIComponent(comment.author));
+    link.textContent = comment.author;
+    // HTML текста собран и очищен на сервере, как и на самой странице
+    text.innerHTML = comment.text_html;
+    title.appendChild(link);
+    body.appendChild(title);
+    body.appendChild(text);
+    item.appendChild(body);
+    container.appendChild(item);
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    var container = document.getElementById('comments');
+    if (!container || !container.dataset.streamUrl || !window.EventSource) {
+      return;
+    }
+    // комментарии, уже показанные на странице или пришедшие раньше:
+    // после переподключения сервер может прислать их ещё раз
+    var match = /[?&]after=(\d+)/.exec(container.dataset.streamUrl);
+    var lastId = match ? parseInt(match[1], 10) : 0;
+    var rendered = {};
+    var source = new EventSource(container.dataset.streamUrl);
+    source.addEventListener('comment', function (event) {
+      var comment = JSON.parse(event.data);
+      if (comment.id <= lastId || rendered[comment.id]) {
+        return;
+      }
+      rendered[comment.id] = true;
+      render(container, comment);
+    });
+  });
+})();
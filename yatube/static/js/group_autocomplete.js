@@ -0,0 +1,46 @@
+// Поиск группы по началу названия: над <select> появляется поле ввода,
+// варианты подгружаются с сервера, выбранная группа остаётся в списке.
+(function () {
+  'use strict';
+
+  var DELAY = 200;
+
+  function setup(select) {
+    var input = document.createElement('input');
+    var timer = null;
+    input.type = 'search';
+    input.className = 'form-control mb-2';
+    input.placeholder = 'Начните вводить название группы';
+    input.setAttribute('autocomplete', 'off');
+    select.parentNode.insertBefore(input, select);
+
+    function render(results) {
+      var keep = Array.prototype.filter.call(select.options, function (option) {
+        return option.value === '' || option.selected;
+      });
+      var values = keep.map(function (option) { return option.value; });
+      select.innerHTML = '';
+      keep.forEach(function (option) { select.appendChild(option); });
+      results.forEach(function (group) {
+        if (values.indexOf(String(group.id)) === -1) {
+          select.appendChild(new Option(group.text, group.id));
+        }
+      });
+    }
+
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        var url = select.dataset.autocompleteUrl +
+          '?term=' + encodeURIComponent(input.value);
+        fetch(url, {credentials: 'same-origin'})
+          .then(function (response) { return response.json(); })
+          .then(function (data) { render(data.results); });
+      }, DELAY);
+    });
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('select[data-autocomplete-url]').forEach(setup);
+  });
+})();
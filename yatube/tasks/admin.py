@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'status', 'priority', 'attempts',
+                    'run_at', 'locked_by')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'dedupe_key')
+    readonly_fields = ('created',)
+
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,34 @@
+from multiprocessing import Process
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tasks.queue import work, worker_name
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Сколько исполнителей запустить')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выйти, когда очередь опустеет')
+
+    def handle(self, *args, processes, once, **options):
+        if processes == 1:
+            done = work(once=once)
+            self.stdout.write(f'Выполнено задач: {done}')
+            return
+        # соединения с базой не должны переходить в дочерние процессы
+        connections.close_all()
+        children = [Process(target=work, kwargs={'once': once})
+                    for _ in range(processes)]
+        for child in children:
+            child.start()
+        self.stdout.write(
+            f'Запущено исполнителей: {processes}, основной {worker_name()}')
+        for child in children:
+            child.join()
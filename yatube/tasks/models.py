@@ -0,0 +1,42 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Отложенный вызов функции, помеченной @task."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(max_length=200)
+    payload = models.TextField(default='{}')
+    status = models.CharField(
+        max_length=10, choices=STATUSES, default=QUEUED)
+    priority = models.SmallIntegerField(default=0)
+    # пока задача ждёт в очереди, второй такой же ключ туда не попадёт
+    dedupe_key = models.CharField(
+        max_length=200, unique=True, null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-priority', 'run_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at', '-priority']),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
@@ -0,0 +1,207 @@
+import json
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+from .signals import task_finished, task_started
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def enqueue(name, args=(), kwargs=None, priority=0, dedupe_key=None,
+            countdown=0, max_attempts=None):
+    """Ставит вызов задачи в очередь.
+
+    Если задача с тем же ``dedupe_key`` ещё ждёт в очереди, новая не
+    создаётся и возвращается существующая. Уже начатая задача ключ
+    отпускает: данные могли измениться после того, как она их прочла.
+    """
+    fields = {
+        'name': name,
+        'payload': json.dumps({'args': list(args), 'kwargs': kwargs or {}}),
+        'priority': priority,
+        'run_at': timezone.now() + timedelta(seconds=countdown),
+        'max_attempts': max_attempts or settings.TASKS_MAX_ATTEMPTS,
+    }
+    if dedupe_key is None:
+        return Job.objects.create(**fields)
+    while True:
+        try:
+            with transaction.atomic():
+                return Job.objects.create(dedupe_key=dedupe_key, **fields)
+        except IntegrityError:
+            # между вставкой и чтением исполнитель мог забрать задачу
+            # и отпустить ключ — тогда ставим новую
+            job = Job.objects.filter(dedupe_key=dedupe_key).first()
+            if job is not None:
+                return job
+
+
+class Task:
+    def __init__(self, func, priority, max_attempts):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.priority = priority
+        self.max_attempts = max_attempts
+        wraps(func)(self)
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, dedupe_key=None, countdown=0, priority=None,
+              **kwargs):
+        """Ставит вызов в очередь.
+
+        Очередь лежит в той же базе, поэтому внутри транзакции задача
+        появится для исполнителей только вместе с её данными.
+        """
+        return enqueue(
+            self.name, args, kwargs,
+            priority=self.priority if priority is None else priority,
+            dedupe_key=dedupe_key, countdown=countdown,
+            max_attempts=self.max_attempts,
+        )
+
+
+def task(func=None, *, priority=0, max_attempts=None):
+    """Декоратор функции, которую можно вызвать в фоне через ``.delay()``.
+
+    Аргументы передаются через JSON, поэтому вместо объектов моделей
+    нужно передавать их id.
+    """
+    def decorator(func):
+        wrapper = Task(func, priority, max_attempts)
+        _registry[wrapper.name] = wrapper
+        return wrapper
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def get_task(name):
+    if name not in _registry:
+        # модуль с задачей мог ещё не импортироваться в этом процессе
+        import_string(name)
+    return _registry[name]
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker):
+    """Забирает самую приоритетную готовую задачу.
+
+    Задачи, чей исполнитель не уложился в TASKS_VISIBILITY_TIMEOUT,
+    снова доступны, пока не исчерпаны попытки. Захват — условный
+    UPDATE, поэтому два процесса не получат одну задачу и без
+    SELECT ... FOR UPDATE.
+    """
+    now = timezone.now()
+    expired = Q(status=Job.RUNNING, locked_until__lt=now)
+    # задача, которая роняет сам исполнитель, не должна повторяться вечно
+    Job.objects.filter(expired, attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED,
+        dedupe_key=None,
+        locked_until=None,
+        last_error='Исполнитель не завершил задачу за отведённое время',
+    )
+    ready = (Q(status=Job.QUEUED, run_at__lte=now)
+             | expired & Q(attempts__lt=F('max_attempts')))
+    while True:
+        job = Job.objects.filter(ready).order_by(
+            '-priority', 'run_at').first()
+        if job is None:
+            return None
+        locked_until = now + timedelta(
+            seconds=settings.TASKS_VISIBILITY_TIMEOUT)
+        claimed = Job.objects.filter(ready, pk=job.pk).update(
+            status=Job.RUNNING,
+            locked_until=locked_until,
+            locked_by=worker,
+            attempts=F('attempts') + 1,
+            dedupe_key=None,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def backoff(attempts):
+    delay = settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.TASKS_RETRY_MAX_DELAY))
+
+
+def run_job(job):
+    """Выполняет задачу и сохраняет результат или повтор с задержкой.
+
+    Результат пишется, только если задача всё ещё за этим исполнителем:
+    после TASKS_VISIBILITY_TIMEOUT её мог забрать другой.
+    """
+    task_started.send(sender=Job, job=job)
+    try:
+        saved = _run(job)
+    finally:
+        task_finished.send(sender=Job, job=job)
+    return saved and job.status == Job.DONE
+
+
+def _run(job):
+    try:
+        payload = json.loads(job.payload)
+        get_task(job.name).func(*payload['args'], **payload['kwargs'])
+    except Exception:
+        logger.exception('Задача %s упала', job)
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + backoff(job.attempts)
+        else:
+            job.status = Job.FAILED
+            job.dedupe_key = None
+    else:
+        job.status = Job.DONE
+        job.dedupe_key = None
+    job.locked_until = None
+    saved = Job.objects.filter(
+        pk=job.pk, status=Job.RUNNING,
+        locked_by=job.locked_by, attempts=job.attempts,
+    ).update(
+        status=job.status,
+        run_at=job.run_at,
+        dedupe_key=job.dedupe_key,
+        locked_until=None,
+        last_error=job.last_error,
+    )
+    if not saved:
+        logger.warning('Задача %s уже у другого исполнителя, '
+                       'результат отброшен', job)
+    return bool(saved)
+
+
+def work(worker=None, once=False, sleep=None):
+    """Цикл исполнителя; с ``once`` выходит, когда очередь пуста."""
+    worker = worker or worker_name()
+    done = 0
+    while True:
+        job = claim(worker)
+        if job is None:
+            if once:
+                return done
+            time.sleep(sleep or settings.TASKS_POLL_INTERVAL)
+            continue
+        run_job(job)
+        done += 1
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# отправляются вокруг каждой задачи, как request_started и
+# request_finished вокруг запроса
+task_started = Signal()
+task_finished = Signal()
@@ -0,0 +1,127 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Job
+from ..queue import claim, enqueue, run_job, task
+
+calls = []
+
+
+@task
+def remember(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+@override_settings(TASKS_RETRY_DELAY=10, TASKS_VISIBILITY_TIMEOUT=60)
+class QueueTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        calls.clear()
+
+    def test_priority_and_dedupe(self):
+        """Важные задачи идут первыми, дубликаты не создаются."""
+        remember.delay('low')
+        first = remember.delay('high', priority=5, dedupe_key='once')
+        self.assertEqual(
+            remember.delay('again', dedupe_key='once').pk, first.pk)
+        call_command('run_tasks', once=True, stdout=StringIO())
+        self.assertEqual(calls, ['high', 'low'])
+        # после выполнения тот же ключ снова можно поставить
+        remember.delay('next', dedupe_key='once')
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+
+    def test_dedupe_key_released_during_enqueue(self):
+        """Ключ отпущен между неудачной вставкой и чтением."""
+        create = Job.objects.create
+
+        def taken_then_released(**fields):
+            if not create_calls:
+                create_calls.append(fields)
+                raise IntegrityError('UNIQUE constraint failed')
+            return create(**fields)
+
+        create_calls = []
+        with mock.patch.object(Job.objects, 'create', taken_then_released):
+            job = remember.delay('fresh', dedupe_key='released')
+        self.assertEqual(
+            (job.status, job.dedupe_key), (Job.QUEUED, 'released'))
+        self.assertEqual(Job.objects.get().pk, job.pk)
+
+    def test_retry_with_backoff_then_fail(self):
+        job = explode.delay()
+        before = timezone.now()
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            self.assertFalse(run_job(claim('test')))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('boom', job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=10))
+        self.assertIsNone(claim('test'))
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            run_job(claim('test'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_visibility_timeout(self):
+        """Задачу упавшего исполнителя забирает другой."""
+        job = enqueue(remember.name, ['lost'])
+        self.assertEqual(claim('first').pk, job.pk)
+        self.assertIsNone(claim('second'))
+        Job.objects.filter(pk=job.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = claim('second')
+        self.assertEqual((reclaimed.pk, reclaimed.attempts), (job.pk, 2))
+
+    def test_late_worker_does_not_overwrite_new_owner(self):
+        """Опоздавший исполнитель не затирает задачу, отданную другому."""
+        job = explode.delay()
+        late = claim('first')
+        Job.objects.filter(pk=job.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1))
+        claim('second')
+        with self.assertLogs('tasks.queue', 'WARNING') as logs:
+            self.assertFalse(run_job(late))
+        self.assertIn('результат отброшен', logs.output[-1])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.attempts),
+                         (Job.RUNNING, 'second', 2))
+        self.assertEqual(job.last_error, '')
+
+    def test_job_killing_its_worker_fails_after_max_attempts(self):
+        job = explode.delay(dedupe_key='crash')
+        for _ in range(2):
+            self.assertEqual(claim('worker').pk, job.pk)
+            Job.objects.filter(pk=job.pk).update(
+                locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(claim('worker'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIsNone(job.dedupe_key)
+
+    def test_signup_sends_welcome_email_in_background(self):
+        self.client.post(reverse('users:signup'), {
+            'username': 'newbie',
+            'email': 'newbie@example.com',
+            'password1': 'Sup3r-secret-pass',
+            'password2': 'Sup3r-secret-pass',
+        })
+        self.assertEqual(len(mail.outbox), 0)
+        call_command('run_tasks', once=True, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['newbie@example.com'])
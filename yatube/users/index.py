@@ -0,0 +1,280 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count
+
+from posts.models import Follow
+from posts.sharding import shards
+
+User = get_user_model()
+
+VERSION_KEY = 'users:index:version'
+CHANGE_KEY = 'users:index:change:{}'
+CHANGE_TIMEOUT = 24 * 60 * 60
+# при большем отставании от журнала индекс дешевле построить заново
+MAX_CHANGES = 1000
+# пропуск в журнале обычно значит, что другой процесс уже увеличил версию,
+# но ещё не записал изменение; пропуск дольше этого числа секунд значит,
+# что изменение вытеснено из кэша
+GAP_TIMEOUT = 5
+# без SHARED_CACHE журнал у каждого процесса свой и чужих изменений
+# не содержит, поэтому индекс строится заново раз в столько секунд
+LOCAL_REBUILD_INTERVAL = 60
+AUTOCOMPLETE_LIMIT = 10
+# для префиксов до этой длины лучшие пользователи хранятся готовыми,
+# для длинных просматривается не больше SCAN_LIMIT ключей подряд
+TOP_PREFIX_LENGTH = 2
+TOP_SIZE = 20
+SCAN_LIMIT = 2000
+
+
+def index_keys(username, full_name):
+    """Строки, по началу которых ищется пользователь."""
+    keys = {username.casefold()}
+    full_name = full_name.casefold().strip()
+    if full_name:
+        keys.add(full_name)
+        # чтобы находить и по фамилии
+        keys.update(full_name.split()[1:])
+    return keys
+
+
+class UsernameIndex:
+    """Отсортированный индекс имён пользователей в памяти процесса.
+
+    ``keys`` — отсортированный список пар (ключ, id), поиск по префиксу
+    — bisect и просмотр подряд. Выдача упорядочена по числу подписчиков.
+    Процессы держат по своей копии и догоняют друг друга по журналу
+    изменений в общем кэше (SHARED_CACHE), см. publish() и refresh().
+    Читать и менять индекс можно только под ``lock``.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keys = []
+        self.users = {}
+        self.top = {}
+        self.version = None
+        self.built = 0
+        # (номер изменения, время), на котором остановилось чтение журнала
+        self.gap = None
+        self.rebuilding = False
+
+    def build(self, rows, followers, version):
+        users = {}
+        keys = []
+        for pk, username, full_name in rows:
+            users[pk] = [username, full_name, followers.get(pk, 0)]
+            keys.extend((key, pk) for key in index_keys(username, full_name))
+        keys.sort()
+        self.keys = keys
+        self.users = users
+        self.top = {}
+        self.version = version
+        self.built = time.monotonic()
+        self.gap = None
+
+    def replace(self, fresh):
+        """Подменяет содержимое индексом, построенным заново."""
+        self.keys = fresh.keys
+        self.users = fresh.users
+        self.top = fresh.top
+        self.version = fresh.version
+        self.built = fresh.built
+        self.gap = None
+
+    def rank(self, pk):
+        username, _, followers = self.users[pk]
+        return -followers, username
+
+    def scan(self, prefix, limit=None):
+        """id пользователей с ключами на prefix, лучшие первыми."""
+        found = set()
+        index = bisect_left(self.keys, (prefix,))
+        while index < len(self.keys) and (limit is None or len(found) < limit):
+            key, pk = self.keys[index]
+            if not key.startswith(prefix):
+                break
+            found.add(pk)
+            index += 1
+        return heapq.nsmallest(TOP_SIZE, found, key=self.rank)
+
+    def search(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        prefix = prefix.casefold().strip()
+        if len(prefix) > TOP_PREFIX_LENGTH:
+            pks = self.scan(prefix, SCAN_LIMIT)
+        else:
+            if prefix not in self.top:
+                self.top[prefix] = self.scan(prefix)
+            pks = self.top[prefix]
+        return [tuple(self.users[pk][:2]) for pk in pks[:limit]]
+
+    def short_prefixes(self, pk):
+        username, full_name, _ = self.users[pk]
+        return {key[:length] for key in index_keys(username, full_name)
+                for length in range(TOP_PREFIX_LENGTH + 1)}
+
+    def forget_top(self, pk):
+        for prefix in self.short_prefixes(pk):
+            self.top.pop(prefix, None)
+
+    def remove(self, pk):
+        if pk not in self.users:
+            return
+        self.forget_top(pk)
+        username, full_name, _ = self.users.pop(pk)
+        for key in index_keys(username, full_name):
+            index = bisect_left(self.keys, (key, pk))
+            if index < len(self.keys) and self.keys[index] == (key, pk):
+                del self.keys[index]
+
+    def put(self, pk, username, full_name):
+        followers = self.users[pk][2] if pk in self.users else 0
+        self.remove(pk)
+        self.users[pk] = [username, full_name, followers]
+        for key in index_keys(username, full_name):
+            insort(self.keys, (key, pk))
+        self.forget_top(pk)
+
+    def add_followers(self, pk, delta):
+        if pk not in self.users:
+            return
+        self.users[pk][2] += delta
+        for prefix in self.short_prefixes(pk):
+            top = self.top.get(prefix)
+            if top is None:
+                continue
+            if pk in top and delta < 0:
+                # на освободившееся место мог претендовать кто угодно
+                del self.top[prefix]
+                continue
+            if pk not in top:
+                top.append(pk)
+            top.sort(key=self.rank)
+            del top[TOP_SIZE:]
+
+    def apply(self, change):
+        kind, pk, *data = change
+        if kind == 'user':
+            self.put(pk, *data)
+        elif kind == 'delete':
+            self.remove(pk)
+        elif kind == 'follow':
+            self.add_followers(pk, *data)
+
+
+index = UsernameIndex()
+
+
+def follower_counts():
+    counts = Counter()
+    for alias in shards():
+        counts.update(dict(
+            Follow.objects.using(alias).order_by().values_list(
+                'author_id').annotate(Count('pk'))))
+    return counts
+
+
+def publish(change):
+    """Записывает изменение в журнал, общий для всех процессов."""
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 0, None)
+        version = cache.incr(VERSION_KEY)
+    cache.set(CHANGE_KEY.format(version), change, CHANGE_TIMEOUT)
+
+
+def spawn(func, *args):
+    """Запускает func в отдельном потоке со своими соединениями с БД."""
+    def run():
+        try:
+            func(*args)
+        finally:
+            connections.close_all()
+    threading.Thread(target=run, name='username-index', daemon=True).start()
+
+
+def rebuild(version):
+    """Строит индекс заново и подменяет им текущий.
+
+    Строится без блокировки: поиск всё это время идёт по старому индексу.
+    """
+    fresh = None
+    try:
+        rows = ((pk, username, f'{first_name} {last_name}'.strip())
+                for pk, username, first_name, last_name
+                in User.objects.filter(is_active=True).values_list(
+                    'pk', 'username', 'first_name', 'last_name').iterator())
+        fresh = UsernameIndex()
+        fresh.build(rows, follower_counts(), version)
+    finally:
+        with index.lock:
+            if fresh is not None:
+                index.replace(fresh)
+            index.rebuilding = False
+
+
+def catch_up(version):
+    """Применяет журнал к индексу; False, если индекс пора строить заново.
+
+    Вызывается под ``index.lock``.
+    """
+    if (version < index.version or version - index.version > MAX_CHANGES
+            or not settings.SHARED_CACHE
+            and time.monotonic() - index.built > LOCAL_REBUILD_INTERVAL):
+        return False
+    numbers = range(index.version + 1, version + 1)
+    changes = cache.get_many([CHANGE_KEY.format(n) for n in numbers])
+    for number in numbers:
+        change = changes.get(CHANGE_KEY.format(number))
+        if change is None:
+            # применим в следующий раз, а если пропуск не исчезает,
+            # журнал вытеснен и индекс строится заново
+            now = time.monotonic()
+            if index.gap is None or index.gap[0] != number:
+                index.gap = (number, now)
+            elif now - index.gap[1] > GAP_TIMEOUT:
+                return False
+            return True
+        index.apply(change)
+        index.version = number
+    index.gap = None
+    return True
+
+
+def refresh():
+    """Догоняет индекс процесса по журналу изменений.
+
+    Если журнала не хватает, индекс строится заново в фоновом потоке,
+    а до подмены поиск отвечает по старому. Изменение, записанное после
+    чтения версии и до подмены, применится дважды, поэтому число
+    подписчиков в индексе приблизительное.
+    """
+    version = cache.get(VERSION_KEY, 0)
+    with index.lock:
+        empty = index.version is None
+        if not empty and (catch_up(version) or index.rebuilding):
+            return
+        index.rebuilding = True
+    if empty:
+        # искать пока не в чем, поэтому первый раз индекс строится в запросе
+        rebuild(version)
+    else:
+        spawn(rebuild, version)
+
+
+def search(term, limit=AUTOCOMPLETE_LIMIT):
+    """Пользователи с именем или фамилией на term: [(username, имя)]."""
+    refresh()
+    # поиск заполняет кэш лучших по префиксу, а refresh() в соседнем
+    # потоке в это время может менять списки
+    with index.lock:
+        return index.search(term, limit)
@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import (
+    SessionStore as CachedDBStore)
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+
+LAST_ACTIVITY_KEY = '_last_activity'
+
+
+class SessionStore(CachedDBStore):
+    """Сессии из кэша с записью в базу и редкой отметкой активности.
+
+    Время последней активности хранится в самой сессии и обновляется
+    не чаще раза в SESSION_ACTIVITY_INTERVAL секунд, поэтому обычный
+    запрос читает сессию из кэша и ничего не пишет. Без SHARED_CACHE
+    сессия читается из базы: иначе после выхода из аккаунта она жила бы
+    в кэше остальных процессов.
+    """
+
+    def load(self):
+        if settings.SHARED_CACHE:
+            data = super().load()
+        else:
+            data = DBStore.load(self)
+        now = int(time.time())
+        last_activity = data.get(LAST_ACTIVITY_KEY, 0)
+        if data and now - last_activity >= settings.SESSION_ACTIVITY_INTERVAL:
+            data[LAST_ACTIVITY_KEY] = now
+            self.modified = True
+        return data
+
+    @property
+    def last_activity(self):
+        return self.get(LAST_ACTIVITY_KEY)
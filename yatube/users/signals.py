@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from posts.models import Follow
+
+from . import index
+from .backends import user_cache_key
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    cache.delete(user_cache_key(instance.pk))
+
+
+@receiver(post_save, sender=User)
+def index_user(sender, instance, update_fields=None, **kwargs):
+    # вход в систему обновляет только last_login, имя не меняется
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    if instance.is_active:
+        index.publish(('user', instance.pk, instance.username,
+                       instance.get_full_name()))
+    else:
+        index.publish(('delete', instance.pk))
+
+
+@receiver(post_delete, sender=User)
+def unindex_user(sender, instance, **kwargs):
+    index.publish(('delete', instance.pk))
+
+
+@receiver(post_save, sender=Follow)
+def index_follow(sender, instance, created, **kwargs):
+    if created:
+        index.publish(('follow', instance.author_id, 1))
+
+
+@receiver(post_delete, sender=Follow)
+def index_unfollow(sender, instance, **kwargs):
+    index.publish(('follow', instance.author_id, -1))
@@ -0,0 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+
+from tasks.queue import task
+
+User = get_user_model()
+
+
+@task
+def send_welcome_email(user_id):
+    user = User.objects.filter(pk=user_id).first()
+    if user is None or not user.email:
+        return
+    send_mail(
+        'Добро пожаловать в Yatube',
+        f'{user.get_full_name() or user.username}, спасибо за регистрацию!',
+        None,
+        [user.email],
+    )
@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..backends import CachedModelBackend
+
+User = get_user_model()
+
+
+def tables(queries):
+    return ' '.join(query['sql'] for query in queries)
+
+
+@override_settings(SHARED_CACHE=True)
+class CachedAuthTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_follow_index(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.authorized_client.get(
+                reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, 200)
+        return tables(context.captured_queries)
+
+    def test_request_skips_session_and_user_queries(self):
+        """Повторный запрос не читает django_session и auth_user по id."""
+        self.get_follow_index()
+        sql = self.get_follow_index()
+        self.assertNotIn('django_session', sql)
+        self.assertNotIn(f'"auth_user"."id" = {self.user.pk}', sql)
+
+    @override_settings(SHARED_CACHE=False)
+    def test_process_local_cache_is_not_trusted(self):
+        """С кэшем процесса сессия и пользователь читаются из базы."""
+        self.get_follow_index()
+        sql = self.get_follow_index()
+        self.assertIn('django_session', sql)
+        self.assertIn(f'"auth_user"."id" = {self.user.pk}', sql)
+
+    def test_activity_is_coalesced(self):
+        """Отметка активности пишется не чаще SESSION_ACTIVITY_INTERVAL."""
+        self.get_follow_index()
+        session = self.authorized_client.session
+        self.assertIsNotNone(session.last_activity)
+        self.assertNotIn('UPDATE "django_session"', self.get_follow_index())
+        with override_settings(SESSION_ACTIVITY_INTERVAL=0):
+            self.assertIn('django_session', self.get_follow_index())
+
+    def test_user_save_invalidates_cache(self):
+        """Смена пароля сбрасывает закэшированного пользователя."""
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            backend.get_user(self.user.pk)
+        self.user.set_password('new-password')
+        self.user.save()
+        self.assertTrue(
+            backend.get_user(self.user.pk).check_password('new-password'))
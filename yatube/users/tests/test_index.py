@@ -0,0 +1,127 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow
+
+from .. import index
+
+User = get_user_model()
+
+
+def in_place(func, *args):
+    # фоновый поток не видит данных незавершённой транзакции теста
+    func(*args)
+
+
+@override_settings(SHARED_CACHE=True)
+class UsernameIndexTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        index.index.version = None
+        index.index.rebuilding = False
+        self.anna = User.objects.create_user(
+            username='anna', first_name='Анна', last_name='Смирнова')
+        self.andrew = User.objects.create_user(
+            username='andrew', first_name='Андрей', last_name='Соколов')
+        self.bob = User.objects.create_user(username='bob')
+        self.client = Client()
+
+    def autocomplete(self, term):
+        response = self.client.get(
+            reverse('users:autocomplete'), {'term': term})
+        return [user['username'] for user in response.json()['results']]
+
+    def test_search_by_username_and_name(self):
+        self.assertEqual(self.autocomplete('an'), ['andrew', 'anna'])
+        self.assertEqual(self.autocomplete('АН'), ['andrew', 'anna'])
+        self.assertEqual(self.autocomplete('соко'), ['andrew'])
+        self.assertEqual(self.autocomplete('x'), [])
+        response = self.client.get(
+            reverse('users:autocomplete'), {'term': 'bo'})
+        self.assertEqual(response.json()['results'], [{
+            'username': 'bob', 'full_name': '',
+            'url': reverse('posts:profile', args=('bob',)),
+        }])
+
+    def test_followers_rank_first(self):
+        self.assertEqual(self.autocomplete('an'), ['andrew', 'anna'])
+        Follow.objects.create(user=self.bob, author=self.anna)
+        self.assertEqual(self.autocomplete('an'), ['anna', 'andrew'])
+        self.assertEqual(self.autocomplete('ann'), ['anna'])
+        Follow.objects.filter(author=self.anna).delete()
+        Follow.objects.create(user=self.bob, author=self.andrew)
+        self.assertEqual(self.autocomplete('an'), ['andrew', 'anna'])
+
+    def test_changes_are_applied_without_rebuild(self):
+        self.autocomplete('an')
+        self.client.post(reverse('users:signup'), {
+            'first_name': 'Антон', 'last_name': 'Петров',
+            'username': 'anton', 'email': 'anton@example.com',
+            'password1': 'Pass-word-123', 'password2': 'Pass-word-123',
+        })
+        self.anna.username = 'hanna'
+        self.anna.save()
+        self.andrew.is_active = False
+        self.andrew.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(index.search('an'), [('anton', 'Антон Петров')])
+            self.assertEqual(index.search('пет'), [('anton', 'Антон Петров')])
+            self.assertEqual(index.search('han'),
+                             [('hanna', 'Анна Смирнова')])
+        self.bob.delete()
+        self.assertEqual(index.search('b'), [])
+
+    def test_waits_for_change_being_published(self):
+        self.autocomplete('an')
+        # другой процесс увеличил версию, но ещё не записал изменение
+        cache.incr(index.VERSION_KEY)
+        User.objects.create_user(username='ann')
+        with self.assertNumQueries(0):
+            self.assertEqual(index.search('an'), [('andrew', 'Андрей Соколов'),
+                                                  ('anna', 'Анна Смирнова')])
+        cache.set(index.CHANGE_KEY.format(cache.get(index.VERSION_KEY) - 1),
+                  ('user', self.bob.pk, 'bobby', ''))
+        self.assertEqual(self.autocomplete('an'), ['andrew', 'ann', 'anna'])
+        self.assertEqual(self.autocomplete('bo'), ['bobby'])
+
+    def test_rebuilds_when_changes_are_lost(self):
+        self.autocomplete('an')
+        User.objects.create_user(username='anton')
+        User.objects.create_user(username='ann')
+        cache.delete(index.CHANGE_KEY.format(cache.get(index.VERSION_KEY) - 1))
+        self.assertEqual(self.autocomplete('an'), ['andrew', 'anna'])
+        with mock.patch.object(index, 'GAP_TIMEOUT', 0), \
+                mock.patch.object(index, 'spawn', in_place):
+            self.assertEqual(self.autocomplete('an'), ['andrew', 'ann',
+                                                       'anna', 'anton'])
+
+    @override_settings(SHARED_CACHE=False)
+    def test_rebuilds_periodically_without_shared_cache(self):
+        self.autocomplete('bo')
+        # переименование в другом процессе: в журнал этого оно не попало
+        User.objects.filter(pk=self.bob.pk).update(username='bobby')
+        self.assertEqual(self.autocomplete('bo'), ['bob'])
+        with mock.patch.object(index, 'LOCAL_REBUILD_INTERVAL', 0), \
+                mock.patch.object(index, 'spawn', in_place):
+            self.assertEqual(self.autocomplete('bo'), ['bobby'])
+
+    @override_settings(SHARED_CACHE=False)
+    def test_rebuild_runs_in_background(self):
+        """Пока индекс строится заново, поиск отвечает по старому."""
+        self.autocomplete('bo')
+        User.objects.filter(pk=self.bob.pk).update(username='bobby')
+        with mock.patch.object(index, 'LOCAL_REBUILD_INTERVAL', 0), \
+                mock.patch.object(index, 'spawn') as spawn:
+            with self.assertNumQueries(0):
+                self.assertEqual(index.search('bo'), [('bob', '')])
+                self.assertEqual(index.search('bo'), [('bob', '')])
+        spawn.assert_called_once()
+        in_place(*spawn.call_args[0])
+        self.assertFalse(index.index.rebuilding)
+        self.assertEqual(index.search('bo'), [('bobby', '')])
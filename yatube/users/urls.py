@@ -8,6 +8,7 @@ app_name = 'users'
 
 urlpatterns = [
     path('signup/', views.SignUp.as_view(), name='signup'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
 
     path('logout/', LogoutView.as_view(template_name='users/logged_out.html'),
          name='logout'),
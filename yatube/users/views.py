@@ -1,9 +1,12 @@
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth.views import PasswordChangeView
+from django.http import JsonResponse
 from django.views.generic import CreateView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 
 from .forms import CreationForm
+from .index import search
+from .tasks import send_welcome_email
 
 
 class SignUp(CreateView):
@@ -11,8 +14,23 @@ class SignUp(CreateView):
     success_url = reverse_lazy('posts:index')
     template_name = 'users/signup.html'
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        send_welcome_email.delay(self.object.pk)
+        return response
+
 
 class PasswordChange(PasswordChangeView):
     form_class = PasswordChangeForm
     success_url = reverse_lazy('users:password_change_done')
     template_name = 'users/password_change_form.html'
+
+
+def autocomplete(request):
+    """Пользователи по началу имени, самые читаемые первыми."""
+    users = search(request.GET.get('term', ''))
+    return JsonResponse({'results': [
+        {'username': username, 'full_name': full_name,
+         'url': reverse('posts:profile', args=(username,))}
+        for username, full_name in users
+    ]})
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'tasks.apps.TasksConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -50,6 +51,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -60,11 +62,19 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yatube.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -73,12 +83,45 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
             ],
+            'loaders': TEMPLATE_LOADERS,
         },
     },
 ]
 
+# Быстрый путь рендеринга лент: шаблоны из templates/jinja2 на Jinja2,
+# всё остальное по-прежнему рендерит движок Django
+JINJA2_TEMPLATES = {
+    'BACKEND': 'django.template.backends.jinja2.Jinja2',
+    'DIRS': [os.path.join(BASE_DIR, 'templates', 'jinja2')],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        'environment': 'core.jinja2.environment',
+        'context_processors': [
+            'django.contrib.auth.context_processors.auth',
+            'core.context_processors.year.year',
+        ],
+        'cache_size': 400,
+    },
+}
+JINJA2_BYTECODE_CACHE_DIR = None
+USE_JINJA2_FEEDS = os.environ.get('YATUBE_JINJA2_FEEDS') == '1'
+if USE_JINJA2_FEEDS:
+    TEMPLATES.insert(0, JINJA2_TEMPLATES)
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# manage.py test уводит файлы, которые пишут сигналы, из дерева проекта
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Уровни gzip по типам содержимого; остальные типы не сжимаются
+COMPRESSION_LEVELS = {
+    'text/html': 6,
+    'text/plain': 6,
+    'application/json': 4,
+    'text/css': 9,
+    'application/javascript': 9,
+}
+
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
@@ -89,11 +132,72 @@ DATABASES = {
     }
 }
 
+# Шарды постов, комментариев и подписок, см. posts.sharding.
+# YATUBE_POST_SHARDS=3 раскладывает их по default и двум отдельным файлам.
+POST_SHARDS = ['default']
+for index in range(1, int(os.getenv('YATUBE_POST_SHARDS', 1))):
+    DATABASES[f'shard{index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db-shard{index}.sqlite3'),
+    }
+    POST_SHARDS.append(f'shard{index}')
+
+# Посты старше POST_ARCHIVE_AFTER_DAYS дней команда archive_posts переносит
+# в архив. По умолчанию он лежит в основной базе, с YATUBE_ARCHIVE_DB=1 —
+# в отдельном файле, который можно держать на медленном диске.
+POST_ARCHIVE_AFTER_DAYS = 180
+ARCHIVE_DATABASE = 'default'
+if os.getenv('YATUBE_ARCHIVE_DB'):
+    DATABASES['archive'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db-archive.sqlite3'),
+    }
+    ARCHIVE_DATABASE = 'archive'
+DATABASE_ROUTERS = ['posts.archive.ArchiveRouter',
+                    'posts.sharding.ShardRouter']
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+# YATUBE_MEMCACHED=127.0.0.1:11211 — общий кэш на memcached
+# (нужен пакет python-memcached)
+if os.getenv('YATUBE_MEMCACHED'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': os.getenv('YATUBE_MEMCACHED'),
+    }
+# Видят ли все процессы сервера одни и те же записи кэша. LocMemCache
+# у каждого процесса свой, и сброс записи в одном процессе другие
+# не замечают. Без общего кэша:
+# - сессии, пользователи (users.sessions, users.backends) и скрытое
+#   пользователем (posts.hidden) читаются из базы;
+# - индекс имён (users.index) регулярно строится заново;
+# - версии лент (posts.versions) живут недолго, поэтому ETag, HTML
+#   страниц для анонимов и число постов архива устаревают ненадолго.
+# Под одним процессом можно включить и с LocMemCache.
+SHARED_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Сессии читаются из кэша, в базу пишутся только изменения
+SESSION_ENGINE = 'users.sessions'
+# Как часто отмечать активность в сессии, в секундах
+SESSION_ACTIVITY_INTERVAL = 60 * 5
+
+AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+USER_CACHE_TIMEOUT = 60 * 60
+
+# Сколько хранить HTML страниц для анонимных посетителей, в секундах
+PAGE_CACHE_TIMEOUT = 60 * 10
+
+# Сброс кэша обратного прокси по Surrogate-Key; None отключает отправку
+SURROGATE_PURGE_BACKEND = None
+SURROGATE_PURGE_URL = 'http://127.0.0.1:6081/'
+SURROGATE_PURGE_TIMEOUT = 2
+SURROGATE_PURGE_BATCH_SIZE = 100
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -134,6 +238,13 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+if not DEBUG:
+    STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+
+# Cache-Control для файлов без хэша в имени, в секундах
+STATIC_CACHE_MAX_AGE = 60 * 60
+MEDIA_CACHE_MAX_AGE = 60 * 60 * 24
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
@@ -142,3 +253,69 @@ LOGIN_REDIRECT_URL = 'posts:index'
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+FILE_UPLOAD_HANDLERS = [
+    'posts.images.LimitedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Обработка картинок постов
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_SIDE = 6000
+POST_IMAGE_FORMAT = 'WEBP'
+POST_IMAGE_QUALITY = 80
+POST_IMAGE_CROP = (960, 339)
+POST_IMAGE_WIDTHS = (320, 640, 960)
+# Картинки лежат по хэшу содержимого (core.storage) и общие у одинаковых
+# загрузок. Файл без ссылок collect_media удаляет не раньше чем через
+# столько секунд, чтобы закэшированные страницы успели устареть
+MEDIA_GC_GRACE = 2 * MEDIA_CACHE_MAX_AGE
+
+THUMBNAIL_KVSTORE = 'posts.thumbnails.KVStore'
+
+# Счётчик просмотров: слияние буфера процесса в кэш и запись в базу,
+# в секундах
+VIEW_COUNTER_MERGE_INTERVAL = 5
+VIEW_COUNTER_FLUSH_INTERVAL = 60
+
+# Поиск почти одинаковых постов и комментариев, см. posts.spam.
+# Файл индекса не хранится в git, тесты пишут его во временную папку
+SPAM_INDEX_PATH = os.path.join(BASE_DIR, 'spam', 'index.bin')
+# с какой оценки похожести по Жаккару тексты считаются копиями
+SPAM_SIMILARITY = 0.7
+# столько почти-копий делают текст спамом
+SPAM_MIN_DUPLICATES = 3
+# 'flag' — публиковать и отмечать для модерации, 'reject' — не принимать
+SPAM_ACTION = 'flag'
+
+# Длина отрывка поста в лентах, в символах
+POST_EXCERPT_LENGTH = 300
+
+# Очередь задач: повторы с удвоением задержки, время, через которое
+# задача зависшего исполнителя снова доступна, и опрос пустой очереди
+TASKS_MAX_ATTEMPTS = 5
+TASKS_RETRY_DELAY = 10
+TASKS_RETRY_MAX_DELAY = 60 * 60
+TASKS_VISIBILITY_TIMEOUT = 60 * 5
+TASKS_POLL_INTERVAL = 1
+
+# Фоновое удаление: размер пачки и пауза между пачками в секундах
+DELETION_BATCH_SIZE = 500
+DELETION_BATCH_PAUSE = 0.2
+
+# Поток новых комментариев поста (SSE), см. posts.streams. Соединение
+# занимает поток сервера: для тысяч слушателей нужны green-потоки,
+# например gunicorn -k gevent.
+# Событий в буфере соединения; переполненный поток закрывается, браузер
+# переподключается и догоняет пропущенное по Last-Event-ID
+STREAM_QUEUE_SIZE = 100
+# как часто процесс опрашивает таблицу событий, в секундах
+STREAM_POLL_INTERVAL = 0.5
+# комментарий SSE против таймаутов прокси, в секундах
+STREAM_HEARTBEAT = 15
+# после этого соединение закрывается и открывается заново, в секундах
+STREAM_MAX_AGE = 5 * 60
+# сколько хранить события и сколько пропущенных отдавать при переподключении
+STREAM_EVENT_TTL = 10 * 60
+STREAM_CATCHUP_LIMIT = 100